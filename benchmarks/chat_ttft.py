@@ -0,0 +1,86 @@
+# backend/benchmarks/chat_ttft.py
+"""Time-to-first-token vs. session length: text history vs. KV context reuse.
+
+Drives a real Ollama with the same two strategies the chat endpoints use:
+- "text":    every turn resends the whole transcript (old behaviour)
+- "context": every turn sends only the new message + the stored `context`
+
+Usage (from the backend folder, with `ollama serve` running):
+    python -m benchmarks.chat_ttft --turns 12 --model gemma3:4b > ttft.json
+"""
+import argparse
+import json
+import time
+
+import requests
+
+from utils.embedding import OLLAMA_BASE_URL
+
+QUESTIONS = [
+    "Explain what a transformer encoder does.",
+    "How is self-attention different from convolution?",
+    "Give an example of positional encoding.",
+    "What are the main limitations of this approach?",
+    "Summarise everything so far in three sentences.",
+    "Suggest a follow-up experiment.",
+]
+
+
+def stream_turn(model: str, prompt: str, context=None, num_predict: int = 64):
+    payload = {"model": model, "prompt": prompt, "stream": True,
+               "keep_alive": "30m", "options": {"num_predict": num_predict}}
+    if context:
+        payload["context"] = context
+
+    start = time.perf_counter()
+    ttft, text, final = None, "", {}
+    with requests.post(f"{OLLAMA_BASE_URL}/api/generate", json=payload, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if ttft is None and chunk.get("response"):
+                ttft = time.perf_counter() - start
+            text += chunk.get("response", "")
+            if chunk.get("done"):
+                final = chunk
+    return {
+        "ttft_ms": round((ttft or 0) * 1000, 1),
+        "total_ms": round((time.perf_counter() - start) * 1000, 1),
+        "prompt_eval_count": final.get("prompt_eval_count"),
+        "text": text,
+        "context": final.get("context"),
+    }
+
+
+def run(model: str, turns: int, mode: str):
+    history, context, rows = "", None, []
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        if mode == "context" and context:
+            prompt = f"User: {question}\nAssistant:"
+        else:
+            prompt = f"You are a research assistant.\n\n{history}User: {question}\nAssistant:"
+        res = stream_turn(model, prompt, context if mode == "context" else None)
+        history += f"User: {question}\nAssistant: {res['text']}\n"
+        context = res["context"]
+        rows.append({"turn": turn + 1, "ttft_ms": res["ttft_ms"], "total_ms": res["total_ms"],
+                     "prompt_eval_count": res["prompt_eval_count"]})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="gemma3:4b")
+    parser.add_argument("--turns", type=int, default=10)
+    args = parser.parse_args()
+
+    # load the model once so turn 1 of the first mode isn't a cold start
+    stream_turn(args.model, "hi", num_predict=1)
+    report = {mode: run(args.model, args.turns, mode) for mode in ("text", "context")}
+    print(json.dumps({"model": args.model, "turns": args.turns, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
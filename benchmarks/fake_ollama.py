@@ -0,0 +1,208 @@
+# backend/benchmarks/fake_ollama.py
+"""Fake Ollama server for benchmarks: configurable latency, deterministic output.
+
+Implements the endpoints the backend uses:
+  /api/generate   (stream / non-stream, `format` JSON schema, `context`)
+  /api/chat
+  /api/embeddings (single prompt)  and  /api/embed (batched input)
+  /api/tags
+
+Embeddings are a normalised sum of per-word hashed vectors, so they are
+stable across runs and texts sharing words end up close together – enough
+for retrieval / plagiarism paths to behave realistically.
+
+Standalone:
+    python -m benchmarks.fake_ollama --port 11500 --generate-latency-ms 300
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+class FakeOllamaConfig:
+    def __init__(self, embed_dim=768, embed_latency_ms=5.0, generate_latency_ms=200.0,
+                 tokens_per_second=200.0, completion_tokens=64, max_parallel=0):
+        self.embed_dim = embed_dim
+        self.embed_latency_ms = embed_latency_ms          # per text
+        self.generate_latency_ms = generate_latency_ms    # prefill / time-to-first-token
+        self.tokens_per_second = tokens_per_second        # decode speed
+        self.completion_tokens = completion_tokens
+        # >0 emulates Ollama's OLLAMA_NUM_PARALLEL: extra generations wait
+        self.max_parallel = max_parallel
+
+
+@lru_cache(maxsize=200_000)
+def _word_vector(word: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def fake_embedding(text: str, dim: int = 768) -> list:
+    words = [w.strip(".,;:!?()[]\"'").lower() for w in text.split()] or [""]
+    vec = np.zeros(dim, dtype=np.float32)
+    for w in words:
+        vec += _word_vector(w, dim)
+    norm = float(np.linalg.norm(vec)) or 1.0
+    return (vec / norm).tolist()
+
+
+def instance_for_schema(schema: dict, root: dict = None):
+    """Smallest plausible value that validates against a (Pydantic-generated) JSON schema."""
+    root = root or schema
+    if "$ref" in schema:
+        name = schema["$ref"].split("/")[-1]
+        return instance_for_schema(root.get("$defs", {}).get(name, {}), root)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return instance_for_schema(schema[key][0], root)
+    kind = schema.get("type", "object")
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {k: instance_for_schema(v, root) for k, v in props.items()}
+    if kind == "array":
+        return [instance_for_schema(schema.get("items", {"type": "string"}), root)]
+    if kind == "integer":
+        return 50
+    if kind == "number":
+        return 0.5
+    if kind == "boolean":
+        return True
+    return "Synthetic benchmark text."
+
+
+def _fake_text(n_tokens: int) -> str:
+    return " ".join(["lorem"] * n_tokens)
+
+
+def make_handler(cfg: FakeOllamaConfig):
+    slots = threading.BoundedSemaphore(cfg.max_parallel) if cfg.max_parallel > 0 else None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, obj, status=200):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                return self._json({"models": [{"name": "gemma3:4b"}, {"name": "nomic-embed-text:latest"}]})
+            self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            body = self._body()
+            if self.path == "/api/embeddings":
+                time.sleep(cfg.embed_latency_ms / 1000)
+                return self._json({"embedding": fake_embedding(body.get("prompt", ""), cfg.embed_dim)})
+            if self.path == "/api/embed":
+                inputs = body.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                # batched: one round trip, cheaper per text than /api/embeddings
+                time.sleep(cfg.embed_latency_ms * max(1, len(inputs)) / 4000)
+                return self._json({"embeddings": [fake_embedding(t, cfg.embed_dim) for t in inputs]})
+            if self.path in ("/api/generate", "/api/chat"):
+                if slots:
+                    slots.acquire()
+                try:
+                    return self._generate(body)
+                finally:
+                    if slots:
+                        slots.release()
+            self._json({"error": "not found"}, 404)
+
+        def _generate(self, body):
+            chat = self.path == "/api/chat"
+            prompt = body.get("prompt", "") if not chat else " ".join(
+                m.get("content", "") for m in body.get("messages", []))
+            n_predict = (body.get("options") or {}).get("num_predict") or cfg.completion_tokens
+            if body.get("format"):
+                fmt = body["format"]
+                text = json.dumps(instance_for_schema(fmt) if isinstance(fmt, dict) else {})
+            else:
+                text = _fake_text(n_predict)
+            prompt_tokens = len(prompt.split())
+            context = list(body.get("context") or []) + list(range(prompt_tokens + n_predict))
+            final = {"model": body.get("model"), "done": True, "prompt_eval_count": prompt_tokens,
+                     "eval_count": n_predict}
+            if not chat:
+                final["context"] = context[-8192:]
+
+            time.sleep(cfg.generate_latency_ms / 1000)
+            decode_s = n_predict / cfg.tokens_per_second if cfg.tokens_per_second else 0
+
+            if not body.get("stream", True):
+                time.sleep(decode_s)
+                key = "message" if chat else "response"
+                value = {"role": "assistant", "content": text} if chat else text
+                return self._json({**final, key: value})
+
+            # NDJSON stream, chunked transfer
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = text.split(" ")
+            for i, piece in enumerate(pieces):
+                chunk = (piece if i == 0 else " " + piece)
+                msg = {"message": {"role": "assistant", "content": chunk}} if chat else {"response": chunk}
+                self._chunk({**msg, "done": False})
+                time.sleep(decode_s / max(1, len(pieces)))
+            self._chunk({**final, "response": ""} if not chat else final)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, obj):
+            data = (json.dumps(obj) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_fake_ollama(port: int = 0, cfg: FakeOllamaConfig = None):
+    """Start in a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(cfg or FakeOllamaConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--max-parallel", type=int, default=0)
+    args = parser.parse_args()
+
+    cfg = FakeOllamaConfig(args.embed_dim, args.embed_latency_ms, args.generate_latency_ms,
+                           args.tokens_per_second, args.completion_tokens, args.max_parallel)
+    server, url = start_fake_ollama(args.port, cfg)
+    print(f"fake ollama listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# backend/benchmarks/hnsw_sweep.py
+"""HNSW parameter sweep: recall against exact search vs. query latency.
+
+Vectors come from a store (--chroma-path, default chroma_db: the chunk
+collection or its shards, read only) or, with --synthetic N, from a mix of
+Gaussian clusters. --queries of them are held out as queries; the ground
+truth is the exact cosine top-k over the rest (numpy, one matmul).
+
+For every (M, ef_construction) a fresh collection is built in a throwaway
+directory – build time, HNSW files on disk, estimated memory
+(vector_db.hnsw.estimate_memory_bytes). For every ef_search the collection
+is reopened with that value (Chroma reads ef_search when it loads an index)
+and the queries run one at a time, as /query sends them: recall@k and
+p50 / p95 latency. "exact" is the brute-force numpy scan per query for
+reference; "suggested" is the fastest setting reaching --target recall.
+
+    python -m benchmarks.hnsw_sweep --chroma-path chroma_db --queries 200
+    python -m benchmarks.hnsw_sweep --synthetic 50000 --dim 768 --m 8 16 32
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+def _percentiles(samples_s):
+    import numpy as np
+
+    ms = np.array(samples_s) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p95_ms": round(float(np.percentile(ms, 95)), 3)}
+
+
+def _load_store(path: str, limit: int):
+    """Embeddings of the chunk collection (or its shards) in an existing store."""
+    import chromadb
+    import numpy as np
+
+    from vector_db.client import COLLECTION_NAME
+    from vector_db.generations import live_name
+    from vector_db.sharding import shard_name
+
+    client = chromadb.PersistentClient(path=path)
+    existing = {c.name for c in client.list_collections()}
+    names = [live_name(COLLECTION_NAME, path)] + [live_name(shard_name(COLLECTION_NAME, i), path) for i in range(100)]
+    names = [n for n in names if n in existing]
+    if not names:
+        raise SystemExit(f"No collection {COLLECTION_NAME} in {path}")
+    parts = []
+    for name in sorted(names):
+        found = client.get_collection(name).get(include=["embeddings"], limit=limit)["embeddings"]
+        if len(found):
+            parts.append(np.asarray(found, dtype=np.float32))
+    client.clear_system_cache()
+    return np.concatenate(parts)[:limit]
+
+
+def _synthetic(n: int, dim: int, clusters: int, seed: int):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + rng.normal(size=(n, dim)) * 2.0).astype(np.float32)
+
+
+def _disk_bytes(path: str) -> int:
+    # HNSW segment folders only (the sqlite file holds documents / metadata / log)
+    total = 0
+    for entry in os.scandir(path):
+        if entry.is_dir():
+            total += sum(os.path.getsize(os.path.join(entry.path, f)) for f in os.listdir(entry.path))
+    return total
+
+
+def run(args) -> dict:
+    import chromadb
+    import numpy as np
+
+    from vector_db.hnsw import estimate_memory_bytes, hnsw_configuration
+
+    if args.synthetic:
+        vectors = _synthetic(args.synthetic, args.dim, args.clusters, args.seed)
+        origin = f"synthetic ({args.clusters} clusters)"
+    else:
+        vectors = _load_store(args.chroma_path, args.max_vectors)
+        origin = args.chroma_path
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(1e-12)
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(vectors))
+    queries, base = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    k = args.k
+
+    # ---- exact ground truth + brute-force latency ---- #
+    exact = np.argsort(-(queries @ base.T), axis=1)[:, :k]
+    timings = []
+    for q in queries:
+        t0 = time.perf_counter()
+        scores = base @ q
+        np.argpartition(-scores, k - 1)[:k]
+        timings.append(time.perf_counter() - t0)
+    report = {"meta": {"vectors": len(base), "dim": base.shape[1], "queries": len(queries), "k": k,
+                       "origin": origin},
+              "exact": _percentiles(timings), "results": []}
+
+    ids = [str(i) for i in range(len(base))]
+    for m in args.m:
+        for construction_ef in args.construction_ef:
+            workdir = tempfile.mkdtemp(prefix="hnsw-sweep-")
+            client = chromadb.PersistentClient(path=workdir)
+            collection = client.create_collection("sweep", configuration=hnsw_configuration(m, construction_ef))
+            t0 = time.perf_counter()
+            for i in range(0, len(base), args.batch):
+                collection.add(ids=ids[i:i + args.batch], embeddings=base[i:i + args.batch])
+            build_s = time.perf_counter() - t0
+            built = {"M": m, "ef_construction": construction_ef, "build_s": round(build_s, 2),
+                     "disk_bytes": _disk_bytes(workdir),
+                     "memory_bytes_est": estimate_memory_bytes(len(base), base.shape[1], m)}
+
+            for search_ef in args.search_ef:
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                client.clear_system_cache()   # drop the loaded index so the new ef_search is used
+                client = chromadb.PersistentClient(path=workdir)
+                collection = client.get_collection("sweep")
+                collection.query(query_embeddings=queries[:20], n_results=k)   # load + warm the index
+                timings, recall = [], []
+                for q, truth in zip(queries, exact):
+                    t0 = time.perf_counter()
+                    found = collection.query(query_embeddings=q[None, :], n_results=k, include=[])["ids"][0]
+                    timings.append(time.perf_counter() - t0)
+                    recall.append(len(set(map(int, found)).intersection(truth.tolist())) / k)
+                report["results"].append({**built, "ef_search": search_ef,
+                                          f"recall@{k}": round(float(np.mean(recall)), 4), **_percentiles(timings)})
+            client.clear_system_cache()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    good = [r for r in report["results"] if r[f"recall@{k}"] >= args.target]
+    report["suggested"] = min(good, key=lambda r: r["p50_ms"]) if good else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chroma-path", default="chroma_db")
+    parser.add_argument("--max-vectors", type=int, default=100_000, help="vectors read from the store")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of a store")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--target", type=float, default=0.95, help="recall the suggestion must reach")
+    parser.add_argument("--batch", type=int, default=5000, help="vectors per add() call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# backend/benchmarks/import_time.py
+"""Cold-start benchmark: how long `import main` takes in a fresh interpreter.
+
+Each run is a new Python process (no warm module cache), started in an empty
+working directory. Reports median / min / max import time, peak RSS after the
+import and which heavy dependencies ended up loaded.
+
+    python -m benchmarks.import_time --runs 7
+    python -m benchmarks.import_time --runs 7 --compare-ref HEAD~1   # before/after via git worktree
+    python -m benchmarks.import_time --env ENABLED_FEATURES=query,grammar_style
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["chromadb", "numpy", "sklearn", "fitz", "reportlab", "docx", "textstat", "tiktoken"]
+
+_PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import main
+elapsed = time.perf_counter() - t0
+print(json.dumps({
+    "import_s": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def measure(code_root: str, runs: int, extra_env=None) -> dict:
+    env = {**os.environ, **(extra_env or {})}
+    env["PYTHONPATH"] = code_root
+    env.setdefault("SECRET_KEY", "benchmark-secret")
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="import_bench_") as cwd:
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", _PROBE % HEAVY_MODULES], cwd=cwd, env=env,
+                                 capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    times = [s["import_s"] * 1000 for s in samples]
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "max_ms": round(max(times), 1),
+        "max_rss_mb": round(statistics.median(s["max_rss_mb"] for s in samples), 1),
+        "heavy_modules_loaded": samples[-1]["loaded"],
+    }
+
+
+def measure_ref(ref: str, runs: int, extra_env=None) -> dict:
+    """Same measurement against another commit, checked out in a temporary worktree."""
+    with tempfile.TemporaryDirectory(prefix="import_bench_ref_") as tmp:
+        path = os.path.join(tmp, "tree")
+        subprocess.run(["git", "worktree", "add", "--detach", path, ref], cwd=REPO_ROOT,
+                       check=True, capture_output=True)
+        try:
+            return measure(path, runs, extra_env)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", path], cwd=REPO_ROOT, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare-ref", help="git ref to measure as the baseline")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the probe")
+    args = parser.parse_args()
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+
+    report = {"current": measure(REPO_ROOT, args.runs, extra_env)}
+    if args.compare_ref:
+        report["baseline"] = {"ref": args.compare_ref, **measure_ref(args.compare_ref, args.runs, extra_env)}
+        report["speedup"] = round(report["baseline"]["median_ms"] / report["current"]["median_ms"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
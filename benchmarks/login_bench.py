@@ -0,0 +1,114 @@
+# backend/benchmarks/login_bench.py
+"""Login throughput under concurrency, and what it does to everyone else.
+
+Starts the app (see benchmarks/run.py), signs up --users accounts, then fires
+--logins concurrent logins while a probe thread keeps hitting `GET /`. bcrypt
+runs in the hash pool, so the probe latency should stay flat while logins
+queue; if hashing blocked the event loop the probe would wait ~250 ms behind
+every login. Finally /api/auth/me is hammered with one token (JWT claims cache).
+
+    python -m benchmarks.login_bench --users 20 --logins 200 --concurrency 16
+    python -m benchmarks.login_bench --env HASH_WORKERS=1 --env JWT_CACHE_TTL_S=0
+"""
+import argparse
+import json
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.run import AppServer, drive, summarize
+
+
+def _probe(url: str, stop: threading.Event, out: list, interval_s: float = 0.05):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            session.get(url + "/", timeout=30)
+            out.append(time.perf_counter() - start)
+        except requests.RequestException:
+            pass
+        time.sleep(interval_s)
+
+
+def _ms(values) -> dict:
+    lat = np.array(values) * 1000
+    if not len(lat):
+        return {}
+    return {"samples": len(lat), "p50_ms": round(float(np.percentile(lat, 50)), 1),
+            "p95_ms": round(float(np.percentile(lat, 95)), 1), "max_ms": round(float(lat.max()), 1)}
+
+
+def run(args) -> dict:
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    extra_env.setdefault("WARMUP_STEPS", "none")
+    workdir = tempfile.mkdtemp(prefix="login-bench-")
+    # no Ollama needed – auth never calls it
+    app = AppServer(workdir, "http://127.0.0.1:9", 1, extra_env)
+    try:
+        app.wait_ready()
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency * 2)
+        session.mount("http://", adapter)
+        users = [(f"bench{i}", f"password-{i}") for i in range(args.users)]
+
+        def signup(user):
+            def call():
+                r = session.post(f"{app.url}/api/auth/signup", json={"username": user[0], "password": user[1]})
+                return r.status_code == 200
+            return call
+        results, wall = drive([signup(u) for u in users], args.concurrency)
+        report = {"signup": summarize(results, wall)}
+
+        def login(i):
+            user = users[i % len(users)]
+            def call():
+                r = session.post(f"{app.url}/api/auth/login", json={"username": user[0], "password": user[1]})
+                return r.status_code == 200
+            return call
+
+        idle = []
+        stop = threading.Event()
+        probe = threading.Thread(target=_probe, args=(app.url, stop, idle))
+        probe.start()
+        time.sleep(1.0)
+        stop.set(); probe.join()
+
+        busy = []
+        stop = threading.Event()
+        probe = threading.Thread(target=_probe, args=(app.url, stop, busy))
+        probe.start()
+        results, wall = drive([login(i) for i in range(args.logins)], args.concurrency)
+        stop.set(); probe.join()
+        report["login"] = summarize(results, wall)
+        report["probe_idle"] = _ms(idle)
+        report["probe_during_logins"] = _ms(busy)
+
+        token = session.post(f"{app.url}/api/auth/login",
+                             json={"username": users[0][0], "password": users[0][1]}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        results, wall = drive([lambda: session.get(f"{app.url}/api/auth/me", headers=headers).ok] * args.me,
+                              args.concurrency)
+        report["me"] = summarize(results, wall)
+        return {"meta": {"users": args.users, "logins": args.logins, "concurrency": args.concurrency,
+                         "env": extra_env}, "results": report}
+    finally:
+        app.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--me", type=int, default=2000, help="/api/auth/me requests with one token")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the app")
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# backend/benchmarks/mirror_bench.py
+"""Full-scan benchmark: Chroma get(include=["embeddings"]) vs the memory-mapped mirror.
+
+Baseline = what a full scan had to do before: pull every embedding out of
+Chroma (float64), normalise, matmul, top-k. Mirror = vector_db/mirror.py
+scan_topk() over the float16 / int8 file. Peak Python/NumPy heap is measured
+with tracemalloc; the mirror's file is reported separately (it is page
+cache, shared between workers, not process heap).
+
+Filling Chroma with a million chunks takes far longer than the scan itself,
+so the baseline runs at --chroma-chunks and is also extrapolated linearly to
+--chunks (marked as such); the mirror runs at the full --chunks.
+
+    python -m benchmarks.mirror_bench --chunks 1000000 --chroma-chunks 50000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def _unit(rng, n, dim):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _measure(fn):
+    """(result, seconds, peak heap bytes) – timed and traced in separate runs (tracemalloc is slow)."""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def baseline(args, queries) -> dict:
+    import chromadb
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory(prefix="mirror_bench_chroma_") as path:
+        collection = chromadb.PersistentClient(path=path).create_collection(
+            "bench", metadata={"hnsw:space": "cosine"})
+        for first in range(0, args.chroma_chunks, 5000):
+            n = min(5000, args.chroma_chunks - first)
+            collection.add(ids=[f"c{first + i}" for i in range(n)], embeddings=_unit(rng, n, args.dim))
+
+        def scan():
+            data = collection.get(include=["embeddings"])
+            stored = np.asarray(data["embeddings"], dtype=np.float32)
+            stored /= np.linalg.norm(stored, axis=1, keepdims=True)
+            scores = queries @ stored.T
+            top = np.argpartition(-scores, args.k - 1, axis=1)[:, :args.k]
+            return [[data["ids"][j] for j in row] for row in top]
+
+        _, elapsed, peak = _measure(scan)
+    scale = args.chunks / args.chroma_chunks
+    return {"chunks": args.chroma_chunks, "scan_s": round(elapsed, 3), "peak_heap_mb": round(peak / 2**20, 1),
+            f"extrapolated_to_{args.chunks}": {"scan_s": round(elapsed * scale, 2),
+                                               "peak_heap_mb": round(peak * scale / 2**20, 1)}}
+
+
+def mirror_run(args, queries, dtype: str) -> dict:
+    from vector_db.mirror import EmbeddingMirror
+
+    rng = np.random.default_rng(args.seed)
+    mirror = EmbeddingMirror(os.path.join(args.workdir, f"mirror_{dtype}"), dtype)
+    mirror.clear()
+    start = time.perf_counter()
+    for first in range(0, args.chunks, 20000):
+        n = min(20000, args.chunks - first)
+        mirror.add([f"c{first + i}" for i in range(n)], _unit(rng, n, args.dim),
+                   [{"owner": str(first // 20000 % 10), "project": "default"}] * n)
+    build_s = time.perf_counter() - start
+
+    _, elapsed, peak = _measure(lambda: mirror.scan_topk(queries, k=args.k))
+    _, part_s, _ = _measure(lambda: mirror.scan_topk(queries, k=args.k, owner="3", project="default"))
+    stats = mirror.stats()
+    return {"dtype": dtype, "chunks": args.chunks, "build_s": round(build_s, 1), "scan_s": round(elapsed, 3),
+            "scan_one_owner_s": round(part_s, 3), "peak_heap_mb": round(peak / 2**20, 1),
+            "file_mb": round(stats["file_bytes"] / 2**20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--chroma-chunks", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=32, help="e.g. sentences of one plagiarism check")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--dtypes", default="float16,int8")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    args.workdir = args.workdir or tempfile.mkdtemp(prefix="mirror_bench_")
+    # the mirror's row table lives in SQLite – keep it out of the real database
+    os.environ.setdefault("DATABASE_PATH", os.path.join(args.workdir, "bench.db"))
+    from db.schema import init_embedding_mirror_table
+    init_embedding_mirror_table()
+
+    queries = _unit(np.random.default_rng(args.seed + 1), args.queries, args.dim)
+    report = {"config": vars(args), "baseline_chroma_get": baseline(args, queries),
+              "mirror": [mirror_run(args, queries, d) for d in args.dtypes.split(",")]}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# backend/benchmarks/retrieval_bench.py
+"""Retrieval quality + latency: vector vs. BM25 (FTS5) vs. hybrid (RRF).
+
+Runs in-process against a throwaway working directory: synthetic papers
+(benchmarks/synthetic_pdfs.paper_text, no PDF round trip) are chunked and
+stored through utils.ingest.store_chunks, embedded by the fake Ollama –
+so the FTS index is filled exactly as at upload. Two query families:
+
+- exact:  "Which experiments report results on DS-17?" – relevant = every
+          chunk containing that dataset id (what embeddings miss)
+- topic:  "<topic> method results" – relevant = chunks of papers on that
+          topic (what embeddings are good at)
+
+recall@k = |relevant ∩ top k| / min(|relevant|, k). Latency includes
+embedding the question; hybrid runs the lexical search concurrently, as
+/query does.
+
+    python -m benchmarks.retrieval_bench --papers 60 --queries 100
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+
+def _percentiles(samples_s):
+    import numpy as np
+
+    ms = np.array(samples_s) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 2), "p95_ms": round(float(np.percentile(ms, 95)), 2)}
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="retrieval-bench-")
+    os.chdir(workdir)
+    os.environ.setdefault("SENTENCE_INDEX", "off")
+    os.environ.setdefault("SECRET_KEY", "retrieval-bench")   # config.py insists; no tokens are issued
+    from benchmarks.fake_ollama import start_fake_ollama
+    from benchmarks.synthetic_pdfs import TOPICS, paper_text
+    server, url = start_fake_ollama()
+    os.environ["OLLAMA_BASE_URL"] = url
+
+    from db.schema import init_documents_table, init_embedding_mirror_table, init_keyword_tables, init_lexical_tables
+    from utils.chunking import chunk_text
+    from utils.embedding import get_embeddings
+    from utils.ingest import store_chunks
+    from utils.lexical_index import fuse, search, search_async
+    from utils.partition import partition_filter
+    from vector_db.client import get_collection
+
+    init_keyword_tables(); init_documents_table(); init_embedding_mirror_table(); init_lexical_tables()
+    partition = {"owner": "bench", "project": "default"}
+
+    # ---- corpus ---- #
+    start = time.perf_counter()
+    chunk_topic, chunk_text_by_id = {}, {}
+    for p in range(args.papers):
+        chunks = chunk_text(paper_text(p, args.pages, seed=args.seed), args.chunk_size, args.chunk_size // 5)
+        stored = store_chunks(f"paper_{p:03d}.pdf", chunks, partition)
+        for cid, chunk in zip(stored["ids"], chunks):
+            chunk_topic[cid] = TOPICS[p % len(TOPICS)]
+            chunk_text_by_id[cid] = chunk
+    ingest_s = time.perf_counter() - start
+    collection = get_collection()
+
+    # ---- queries ---- #
+    rng = random.Random(args.seed)
+    queries = []
+    for _ in range(args.queries):
+        if rng.random() < 0.5:
+            ds = f"DS-{rng.randint(1, 40)}"
+            relevant = {cid for cid, text in chunk_text_by_id.items() if re.search(rf"\b{ds}\b", text)}
+            queries.append(("exact", f"Which experiments report results on {ds}?", relevant))
+        else:
+            topic = rng.choice(TOPICS[:min(args.papers, len(TOPICS))])
+            relevant = {cid for cid, t in chunk_topic.items() if t == topic}
+            queries.append(("topic", f"{topic} method results", relevant))
+    queries = [q for q in queries if q[2]]
+
+    where = partition_filter(partition)
+    include = ["documents", "metadatas"]
+
+    def vector(question, k):
+        emb = get_embeddings([question])[0]
+        return collection.query(query_embeddings=[emb], n_results=k, where=where, include=include)["ids"][0]
+
+    def lexical(question, k):
+        return search(question, partition, k)
+
+    def hybrid(question, k):
+        pending = search_async(question, partition, k)
+        emb = get_embeddings([question])[0]
+        results = collection.query(query_embeddings=[emb], n_results=k, where=where, include=include)
+        return fuse(collection, results, pending.result(), k, include)["ids"][0]
+
+    report = {}
+    for name, fn in (("vector", vector), ("lexical", lexical), ("hybrid", hybrid)):
+        entry = {}
+        for k in args.k:
+            recall = {"exact": [], "topic": []}
+            timings = []
+            for family, question, relevant in queries:
+                t0 = time.perf_counter()
+                top = fn(question, k)
+                timings.append(time.perf_counter() - t0)
+                recall[family].append(len(relevant.intersection(top)) / min(len(relevant), k))
+            entry[f"k={k}"] = {
+                **{f"recall_{fam}": round(sum(v) / len(v), 3) for fam, v in recall.items() if v},
+                **_percentiles(timings),
+            }
+        report[name] = entry
+
+    server.shutdown()
+    return {"meta": {"papers": args.papers, "chunks": collection.count(), "queries": len(queries),
+                     "ingest_s": round(ingest_s, 1), "workdir": workdir}, "results": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="tokens, as chunk_text")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
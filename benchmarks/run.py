@@ -0,0 +1,262 @@
+# backend/benchmarks/run.py
+"""End-to-end benchmark: real FastAPI app + fake Ollama + synthetic PDFs.
+
+Starts the app under uvicorn in a throwaway working directory (its own
+research_bot.db, chroma_db/ and uploaded_pdfs/), points it at
+benchmarks/fake_ollama.py, generates a synthetic corpus and drives
+concurrent load per endpoint. Prints one JSON report:
+
+    {"meta": {...}, "endpoints": {"upload": {"throughput_rps":..,"p50_ms":..,"p95_ms":..,"p99_ms":..}, ...}}
+
+Compare two commits by passing the older report as --baseline.
+
+    python -m benchmarks.run --papers 20 --requests 40 --concurrency 4 > after.json
+    python -m benchmarks.run --papers 20 --requests 40 --concurrency 4 --baseline before.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama
+from benchmarks.synthetic_pdfs import TOPICS, generate_corpus, paper_text
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ["upload", "query", "plagiarism", "literature-review"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+class AppServer:
+    """uvicorn main:app in a subprocess, cwd = isolated work dir."""
+
+    def __init__(self, workdir: str, ollama_url: str, workers: int = 1, extra_env=None):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = {**os.environ, **(extra_env or {})}
+        env.update({
+            "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+            "OLLAMA_BASE_URL": ollama_url,
+            "SECRET_KEY": env.get("SECRET_KEY", "benchmark-secret"),
+        })
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=workdir, env=env,
+        )
+
+    def wait_ready(self, timeout_s: float = 120):
+        deadline = time.time() + timeout_s
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("app exited during startup")
+            try:
+                # /ready flips to 200 once the startup warm-up has finished
+                if requests.get(self.url + "/ready", timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("app did not become ready")
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def drive(calls, concurrency: int):
+    """Run the callables with `concurrency` workers; returns per-call (latency_s, ok) + wall time."""
+    def timed(call):
+        start = time.perf_counter()
+        try:
+            ok = call()
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, calls))
+    return results, time.perf_counter() - start
+
+
+def summarize(results, wall_s: float) -> dict:
+    lat = np.array([r[0] for r in results]) * 1000
+    errors = sum(1 for r in results if not r[1])
+    if not len(lat):
+        return {"requests": 0}
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "throughput_rps": round(len(results) / wall_s, 3),
+        "mean_ms": round(float(lat.mean()), 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "p99_ms": round(float(np.percentile(lat, 99)), 1),
+        "max_ms": round(float(lat.max()), 1),
+    }
+
+
+# ==================== Scenarios ==================== #
+
+def upload_calls(base, session, pdfs, headers):
+    def make(path):
+        def call():
+            with open(path, "rb") as fh:
+                r = session.post(f"{base}/upload/", headers=headers,
+                                 files={"files": (os.path.basename(path), fh, "application/pdf")}, timeout=600)
+            return r.status_code < 300
+        return call
+    return [make(p) for p in pdfs]
+
+
+def query_calls(base, session, n, rng, headers):
+    def make(i):
+        topic = rng.choice(TOPICS)
+        body = {"question": f"What methods are used for {topic} and how accurate are they?",
+                "session_id": f"bench-{i % 8}", "chunks": 5}
+        return lambda: session.post(f"{base}/query/", json=body, headers=headers, timeout=600).ok
+    return [make(i) for i in range(n)]
+
+
+def plagiarism_calls(base, session, n, rng, papers, pages, seed, headers):
+    def make(i):
+        # half copied from a stored paper (same pages / seed as the corpus), half fresh text
+        copied = paper_text(rng.randrange(papers), pages, seed=seed).split("\n\n")[3][:600]
+        fresh = " ".join(rng.choice(["novel", "sentence", "about", "nothing", "in", "particular"]) for _ in range(60))
+        body = {"text": f"{copied} {fresh}."}
+        return lambda: session.post(f"{base}/plagiarism/check", json=body, headers=headers, timeout=600).ok
+    return [make(i) for i in range(n)]
+
+
+def literature_calls(base, session, n, headers):
+    return [lambda: session.get(f"{base}/literature-review/", params={"length": "short"},
+                                headers=headers, timeout=900).ok for _ in range(n)]
+
+
+def run(args) -> dict:
+    workdir = args.workdir or tempfile.mkdtemp(prefix="research_bot_bench_")
+    pdfs = generate_corpus(os.path.join(workdir, "corpus"), args.papers, args.pages, args.seed)
+
+    cfg = FakeOllamaConfig(embed_dim=args.embed_dim, embed_latency_ms=args.embed_latency_ms,
+                           generate_latency_ms=args.generate_latency_ms,
+                           tokens_per_second=args.tokens_per_second, max_parallel=args.ollama_parallel)
+    ollama, ollama_url = start_fake_ollama(0, cfg)
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    app_dir = os.path.join(workdir, "app")
+    os.makedirs(app_dir, exist_ok=True)
+    app = AppServer(app_dir, ollama_url, args.workers, extra_env)
+    rng = random.Random(args.seed)
+    report = {}
+    try:
+        app.wait_ready()
+        session = requests.Session()
+        # every data endpoint is scoped to the caller's partition
+        token = session.post(f"{app.url}/api/auth/signup", timeout=30,
+                             json={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        wanted = args.endpoints.split(",")
+
+        # the corpus has to be ingested for every other scenario
+        results, wall = drive(upload_calls(app.url, session, pdfs, headers), args.concurrency)
+        if "upload" in wanted:
+            report["upload"] = {**summarize(results, wall),
+                                "pdfs_per_s": round(len(pdfs) / wall, 3)}
+
+        if "query" in wanted:
+            report["query"] = summarize(*drive(query_calls(app.url, session, args.requests, rng, headers),
+                                               args.concurrency))
+        if "plagiarism" in wanted:
+            report["plagiarism"] = summarize(*drive(
+                plagiarism_calls(app.url, session, args.requests, rng, args.papers, args.pages,
+                                 args.seed, headers), args.concurrency))
+        if "literature-review" in wanted:
+            n = max(1, args.requests // 10)   # each one reads the whole corpus
+            report["literature-review"] = summarize(*drive(literature_calls(app.url, session, n, headers),
+                                                           args.concurrency))
+    finally:
+        app.stop()
+        ollama.shutdown()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "workdir": workdir,
+            **{k: v for k, v in vars(args).items() if k not in ("baseline", "workdir")},
+        },
+        "endpoints": report,
+    }
+
+
+def add_deltas(report: dict, baseline_path: str):
+    with open(baseline_path) as fh:
+        base = json.load(fh)
+    report["baseline_commit"] = base.get("meta", {}).get("commit")
+    for name, stats in report["endpoints"].items():
+        old = base.get("endpoints", {}).get(name)
+        if not old:
+            continue
+        stats["delta_pct"] = {
+            k: round((stats[k] - old[k]) / old[k] * 100, 1)
+            for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms") if old.get(k)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--papers", type=int, default=10, help="synthetic PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--requests", type=int, default=20, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-dim", type=int, default=768)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--ollama-parallel", type=int, default=0, help="emulated OLLAMA_NUM_PARALLEL (0 = unlimited)")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the app")
+    parser.add_argument("--workdir", help="reuse a work dir (default: fresh temp dir)")
+    parser.add_argument("--baseline", help="earlier report to compute deltas against")
+    parser.add_argument("--out", help="write the report here as well as stdout")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.baseline:
+        add_deltas(report, args.baseline)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# backend/benchmarks/shard_bench.py
+"""Vector store sharding benchmark: ingest throughput + query latency at 1/4/16 shards.
+
+Works on the vector layer directly (no HTTP, no Ollama): random unit vectors
+spread over `--sources` documents are ingested in upload-sized batches, then
+single-vector queries are timed with and without a `source` filter. Shard
+count 1 is the plain Chroma collection the app uses by default.
+
+    python -m benchmarks.shard_bench --chunks 20000 --shards 1,4,16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from vector_db.sharding import ShardedCollection
+
+
+def _percentiles(samples_s):
+    ms = np.array(samples_s) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "mean_ms": round(float(ms.mean()), 2)}
+
+
+def _unit(rng, n, dim):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def run_one(n_shards: int, args) -> dict:
+    import chromadb
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory(prefix="shard_bench_") as path:
+        client = chromadb.PersistentClient(path=path)
+        if n_shards == 1:
+            collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+        else:
+            collection = ShardedCollection(client, "bench", n_shards)
+
+        # ---- ingest: one batch ≈ one uploaded paper ---- #
+        start = time.perf_counter()
+        for first in range(0, args.chunks, args.batch):
+            n = min(args.batch, args.chunks - first)
+            source = f"paper_{(first // args.batch) % args.sources:05d}.pdf"
+            collection.add(ids=[f"c{first + i}" for i in range(n)],
+                           embeddings=_unit(rng, n, args.dim).tolist(),
+                           documents=[f"chunk {first + i}" for i in range(n)],
+                           metadatas=[{"source": source}] * n)
+        ingest_s = time.perf_counter() - start
+
+        # ---- queries ---- #
+        queries = _unit(rng, args.queries, args.dim).tolist()
+        sources = [f"paper_{i:05d}.pdf" for i in range(min(args.sources, args.chunks // args.batch + 1))]
+        timings = {"unfiltered": [], "filtered": []}
+        for q in queries:
+            t0 = time.perf_counter()
+            collection.query(query_embeddings=[q], n_results=args.k, include=["documents", "metadatas"])
+            timings["unfiltered"].append(time.perf_counter() - t0)
+            picked = list(rng.choice(sources, size=min(3, len(sources)), replace=False))
+            t0 = time.perf_counter()
+            collection.query(query_embeddings=[q], n_results=args.k, where={"source": {"$in": picked}},
+                             include=["documents", "metadatas"])
+            timings["filtered"].append(time.perf_counter() - t0)
+
+        return {
+            "shards": n_shards,
+            "ingest_rows_per_s": round(args.chunks / ingest_s, 1),
+            "ingest_s": round(ingest_s, 2),
+            "query_unfiltered": _percentiles(timings["unfiltered"]),
+            "query_source_filtered": _percentiles(timings["filtered"]),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,4,16")
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--sources", type=int, default=400)
+    parser.add_argument("--batch", type=int, default=50, help="chunks per add() call (≈ one paper)")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = [run_one(int(n), args) for n in args.shards.split(",")]
+    print(json.dumps({"config": vars(args), "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
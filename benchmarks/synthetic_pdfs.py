@@ -0,0 +1,91 @@
+# backend/benchmarks/synthetic_pdfs.py
+"""Deterministic synthetic research-paper PDFs for benchmarks.
+
+Each paper gets a topic, a few sections of generated sentences drawn from a
+shared + topic-specific vocabulary, so documents overlap partially (useful
+for plagiarism / retrieval) without being identical.
+
+    python -m benchmarks.synthetic_pdfs --out /tmp/corpus --papers 20 --pages 6
+"""
+import argparse
+import os
+import random
+from typing import List
+
+import fitz  # PyMuPDF
+
+TOPICS = [
+    "federated learning", "intrusion detection", "graph neural networks", "protein folding",
+    "reinforcement learning", "edge computing", "medical imaging", "language models",
+    "quantum error correction", "climate modelling", "recommender systems", "robotics",
+]
+COMMON = ("we propose method results dataset baseline experiment evaluation accuracy performance model "
+          "approach framework analysis training inference latency benchmark significant improvement "
+          "compared previous work limitation future research contribution novel robust efficient").split()
+SECTIONS = ["Abstract", "Introduction", "Related Work", "Methodology", "Experiments", "Discussion", "Conclusion"]
+
+
+def _sentence(rng: random.Random, topic_words: List[str]) -> str:
+    n = rng.randint(10, 22)
+    words = [rng.choice(topic_words) if rng.random() < 0.35 else rng.choice(COMMON) for _ in range(n)]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"DS-{rng.randint(1, 40)}")   # dataset ids / acronyms
+    s = " ".join(words)
+    return s[0].upper() + s[1:] + "."
+
+
+def paper_text(index: int, pages: int, seed: int = 0) -> str:
+    rng = random.Random(seed * 100_003 + index)
+    topic = TOPICS[index % len(TOPICS)]
+    topic_words = topic.split() + [f"{topic.split()[0]}{k}" for k in range(12)]
+    parts = [f"A Study of {topic.title()} #{index}", f"Author {index} et al."]
+    per_section = max(2, (pages * 22) // len(SECTIONS))   # ~22 sentences per page
+    for section in SECTIONS:
+        parts.append(section)
+        for _ in range(max(1, per_section // 4)):
+            parts.append(" ".join(_sentence(rng, topic_words) for _ in range(4)))
+    return "\n\n".join(parts)
+
+
+CHARS_PER_PAGE = 3500   # comfortably fits the text box at 10pt
+
+
+def write_pdf(path: str, text: str):
+    doc = fitz.open()
+    rect = fitz.Rect(50, 50, 545, 792)
+    page_text = ""
+    for paragraph in text.split("\n\n"):
+        if page_text and len(page_text) + len(paragraph) > CHARS_PER_PAGE:
+            doc.new_page().insert_textbox(rect, page_text, fontsize=10)
+            page_text = ""
+        page_text += paragraph + "\n\n"
+    if page_text:
+        doc.new_page().insert_textbox(rect, page_text, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+def generate_corpus(out_dir: str, papers: int, pages: int = 6, seed: int = 0) -> List[str]:
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(papers):
+        path = os.path.join(out_dir, f"synthetic_{seed}_{i:04d}.pdf")
+        if not os.path.exists(path):
+            write_pdf(path, paper_text(i, pages, seed))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--papers", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for p in generate_corpus(args.out, args.papers, args.pages, args.seed):
+        print(p)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
 if not SECRET_KEY:
     raise RuntimeError("SECRET_KEY missing from .env")
+
+# Which feature routers this deployment mounts: comma list of
+# upload, query, literature_review, topic_finder, ai_writer, plagiarism,
+# grammar_style, citation, documents – or "all". Auth is always mounted.
+ENABLED_FEATURES = os.getenv("ENABLED_FEATURES", "all")
@@ -1,14 +1,73 @@
 import sqlite3
 import os
+import queue
 
-DATABASE_PATH = "research_bot.db"  
+from utils.metrics import stage
 
-def get_db_connection():
-    # Make sure DB file exists
-    if not os.path.exists(DATABASE_PATH):
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.close()
-    
-    conn = sqlite3.connect(DATABASE_PATH)
+DATABASE_PATH = os.getenv("DATABASE_PATH", "research_bot.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# Idle connections ready for reuse – opening a SQLite connection (and
+# re-running the pragmas below) on every call is wasted work on hot paths.
+_pool: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that books statement + fetch time under the "db" stage."""
+
+    def execute(self, *args):
+        with stage("db"):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with stage("db"):
+            return super().executemany(*args)
+
+    def fetchone(self):
+        with stage("db"):
+            return super().fetchone()
+
+    def fetchall(self):
+        with stage("db"):
+            return super().fetchall()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def commit(self):
+        with stage("db"):
+            super().commit()
+
+    def close(self):
+        try:
+            self.rollback()   # never hand out a half-finished transaction
+            _pool.put_nowait(self)
+        except (queue.Full, sqlite3.Error):
+            super().close()
+
+
+def _connect() -> PooledConnection:
+    conn = sqlite3.connect(DATABASE_PATH, factory=PooledConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row  # Rows as dicts
-    return conn
\ No newline at end of file
+    # WAL lets readers run while another worker process writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def get_db_connection():
+    """Connection from the pool (callers still just call conn.close())."""
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return _connect()
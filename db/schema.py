@@ -14,4 +14,259 @@ def init_chat_history_table():
         )
     ''')
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def init_keyword_tables():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # corpus term statistics – IDF reference for the local keyword engine
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS term_stats (
+            term TEXT PRIMARY KEY,
+            df INTEGER NOT NULL DEFAULT 0      -- number of chunks containing the term
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS corpus_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            n_docs INTEGER NOT NULL DEFAULT 0  -- number of chunks seen
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO corpus_stats (id, n_docs) VALUES (1, 0)")
+    # keywords precomputed at ingest, one row per uploaded document
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_keywords (
+            source TEXT PRIMARY KEY,
+            keywords TEXT NOT NULL,            -- JSON list
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def init_session_tables():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # writing-assistant chat sessions (see utils/session_store.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS writing_sessions (
+            session_id TEXT PRIMARY KEY,
+            last_access REAL NOT NULL,         -- unix time, drives TTL + LRU
+            message_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS writing_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,                -- "user" or "assistant"
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL            -- counted once at append time
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_writing_messages_session ON writing_messages (session_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_writing_sessions_access ON writing_sessions (last_access)")
+    conn.commit()
+    conn.close()
+
+
+def init_grammar_cache_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # per-paragraph /grammar-style/check results, keyed by hash(model + paragraph)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS grammar_cache (
+            hash TEXT PRIMARY KEY,
+            corrected TEXT NOT NULL,
+            issues TEXT NOT NULL,              -- JSON list
+            suggestions TEXT NOT NULL,         -- JSON list
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_used REAL NOT NULL DEFAULT 0  -- unix time of the last hit, drives TTL + LRU
+        )
+    ''')
+    # tables created before the TTL/LRU purge: add last_used, starting from created_at
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(grammar_cache)").fetchall()]
+    if "last_used" not in columns:
+        cursor.execute("ALTER TABLE grammar_cache ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        cursor.execute("UPDATE grammar_cache SET last_used = CAST(strftime('%s', created_at) AS REAL)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_grammar_cache_used ON grammar_cache (last_used)")
+    conn.commit()
+    conn.close()
+
+
+def init_llm_context_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # Ollama KV `context` token arrays per chat session (see utils/ollama.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_context (
+            scope TEXT NOT NULL,               -- "query" / "grammar"
+            session_id TEXT NOT NULL,
+            model TEXT NOT NULL,
+            context TEXT NOT NULL,             -- JSON token array
+            last_seq INTEGER NOT NULL,         -- newest message already inside the context
+            epoch TEXT,                        -- session lifetime last_seq belongs to (SessionStore.epoch)
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (scope, session_id)
+        )
+    ''')
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(llm_context)").fetchall()]
+    if "epoch" not in columns:
+        cursor.execute("ALTER TABLE llm_context ADD COLUMN epoch TEXT")
+        cursor.execute("DELETE FROM llm_context WHERE scope = 'grammar'")   # no epoch to check them against
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_context_updated ON llm_context (updated_at)")
+    conn.commit()
+    conn.close()
+
+
+def init_embedding_mirror_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # row -> chunk id table of the memory-mapped embedding mirror (vector_db/mirror.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS embedding_mirror (
+            row INTEGER PRIMARY KEY,           -- row in the mirror matrix
+            chunk_id TEXT NOT NULL UNIQUE,
+            owner TEXT,
+            project TEXT,
+            source TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0 -- tombstone, row is zeroed
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_mirror_partition ON embedding_mirror (owner, project, deleted)")
+    conn.commit()
+    conn.close()
+
+
+def init_documents_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # one row per ingested file (utils/ingest.py) – delete by source or file hash
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS documents (
+            owner TEXT NOT NULL,
+            project TEXT NOT NULL,
+            source TEXT NOT NULL,              -- file name as uploaded
+            file_hash TEXT NOT NULL,           -- blake2b of the PDF bytes
+            path TEXT NOT NULL,                -- stored copy under uploaded_pdfs/
+            chunks INTEGER NOT NULL,
+            without_file INTEGER NOT NULL DEFAULT 0,  -- restored from a snapshot without its PDF (not an orphan)
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (owner, project, source)
+        )
+    ''')
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(documents)").fetchall()]
+    if "without_file" not in columns:
+        cursor.execute("ALTER TABLE documents ADD COLUMN without_file INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (file_hash)")
+    conn.commit()
+    conn.close()
+
+
+def init_jobs_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # background jobs for long generations + their stored results (utils/jobs.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,                -- "literature_review" / "topic_finder" / "full_paper"
+            owner TEXT NOT NULL,
+            project TEXT NOT NULL,
+            dedup_key TEXT NOT NULL,           -- hash(kind + params + partition + corpus version)
+            params TEXT NOT NULL,              -- JSON
+            corpus_version TEXT NOT NULL,
+            status TEXT NOT NULL,              -- queued / running / done / error
+            progress REAL NOT NULL DEFAULT 0,  -- 0..1
+            message TEXT,
+            result TEXT,                       -- JSON, once done
+            error TEXT,
+            error_status INTEGER,              -- HTTP status the endpoint would have answered
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            updated_at REAL NOT NULL,          -- last status / progress change
+            heartbeat_at REAL                  -- last sign of life from the process that owns it
+        )
+    ''')
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(jobs)").fetchall()]
+    if "heartbeat_at" not in columns:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+    # at most one live job per key – identical submits attach to it
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_live ON jobs (dedup_key) "
+                   "WHERE status IN ('queued', 'running')")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (dedup_key, status, finished_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, project, created_at)")
+    conn.commit()
+    conn.close()
+
+
+def init_lexical_tables():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # chunk text for BM25 search next to the vector search (utils/lexical_index.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lexical_chunks (
+            id INTEGER PRIMARY KEY,            -- FTS rowid
+            chunk_id TEXT NOT NULL UNIQUE,     -- same id as in Chroma
+            owner TEXT,
+            project TEXT,
+            sources TEXT NOT NULL,             -- JSON list, like the chunk's `sources` metadata
+            text TEXT NOT NULL,
+            sentences INTEGER NOT NULL DEFAULT 0  -- 1 once the sentence index holds this chunk (utils/sentence_index.py)
+        )
+    ''')
+    columns = [r[1] for r in cursor.execute("PRAGMA table_info(lexical_chunks)").fetchall()]
+    if "sentences" not in columns:
+        cursor.execute("ALTER TABLE lexical_chunks ADD COLUMN sentences INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lexical_partition ON lexical_chunks (owner, project)")
+    # external-content FTS5 index over lexical_chunks.text, kept in sync by triggers
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(
+            text, content='lexical_chunks', content_rowid='id', tokenize='porter unicode61'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lexical_chunks_ai AFTER INSERT ON lexical_chunks BEGIN
+            INSERT INTO chunk_fts (rowid, text) VALUES (new.id, new.text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lexical_chunks_ad AFTER DELETE ON lexical_chunks BEGIN
+            INSERT INTO chunk_fts (chunk_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS lexical_chunks_au AFTER UPDATE OF text ON lexical_chunks BEGIN
+            INSERT INTO chunk_fts (chunk_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO chunk_fts (rowid, text) VALUES (new.id, new.text);
+        END
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def init_topic_cluster_table():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # mini-batch k-means state + cached digest per partition (utils/topic_clusters.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS topic_clusters (
+            owner TEXT NOT NULL,
+            project TEXT NOT NULL,
+            k INTEGER NOT NULL,
+            dim INTEGER NOT NULL,
+            centroids BLOB NOT NULL,           -- float32 (k, dim), unit rows
+            counts BLOB NOT NULL,              -- float64 (k,), vectors seen per centroid
+            last_row INTEGER NOT NULL,         -- highest mirror row folded in (-1: no mirror)
+            n_rows INTEGER NOT NULL,           -- live vectors when last updated
+            fit_rows INTEGER NOT NULL,         -- live vectors at the last full fit
+            corpus_version TEXT,               -- version the cached digest was built for
+            digest TEXT,                       -- JSON, NULL once new vectors were folded in
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (owner, project)
+        )
+    ''')
+    conn.commit()
+    conn.close()
@@ -1,35 +1,95 @@
+import asyncio
+import importlib
+import time
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager  
-from routers import upload
-from routers import query
 
+from config import ENABLED_FEATURES
 from routers.auth import router as auth_router, init_user_table
-from db.schema import init_chat_history_table
-from routers import literature_review
-from routers import topic_finder
-from routers import ai_writter
-from routers import plagiarism
-from routers import grammar_style
-from routers import citation
+from routers.debug import router as debug_router
+from routers.jobs import router as jobs_router
+from db.schema import init_chat_history_table, init_keyword_tables, init_session_tables, init_grammar_cache_table, init_llm_context_table, init_embedding_mirror_table, init_documents_table, init_jobs_table, init_lexical_tables, init_topic_cluster_table
+from utils.admission import AdmissionMiddleware, configure_threadpool
+from utils.jobs import purge_expired
+from utils.metrics import MetricsMiddleware, render_prometheus
+from utils.profiling import ProfilingMiddleware, instrument_sync_routes
+from utils.warmup import run_warmup, selected_steps, warmup_state
+
+_process_start = time.perf_counter()
+
+# feature name -> router module. Heavy deps (chromadb, sklearn, fitz, ...)
+# are imported inside the routers on first use, so mounting is cheap.
+FEATURE_ROUTERS = {
+    "upload": "routers.upload",
+    "query": "routers.query",
+    "literature_review": "routers.literature_review",
+    "topic_finder": "routers.topic_finder",
+    "ai_writer": "routers.ai_writter",
+    "plagiarism": "routers.plagiarism",
+    "grammar_style": "routers.grammar_style",
+    "citation": "routers.citation",
+    "documents": "routers.documents",
+}
+
+
+def enabled_features():
+    wanted = [f.strip() for f in ENABLED_FEATURES.split(",") if f.strip()]
+    if not wanted or "all" in wanted:
+        return list(FEATURE_ROUTERS)
+    unknown = [f for f in wanted if f not in FEATURE_ROUTERS]
+    if unknown:
+        raise RuntimeError(f"Unknown ENABLED_FEATURES: {', '.join(unknown)}")
+    return wanted
+
 
 # Lifespan function (startup + shutdown)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup code ekhane
+    start = time.perf_counter()
+    configure_threadpool()   # admission queue limits are sized against it
     init_user_table()
     init_chat_history_table()
-    yield  # after yield shutdown code (now empty)
+    init_keyword_tables()
+    init_session_tables()
+    init_grammar_cache_table()
+    init_llm_context_table()
+    init_embedding_mirror_table()
+    init_documents_table()
+    init_jobs_table()
+    init_lexical_tables()
+    init_topic_cluster_table()
+    purge_expired()   # job results past JOB_RESULT_TTL_S
+    report = app.state.startup_report
+    report["db_init_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    report["serving_ms"] = round((time.perf_counter() - _process_start) * 1000, 1)
+
+    # Warm-up runs in the background: the server accepts connections right
+    # away, /ready stays 503 until the models / index / encoder are loaded.
+    warmup = asyncio.create_task(asyncio.to_thread(run_warmup, selected_steps()))
+    yield  # after yield shutdown code
+    if not warmup.done():
+        warmup.cancel()
 
 app = FastAPI(title="Research Bot API", lifespan=lifespan)  
-app.include_router(upload.router)
-app.include_router(query.router)
-app.include_router(literature_review.router)
-app.include_router(topic_finder.router)
-app.include_router(ai_writter.router)
-app.include_router(plagiarism.router)
-app.include_router(grammar_style.router)
-app.include_router(citation.router)
+
+# ==================== Feature routers ==================== #
+_router_import_ms = {}
+for feature in enabled_features():
+    t0 = time.perf_counter()
+    module = importlib.import_module(FEATURE_ROUTERS[feature])
+    _router_import_ms[feature] = round((time.perf_counter() - t0) * 1000, 1)
+    instrument_sync_routes(module.router)   # sync endpoints join a profile session
+    app.include_router(module.router)
+
+app.state.startup_report = {
+    "features": list(_router_import_ms),
+    "router_import_ms": _router_import_ms,
+    "app_build_ms": round((time.perf_counter() - _process_start) * 1000, 1),
+}
 
 # Allow React frontend
 app.add_middleware(
@@ -40,9 +100,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Priority class per path for the LLM admission queue
+app.add_middleware(AdmissionMiddleware)
+
+# On-demand profiling (X-Profile header / armed via /debug/profile) – inside
+# Metrics so the saved profile carries the request's stage timings
+app.add_middleware(ProfilingMiddleware)
+
+# Route latency histograms + Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 # Include auth router
+instrument_sync_routes(auth_router)
 app.include_router(auth_router)
+instrument_sync_routes(debug_router)
+app.include_router(debug_router)
+# background jobs of literature-review / topic-finder / full-paper (?job=true)
+instrument_sync_routes(jobs_router)
+app.include_router(jobs_router)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text format – only built when scraped
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup-report", include_in_schema=False)
+def startup_report():
+    # per-router import time, DB init time, time until serving, warm-up steps
+    return {**app.state.startup_report, "warmup": warmup_state()}
+
+@app.get("/ready", include_in_schema=False)
+def ready():
+    # readiness for the load balancer – "/" stays the liveness check
+    state = warmup_state()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
 
 @app.get("/")
 def home():
-    return {"message": "Research Bot FastAPI backend is running! 🚀"}
\ No newline at end of file
+    return {"message": "Research Bot FastAPI backend is running! 🚀"}
+
+instrument_sync_routes(app)
@@ -16,4 +16,29 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
     session_id: str
-    history: List[dict]
\ No newline at end of file
+    history: List[dict]
+    context_tokens: Optional[int] = None         # prompt context after packing
+    context_tokens_saved: Optional[int] = None   # vs. pasting the top chunks verbatim
+
+
+# ==================== Batch queries ==================== #
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]                     # answered independently, no chat history
+    chunks: Optional[int] = 5
+    temperature: Optional[float] = 0.7
+    style: Optional[str] = "Detailed"
+    document_names: Optional[List[str]] = None
+    stream: bool = False                     # NDJSON, one line per answer as it finishes
+
+class BatchQueryItem(BaseModel):
+    index: int                               # position in `questions`
+    question: str
+    answer: Optional[str] = None
+    sources: List[str] = []
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem]            # same order as `questions`
+    retrieved_chunks: int                    # chunk hits over all questions
+    unique_chunks: int                       # distinct chunks actually fetched
@@ -15,4 +15,6 @@ class TopicSuggestion(BaseModel):
     research_gap: str
     confidence_score: int
     status: str
-    sources: List[str]
\ No newline at end of file
+    sources: List[str]
+class TopicSuggestionList(BaseModel):
+    topics: List[TopicSuggestion]
@@ -1,36 +1,38 @@
 # backend/routers/ai_writer.py
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-import requests, json, re, os, uuid
-from typing import List, Optional
+import re, os, uuid
+from typing import List, Literal, Optional
 from vector_db.client import get_collection
-
-# PDF & DOCX export
-from reportlab.pdfgen import canvas
-from docx import Document
+from utils.structured import generate_structured, StructuredOutputError
+from utils.metrics import stage
+from utils.partition import get_partition, partition_filter, partition_key
+from utils.keywords import extract_keywords, extractive_summary, get_document_keywords
+from utils.jobs import job_progress, submit_job
 
 router = APIRouter(prefix="/ai-writer", tags=["ai-writer"])
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 
 # ==================== Internal Utils ==================== #
 
-def call_llm(prompt:str):
-    """Unified LLM call with JSON auto-detection"""
+def call_llm(prompt:str, schema, endpoint:str="ai_writer"):
+    """Unified LLM call – output constrained to + validated against `schema`"""
     try:
-        res = requests.post(OLLAMA_URL, json={"model":MODEL_NAME,"prompt":prompt,"stream":False}).json()
-        raw = res.get("response","")
-        block = re.search(r'\{.*\}|\[.*\]', raw, re.DOTALL)
-        return json.loads(block.group(0)) if block else {"raw_output":raw}
+        return generate_structured(prompt, schema, MODEL_NAME, endpoint=endpoint).model_dump()
+    except StructuredOutputError as e:
+        raise HTTPException(502, f"LLM Failed → {e}")
+    except HTTPException:
+        raise   # 429/503 from admission control
     except Exception as e:
         raise HTTPException(500, f"LLM Failed → {e}")
 
-def rag_context(limit=6000):
-    """Retrieve stored research PDFs text from vector DB"""
-    coll=get_collection().get(include=["documents","metadatas"])
+def rag_context(partition:dict, limit=6000):
+    """Retrieve the caller's stored research PDFs text from vector DB"""
+    with stage("retrieve"):
+        coll=get_collection().get(where=partition_filter(partition),include=["documents","metadatas"])
     if not coll["documents"]: return "",[]
     return " ".join(coll["documents"])[:limit],[m.get("source","paper") for m in coll["metadatas"][:5]]
 
@@ -50,14 +52,41 @@ class FullPaperRequest(BaseModel):
     topic:str
     words_per_section:int=600
     use_docs:bool=True
+    mode:Literal["local","llm"]="local"      # abstract + keywords: "local" (fast) or "llm"
 
 class TextRequest(BaseModel):
     text:str
+    mode:Literal["local","llm"]="local"      # only used by /keywords and /abstract
 
 class ExportRequest(BaseModel):
     title:str
     content:str
 
+# ==================== Response Models (LLM JSON schemas) ==================== #
+
+class OutlineOut(BaseModel):
+    outline:List[str]
+
+class SectionOut(BaseModel):
+    title:str
+    content:str
+    citations:List[str]=[]
+
+class RefinedOut(BaseModel):
+    refined:str
+
+class ExpandedOut(BaseModel):
+    expanded:str
+
+class KeywordsOut(BaseModel):
+    keywords:List[str]
+
+class AbstractOut(BaseModel):
+    abstract:str
+
+class ConclusionOut(BaseModel):
+    conclusion:str
+
 # ==================== 1. Outline ==================== #
 
 @router.post("/outline")
@@ -67,13 +96,13 @@ Generate a research outline for topic: {req.topic}
 Depth: {req.depth}
 Return JSON: {{"outline":["Intro","Lit Review","Methodology","Results","Discussion","Conclusion"]}}
 """
-    return call_llm(prompt)
+    return call_llm(prompt, OutlineOut, "ai_writer_outline")
 
 # ==================== 2. Section Writer ==================== #
 
 @router.post("/section")
-def section(req:SectionRequest):
-    ctx,sources = rag_context() if req.use_docs else ("",[])
+def section(req:SectionRequest, partition:dict=Depends(get_partition)):
+    ctx,sources = rag_context(partition) if req.use_docs else ("",[])
     prompt=f"""
 Write a research section:
 Topic: {req.topic}
@@ -90,28 +119,40 @@ Rules:
 Return JSON:
 {{"title":"{req.section_title}","content":"...","citations":{sources}}}
 """
-    return call_llm(prompt)
+    return call_llm(prompt, SectionOut, "ai_writer_section")
 
 # ==================== 3. Full Paper ==================== #
 
 @router.post("/full-paper")
-def full_paper(req:FullPaperRequest):
+def full_paper(req:FullPaperRequest, job:bool=Query(False, description="run in the background: 202 + job id, see /jobs"),
+               partition:dict=Depends(get_partition)):
+    if job:
+        return submit_job("full_paper", req.model_dump(), partition, write_full_paper, req, partition)
+    return write_full_paper(req, partition)
+
+def write_full_paper(req:FullPaperRequest, partition:dict):
+    job_progress(0.02, "outline")
     out=outline(OutlineRequest(topic=req.topic))
     sections = out.get("outline",[])
     
     final=""; all_cites=[]
-    for sec in sections:
-        part = section(SectionRequest(topic=req.topic,section_title=sec,words=req.words_per_section,use_docs=req.use_docs))
+    for i,sec in enumerate(sections):
+        job_progress(0.05 + 0.85*i/max(len(sections),1), f"section {i+1}/{len(sections)}: {sec}")
+        part = section(SectionRequest(topic=req.topic,section_title=sec,words=req.words_per_section,use_docs=req.use_docs), partition)
         final+=f"\n\n## {sec}\n{part['content']}"
         all_cites+=part.get("citations",[])
 
-    abs = refine(TextRequest(text=final[:800]))
-    keys = keywords(TextRequest(text=final))
+    job_progress(0.9, "abstract + keywords")
+    if req.mode=="llm":
+        abs = refine(TextRequest(text=final[:800])).get("refined","")
+    else:
+        abs = extractive_summary(re.sub(r"^## .*$","",final,flags=re.M))
+    keys = keywords(TextRequest(text=final,mode=req.mode))
 
     return {
         "title":req.topic,
         "sections":sections,
-        "abstract":abs.get("refined",""),
+        "abstract":abs,
         "keywords":keys.get("keywords",[]),
         "paper":final,
         "citations":list(set(all_cites))
@@ -122,32 +163,46 @@ def full_paper(req:FullPaperRequest):
 @router.post("/refine")
 def refine(req:TextRequest):
     prompt=f"Improve academically. Return JSON {{'refined':'text'}}\n{req.text}"
-    return call_llm(prompt)
+    return call_llm(prompt, RefinedOut, "ai_writer_refine")
 
 @router.post("/expand")
 def expand(req:TextRequest):
     prompt=f"Expand academically. Return JSON {{'expanded':'text'}}\n{req.text}"
-    return call_llm(prompt)
+    return call_llm(prompt, ExpandedOut, "ai_writer_expand")
 
 @router.post("/keywords")
 def keywords(req:TextRequest):
+    if req.mode!="llm":
+        # local TF-IDF/RAKE extractor, IDF taken from the uploaded corpus
+        return {"keywords":extract_keywords(req.text,top_k=10)}
     prompt=f"Extract 6-12 keywords. JSON {{'keywords':['..']}}\n{req.text}"
-    return call_llm(prompt)
+    return call_llm(prompt, KeywordsOut, "ai_writer_keywords")
+
+@router.get("/keywords/{source}")
+def document_keywords(source:str, partition:dict=Depends(get_partition)):
+    """Keywords precomputed for an uploaded PDF at ingest time"""
+    keys=get_document_keywords(partition_key(partition, source))
+    if keys is None:
+        raise HTTPException(404, f"No keywords stored for {source}")
+    return {"source":source,"keywords":keys}
 
 @router.post("/abstract")
 def abstract(req:TextRequest):
+    if req.mode!="llm":
+        return {"abstract":extractive_summary(req.text)}
     prompt=f"Create abstract from text. JSON {{'abstract':'...'}}\n{req.text}"
-    return call_llm(prompt)
+    return call_llm(prompt, AbstractOut, "ai_writer_abstract")
 
 @router.post("/conclusion")
 def conclusion(req:TextRequest):
     prompt=f"Write conclusion. JSON {{'conclusion':'...'}}\n{req.text}"
-    return call_llm(prompt)
+    return call_llm(prompt, ConclusionOut, "ai_writer_conclusion")
 
 # ==================== 5. PDF Export ==================== #
 
 @router.post("/export/pdf")
 def export_pdf(req:ExportRequest):
+    from reportlab.pdfgen import canvas   # export deps load only when used
     file=f"/tmp/{uuid.uuid4()}.pdf"
     c=canvas.Canvas(file)
     y=800
@@ -163,6 +218,7 @@ def export_pdf(req:ExportRequest):
 
 @router.post("/export/docx")
 def export_docx(req:ExportRequest):
+    from docx import Document
     file=f"/tmp/{uuid.uuid4()}.docx"
     doc=Document()
     doc.add_heading(req.title, level=1)
@@ -1,16 +1,20 @@
+import argparse
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
-from utils.jwt_handler import create_access_token, get_current_user
+import sqlite3
 
-# Dummy in-memory "database" for demonstration
-fake_users_db = {}
+from db.database import get_db_connection
+from utils.hashing import hash_password_async, verify_password_async
+from utils.jwt_handler import create_access_token, get_current_user
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 # Pydantic models
 class UserSignup(BaseModel):
     username: str
-    password: str  # In real apps, hash this!
+    password: str
 
 class UserLogin(BaseModel):
     username: str
@@ -20,29 +24,105 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-# Initialize user table (for demo, could be DB setup)
+# Users persist across restarts; passwords are stored as bcrypt hashes only
 def init_user_table():
-    fake_users_db.clear()
+    conn = get_db_connection()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,  -- user_id in the JWT / partition owner
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,           -- bcrypt
+            is_admin INTEGER NOT NULL DEFAULT 0,   -- maintenance endpoints; set with `python -m routers.auth grant`
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(users)").fetchall()]
+    if "is_admin" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+    conn.close()
+
+
+def _get_user(username: str):
+    conn = get_db_connection()
+    row = conn.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,)).fetchone()
+    conn.close()
+    return row
+
+
+def _create_user(username: str, password_hash: str):
+    conn = get_db_connection()
+    try:
+        user_id = conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?) RETURNING id",
+                               (username, password_hash)).fetchone()["id"]
+        conn.commit()
+    except sqlite3.IntegrityError:
+        user_id = None
+    finally:
+        conn.close()
+    return user_id
 
 # Signup route
 @router.post("/signup", response_model=Token)
 async def signup(user: UserSignup):
-    if user.username in fake_users_db:
+    if _get_user(user.username):
+        raise HTTPException(status_code=400, detail="Username already exists")
+    # bcrypt runs in the hash pool – the event loop keeps serving meanwhile
+    user_id = _create_user(user.username, await hash_password_async(user.password))
+    if user_id is None:   # lost a race with a concurrent signup
         raise HTTPException(status_code=400, detail="Username already exists")
-    fake_users_db[user.username] = {"password": user.password, "user_id": len(fake_users_db)+1}
-    access_token = create_access_token(data={"sub": user.username, "user_id": fake_users_db[user.username]["user_id"]})
+    access_token = create_access_token(data={"sub": user.username, "user_id": user_id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Login route
 @router.post("/login", response_model=Token)
 async def login(user: UserLogin):
-    db_user = fake_users_db.get(user.username)
-    if not db_user or db_user["password"] != user.password:
+    db_user = _get_user(user.username)
+    # unknown users are verified against a dummy hash: same timing as a wrong password
+    if not await verify_password_async(user.password, db_user["password_hash"] if db_user else None):
         raise HTTPException(status_code=401, detail="Invalid username or password")
-    access_token = create_access_token(data={"sub": user.username, "user_id": db_user["user_id"]})
+    access_token = create_access_token(data={"sub": user.username, "user_id": db_user["id"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Protected route
 @router.get("/me")
 async def read_users_me(current_user: dict = Depends(get_current_user)):
     return current_user
+
+
+# ==================== Admin rights ==================== #
+# Granted per account (users.is_admin), never by username alone: signup is
+# open, so anyone could register a name listed in a config file first.
+#
+#     python -m routers.auth grant alice
+#     python -m routers.auth revoke alice
+#     python -m routers.auth admins
+
+def set_admin(username: str, admin: bool) -> bool:
+    conn = get_db_connection()
+    updated = conn.execute("UPDATE users SET is_admin = ? WHERE username = ?", (int(admin), username)).rowcount
+    conn.commit()
+    conn.close()
+    return bool(updated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grant / revoke admin rights (maintenance endpoints)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for cmd in ("grant", "revoke"):
+        sub.add_parser(cmd).add_argument("username")
+    sub.add_parser("admins")
+    args = parser.parse_args()
+
+    init_user_table()
+    if args.cmd == "admins":
+        conn = get_db_connection()
+        rows = conn.execute("SELECT id, username FROM users WHERE is_admin = 1 ORDER BY id").fetchall()
+        conn.close()
+        print(json.dumps([dict(r) for r in rows], indent=2))
+    elif not set_admin(args.username, args.cmd == "grant"):
+        parser.error(f"no such user: {args.username}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
-import requests, json, re
+import requests
 from db.database import get_db_connection
+from utils.structured import generate_structured, StructuredOutputError
 
 router = APIRouter(prefix="/citation", tags=["citation"])
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 
 # --------------------------------------------------------
@@ -29,22 +29,6 @@ class CitationResponse(BaseModel):
     Springer: str
     BibTeX: str
 
-# --------------------------------------------------------
-# LLM Caller
-# --------------------------------------------------------
-def call_llm(prompt: str) -> str:
-    try:
-        res = requests.post(OLLAMA_URL, json={
-            "model": MODEL_NAME,
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": 0.2}
-        })
-        res.raise_for_status()
-        return res.json()["response"].strip()
-    except Exception as e:
-        raise HTTPException(500, f"LLM ERROR: {e}")
-
 # --------------------------------------------------------
 # (A) AUTO FETCH DOI / CROSSREF / ARXIV
 # --------------------------------------------------------
@@ -102,16 +86,17 @@ Output JSON:
 }}
 """
 
-    raw = call_llm(prompt)
-
     try:
-        match = re.search(r'\{.*\}', raw, re.DOTALL)
-        data = json.loads(match.group(0)) if match else None
-    except:
-        data = None
-
-    if not data:
-        raise HTTPException(500, "Formatting failed. Model returned invalid JSON.")
+        data = generate_structured(
+            prompt, CitationResponse, MODEL_NAME,
+            options={"temperature": 0.2}, endpoint="citation"
+        ).model_dump()
+    except StructuredOutputError:
+        raise HTTPException(502, "Formatting failed. Model returned invalid JSON.")
+    except HTTPException:
+        raise   # 429/503 from admission control
+    except Exception as e:
+        raise HTTPException(500, f"LLM ERROR: {e}")
 
     # --- Save to DB optional ---
     if req.save_to_db:
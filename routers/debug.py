@@ -0,0 +1,46 @@
+# backend/routers/debug.py
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from utils.jwt_handler import require_admin
+from utils.metrics import slow_requests
+from utils.profiling import arm, armed, list_profiles, profile_path
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+class ProfileRequest(BaseModel):
+    path_prefix: str
+    count: int = 1   # 0 disarms the prefix
+
+
+# ==================== Profiler (admin) ==================== #
+
+@router.post("/profile")
+def arm_profile(request: ProfileRequest, admin: dict = Depends(require_admin)):
+    """Profile the next `count` requests whose path starts with `path_prefix`."""
+    arm(request.path_prefix, request.count)
+    return {"armed": armed()}
+
+
+@router.get("/profile")
+def profiles(admin: dict = Depends(require_admin)):
+    return {"armed": armed(), "profiles": list_profiles()}
+
+
+@router.get("/profile/{name}")
+def profile(name: str, admin: dict = Depends(require_admin)):
+    """Collapsed stacks – pipe into flamegraph.pl / inferno-flamegraph, or open in speedscope."""
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(404, f"No profile named {name}")
+    with open(path) as fh:
+        return PlainTextResponse(fh.read())
+
+
+# ==================== Slow requests (admin) ==================== #
+
+@router.get("/slow")
+def slow(admin: dict = Depends(require_admin)):
+    return {"slow_requests": slow_requests()}
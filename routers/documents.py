@@ -0,0 +1,63 @@
+# backend/routers/documents.py
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from utils.ingest import delete_document, find_orphans, list_documents, sources_for_hash
+from utils.jwt_handler import require_admin
+from utils.partition import get_partition
+from vector_db.compaction import compaction_state, start_compaction
+from vector_db.hnsw import index_stats
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+
+# ==================== Catalog ==================== #
+
+@router.get("/")
+def documents(partition: dict = Depends(get_partition)):
+    return {"documents": list_documents(partition)}
+
+
+@router.get("/orphans")
+def orphans(partition: dict = Depends(get_partition)):
+    """Dry run: chunks whose source PDF no longer exists. Nothing is deleted."""
+    found = find_orphans(partition)
+    return {"orphans": found, "chunks": sum(o["chunks"] for o in found)}
+
+
+# ==================== Delete ==================== #
+
+@router.delete("/by-hash/{file_hash}")
+def delete_by_hash(file_hash: str, partition: dict = Depends(get_partition)):
+    sources = sources_for_hash(partition, file_hash)
+    if not sources:
+        raise HTTPException(404, f"No document with hash {file_hash}")
+    return {"deleted": [delete_document(source, partition) for source in sources]}
+
+
+@router.delete("/{source}")
+def delete_by_source(source: str, partition: dict = Depends(get_partition)):
+    result = delete_document(source, partition)
+    if not (result["chunks_deleted"] or result["chunks_unshared"] or result["catalog_row"] or result["file_removed"]):
+        raise HTTPException(404, f"No document named {source}")
+    return result
+
+
+# ==================== Index (admin) ==================== #
+
+@router.get("/index")
+def index(top: int = Query(50, ge=0, le=1000), admin: dict = Depends(require_admin)):
+    """Vector counts, HNSW parameters, memory / disk footprint and the `top` largest sources."""
+    return index_stats(top)
+
+
+# ==================== Compaction (admin) ==================== #
+
+@router.post("/compact", status_code=status.HTTP_202_ACCEPTED)
+def compact(admin: dict = Depends(require_admin)):
+    started = start_compaction("manual")
+    return {"started": started, **compaction_state()}
+
+
+@router.get("/compact")
+def compact_status(admin: dict = Depends(require_admin)):
+    return compaction_state()
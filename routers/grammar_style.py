@@ -1,18 +1,19 @@
 # backend/routers/grammar_style.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import requests
 from typing import Optional
-import textstat
-import re, json
-
-# ====================== SESSION MEMORY FOR CHAT ====================== #
-chat_sessions = {}  
+import re, json, os, hashlib, time
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from db.database import get_db_connection
+from utils.session_store import get_session_store
+from utils.ollama import generate, load_context, save_context, clear_context
+from utils.structured import generate_structured, StructuredOutputError
+from utils.metrics import record_cache
 
 
 router = APIRouter(prefix="/grammar-style", tags=["grammar-style"])
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 
 
@@ -22,52 +23,144 @@ MODEL_NAME = "gemma3:4b"
 class TextRequest(BaseModel):
     text: str
     style: Optional[str] = "academic"
-    session_id: Optional[str] = "default"   # <--- added for auto chat save
+    session_id: Optional[str] = None   # set it to continue the result in /chat
 
 
 # ===================================================================== #
 # LLM Call Function
 # ===================================================================== #
-def call_llm(prompt: str) -> str:
+def generate_reply(prompt: str, context=None) -> dict:
     try:
-        res = requests.post(OLLAMA_URL, json={
-            "model": MODEL_NAME,
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": 0.35}
-        })
-        res.raise_for_status()
-        return res.json()["response"].strip()
+        return generate(prompt, MODEL_NAME, options={"temperature": 0.35}, context=context)
+    except HTTPException:
+        raise   # 429/503 from admission control
     except Exception as e:
         raise HTTPException(500, f"LLM ERROR: {e}")
 
 
+def call_llm(prompt: str) -> str:
+    return generate_reply(prompt)["response"].strip()
+
+
 # ===================================================================== #
 # Helper → Save result directly to chat memory
 # ===================================================================== #
 def save_to_chat(session_id, text, role="assistant"):
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
-    chat_sessions[session_id].append({role: text})
+    # no session → nothing to continue, don't pile it into a shared one
+    if not session_id:
+        return
+    get_session_store().append(session_id, role, text)
 
 
 def get_history(session_id):
-    history = ""
-    for msg in chat_sessions.get(session_id, []):
-        if "user" in msg: history += f"User: {msg['user']}\n"
-        if "assistant" in msg: history += f"Assistant: {msg['assistant']}\n"
-    return history
+    # only the newest messages that fit the token window
+    return "".join(
+        f"{msg['role'].capitalize()}: {msg['content']}\n"
+        for msg in get_session_store().window(session_id)
+    )
 
 
 # ===================================================================== #
 # 1. Grammar Check
 # ===================================================================== #
-@router.post("/check")
-def grammar_check(req: TextRequest):
+GRAMMAR_CHECK_CONCURRENCY = int(os.getenv("GRAMMAR_CHECK_CONCURRENCY", "4"))
+_check_pool = ThreadPoolExecutor(max_workers=GRAMMAR_CHECK_CONCURRENCY, thread_name_prefix="grammar-check")
+
+_SECTION_RE = re.compile(r"\*\*\s*(Corrected Version|Issues Fixed|Suggestions)\s*\*\*", re.IGNORECASE)
+
+
+def split_paragraphs(text: str):
+    return [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+
 
+def _bullets(block: str):
+    items = []
+    for line in block.splitlines():
+        line = line.strip().lstrip("-*•").strip()
+        if line:
+            items.append(line)
+    return items
+
+
+def parse_check_output(raw: str, original: str) -> dict:
+    """Split the editor's markdown answer into corrected text / issues / suggestions."""
+    parts = _SECTION_RE.split(raw)
+    sections = {parts[i].lower(): parts[i + 1].strip() for i in range(1, len(parts) - 1, 2)}
+    corrected = sections.get("corrected version") or (raw.strip() if len(parts) == 1 else original)
+    return {
+        "corrected": corrected.strip().strip('"').strip(),
+        "issues": _bullets(sections.get("issues fixed", "")),
+        "suggestions": _bullets(sections.get("suggestions", "")),
+    }
+
+
+# cached paragraph checks: dropped after GRAMMAR_CACHE_TTL_S without a hit, and
+# least recently used first beyond GRAMMAR_CACHE_MAX_ROWS (swept every minute)
+GRAMMAR_CACHE_TTL_S = float(os.getenv("GRAMMAR_CACHE_TTL_S", str(30 * 24 * 3600)))
+GRAMMAR_CACHE_MAX_ROWS = int(os.getenv("GRAMMAR_CACHE_MAX_ROWS", "20000"))
+_CACHE_SWEEP_INTERVAL_S = 60.0
+_last_cache_sweep = 0.0
+
+
+def _paragraph_key(paragraph: str) -> str:
+    return hashlib.sha256(f"{MODEL_NAME}\0{paragraph}".encode("utf-8")).hexdigest()
+
+
+def _cached_checks(keys):
+    conn = get_db_connection()
+    placeholders = ",".join("?" * len(keys))
+    rows = conn.execute(
+        f"SELECT hash, corrected, issues, suggestions FROM grammar_cache WHERE hash IN ({placeholders})",
+        list(keys)
+    ).fetchall()
+    if rows:
+        hits = [r["hash"] for r in rows]
+        conn.execute(f"UPDATE grammar_cache SET last_used = ? WHERE hash IN ({','.join('?' * len(hits))})",
+                     [time.time(), *hits])
+        conn.commit()
+    conn.close()
+    return {
+        r["hash"]: {"corrected": r["corrected"], "issues": json.loads(r["issues"]),
+                    "suggestions": json.loads(r["suggestions"])}
+        for r in rows
+    }
+
+
+def _store_checks(results: dict):
+    now = time.time()
+    conn = get_db_connection()
+    conn.executemany(
+        "INSERT OR REPLACE INTO grammar_cache (hash, corrected, issues, suggestions, last_used) VALUES (?, ?, ?, ?, ?)",
+        [(k, r["corrected"], json.dumps(r["issues"]), json.dumps(r["suggestions"]), now)
+         for k, r in results.items()]
+    )
+    conn.commit()
+    conn.close()
+    _maybe_purge_cache(now)
+
+
+def _maybe_purge_cache(now: float):
+    global _last_cache_sweep
+    if now - _last_cache_sweep < _CACHE_SWEEP_INTERVAL_S:
+        return
+    _last_cache_sweep = now
+    conn = get_db_connection()
+    # TTL expiry, then LRU eviction of whatever is over the cap
+    conn.execute("DELETE FROM grammar_cache WHERE last_used < ?", (now - GRAMMAR_CACHE_TTL_S,))
+    conn.execute('''
+        DELETE FROM grammar_cache WHERE hash IN (
+            SELECT hash FROM grammar_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+    ''', (GRAMMAR_CACHE_MAX_ROWS,))
+    conn.commit()
+    conn.close()
+
+
+def check_paragraph(paragraph: str) -> dict:
     prompt = f"""
 You are a research-grade academic writing editor.
-Correct grammar, fix structure, improve readability.
+Correct grammar, fix structure, improve readability of this paragraph.
+Keep it a single paragraph.
 
 Return format:
 
@@ -81,23 +174,80 @@ Return format:
 - bullet list
 
 Text:
-\"\"\"{req.text}\"\"\"
+\"\"\"{paragraph}\"\"\"
 """
+    return parse_check_output(call_llm(prompt), paragraph)
 
-    result = call_llm(prompt)
+
+def _readability(paragraph: str):
+    import textstat
+    try:
+        return textstat.flesch_reading_ease(paragraph), textstat.lexicon_count(paragraph)
+    except Exception:
+        return None, 0
+
+
+@router.post("/check")
+def grammar_check(req: TextRequest):
+    paragraphs = split_paragraphs(req.text)
+    if not paragraphs:
+        raise HTTPException(400, "Text cannot be empty")
+
+    # only paragraphs never seen before (by content hash) go to the model
+    keys = [_paragraph_key(p) for p in paragraphs]
+    results = _cached_checks(set(keys))
+    cache_hits = sum(1 for k in keys if k in results)
+    for k in keys:
+        record_cache("grammar_paragraph", k in results)
+
+    todo = {k: p for k, p in zip(keys, paragraphs) if k not in results}
+    # copy_context → stage timings from the pool threads land on this request
+    futures = {k: _check_pool.submit(contextvars.copy_context().run, check_paragraph, p) for k, p in todo.items()}
+    fresh = {k: f.result() for k, f in futures.items()}
+    if fresh:
+        _store_checks(fresh)
+        results.update(fresh)
+
+    # merge per-paragraph results in original order
+    report, issues, suggestions = [], [], []
+    weighted, total_words = 0.0, 0
+    for i, (key, paragraph) in enumerate(zip(keys, paragraphs)):
+        r = results[key]
+        score, words = _readability(paragraph)
+        if score is not None and words:
+            weighted += score * words
+            total_words += words
+        issues += r["issues"]
+        suggestions += [s for s in r["suggestions"] if s not in suggestions]
+        report.append({
+            "index": i,
+            "corrected": r["corrected"],
+            "issues": r["issues"],
+            "suggestions": r["suggestions"],
+            "readability_score": score,
+            "cached": key not in todo,
+        })
+
+    corrected = "\n\n".join(p["corrected"] for p in report)
+    result = "**Corrected Version**\n" + corrected
+    result += "\n\n**Issues Fixed**\n" + "\n".join(f"- {x}" for x in issues)
+    result += "\n\n**Suggestions**\n" + "\n".join(f"- {x}" for x in suggestions)
 
     # store for chat continuation
     save_to_chat(req.session_id, result)
 
-    try:
-        readability = textstat.flesch_reading_ease(req.text)
-    except:
-        readability = "N/A"
+    # word-weighted mean of the paragraph scores
+    readability = round(weighted / total_words, 2) if total_words else "N/A"
 
     return {
         "corrected_text": result,
         "readability_score": readability,
-        "note": "70+ easy, 30-50 academic level"
+        "note": "70+ easy, 30-50 academic level",
+        "issues": issues,
+        "suggestions": suggestions,
+        "paragraphs": report,
+        "paragraphs_checked": len(todo),
+        "cache_hits": cache_hits
     }
 
 
@@ -154,6 +304,11 @@ Return improved text only.
 # ===================================================================== #
 # 4. Translate
 # ===================================================================== #
+class TranslateResponse(BaseModel):
+    formal: str
+    concise: str
+    detailed: str
+
 @router.post("/translate")
 def translate(req: TextRequest):
     prompt = f"""
@@ -165,13 +320,17 @@ Text:
 Return strict JSON only:
 {{"formal":"...","concise":"...","detailed":"..."}}
 """
-    raw = call_llm(prompt)
-
     try:
-        matched = re.search(r'\{.*\}', raw, re.DOTALL)
-        data = json.loads(matched.group(0)) if matched else {"raw": raw}
-    except:
-        data = {"raw": raw}
+        data = generate_structured(
+            prompt, TranslateResponse, MODEL_NAME,
+            options={"temperature": 0.35}, endpoint="grammar_translate"
+        ).model_dump()
+    except StructuredOutputError as e:
+        raise HTTPException(502, f"LLM ERROR: {e}")
+    except HTTPException:
+        raise   # 429/503 from admission control
+    except Exception as e:
+        raise HTTPException(500, f"LLM ERROR: {e}")
 
     # Save each version for chat request
     save_to_chat(req.session_id, str(data))
@@ -187,11 +346,24 @@ class ChatRequest(BaseModel):
 
 @router.post("/chat")
 def grammar_chat(req: ChatRequest):
+    store = get_session_store()
 
     # save user msg
-    save_to_chat(req.session_id, req.message, role="user")
-
-    prompt = f"""
+    user_seq = store.append(req.session_id, "user", req.message)
+    epoch = store.epoch(req.session_id)
+
+    stored = load_context("grammar", req.session_id, MODEL_NAME, epoch=epoch)
+    new_messages = store.since(req.session_id, stored["last_seq"]) if stored else []
+    if stored and (not new_messages or new_messages[-1]["seq"] != user_seq):
+        stored = None   # context doesn't line up with this session's messages – rebuild from text
+    record_cache("llm_context", bool(stored))
+    if stored:
+        # Ollama already holds the conversation in `context` – send only what
+        # it hasn't seen: results saved by other endpoints + the new message
+        prompt = "".join(f"{m['role'].capitalize()}: {m['content']}\n" for m in new_messages)
+        prompt += "\nReply now:\n"
+    else:
+        prompt = f"""
 You are a writing assistant. Improve text based on conversation.
 If user says "more detailed/shorter/better summary",
 modify previous assistant answer intelligently.
@@ -202,8 +374,17 @@ Conversation:
 Reply now:
 """
 
-    reply = call_llm(prompt)
+    res = generate_reply(prompt, context=stored["context"] if stored else None)
+    reply = res["response"].strip()
+
+    seq = store.append(req.session_id, "assistant", reply)
+    save_context("grammar", req.session_id, MODEL_NAME, res.get("context"), seq, epoch=epoch)
+
+    return {"reply": reply, "session_id": req.session_id, "context_reused": bool(stored)}
 
-    save_to_chat(req.session_id, reply, role="assistant")
 
-    return {"reply": reply, "session_id": req.session_id}
+@router.delete("/chat/{session_id}")
+def clear_chat(session_id: str):
+    get_session_store().clear(session_id)
+    clear_context("grammar", session_id)
+    return {"cleared": session_id}
@@ -0,0 +1,60 @@
+# backend/routers/jobs.py
+import asyncio
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from utils.jobs import get_job, list_jobs
+from utils.partition import get_partition
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# how often /events looks at the job row (it lives in SQLite, any worker may run it)
+JOB_EVENT_POLL_S = float(os.getenv("JOB_EVENT_POLL_S", "1.0"))
+JOB_EVENT_KEEPALIVE_S = 15.0
+
+
+@router.get("/")
+def jobs(partition: dict = Depends(get_partition)):
+    return {"jobs": list_jobs(partition)}
+
+
+@router.get("/{job_id}")
+def job(job_id: str, partition: dict = Depends(get_partition)):
+    """Status + progress; `result` once status is "done", `error` / `error_status` if it failed."""
+    found = get_job(job_id, partition)
+    if found is None:
+        raise HTTPException(404, f"No job {job_id}")
+    return found
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, partition: dict = Depends(get_partition)):
+    """Server-sent events: a `progress` event on every change, then one `done` / `error` event with the job."""
+    first = await asyncio.to_thread(get_job, job_id, partition, False)
+    if first is None:
+        raise HTTPException(404, f"No job {job_id}")
+
+    async def events():
+        seen, idle = None, 0.0
+        while True:
+            current = await asyncio.to_thread(get_job, job_id, partition, False)
+            if current is None:
+                return
+            if current["status"] in ("done", "error"):
+                final = await asyncio.to_thread(get_job, job_id, partition)
+                yield f"event: {current['status']}\ndata: {json.dumps(final)}\n\n"
+                return
+            if current["updated_at"] != seen:
+                seen, idle = current["updated_at"], 0.0
+                yield f"event: progress\ndata: {json.dumps(current)}\n\n"
+            elif idle >= JOB_EVENT_KEEPALIVE_S:
+                idle = 0.0
+                yield ": keep-alive\n\n"   # proxies drop silent connections
+            await asyncio.sleep(JOB_EVENT_POLL_S)
+            idle += JOB_EVENT_POLL_S
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
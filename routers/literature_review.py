@@ -1,20 +1,32 @@
 # backend/routers/literature_review.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from vector_db.client import get_collection
-import requests
+from utils.ollama import generate
+from utils.metrics import stage
+from utils.partition import get_partition, partition_filter
+from utils.jobs import job_progress, submit_job
 
 router = APIRouter(prefix="/literature-review", tags=["literature-review"])
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 
 @router.get("/")
 def generate_literature_review(
     focus_area: str = Query(None, description="e.g. 'IoT security gaps', 'deep learning performance'"),
-    length: str = Query("medium", description="short / medium / long")
+    length: str = Query("medium", description="short / medium / long"),
+    job: bool = Query(False, description="run in the background: 202 + job id, see /jobs"),
+    partition: dict = Depends(get_partition)
 ):
+    if job:
+        return submit_job("literature_review", {"focus_area": focus_area, "length": length}, partition,
+                          build_literature_review, focus_area, length, partition)
+    return build_literature_review(focus_area, length, partition)
+
+
+def build_literature_review(focus_area: str, length: str, partition: dict):
     collection = get_collection()
-    all_data = collection.get(include=["documents", "metadatas"])
+    with stage("retrieve"):
+        all_data = collection.get(where=partition_filter(partition), include=["documents", "metadatas"])
     
     if not all_data["documents"]:
         raise HTTPException(status_code=404, detail="No documents uploaded yet. Please upload PDFs first.")
@@ -55,14 +67,11 @@ Papers:
 Literature Review:"""
 
     # Call Ollama
+    job_progress(0.1, f"writing review of {len(full_texts)} papers")
     try:
-        response = requests.post(OLLAMA_URL, json={
-            "model": MODEL_NAME,
-            "prompt": prompt,
-            "stream": False
-        })
-        response.raise_for_status()
-        review = response.json()["response"]
+        review = generate(prompt, MODEL_NAME)["response"]
+    except HTTPException:
+        raise   # 429/503 from admission control
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM error: {str(e)}")
 
@@ -1,13 +1,14 @@
 # backend/routers/plagiarism.py
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import numpy as np
-from utils.embedding import get_embeddings
+from utils.embedding import get_embeddings_batch
+from utils.ingest import ingest_pdf
+from utils.metrics import stage
+from utils.partition import get_partition, partition_filter
+from utils.sentence_index import match_sentences, uncovered_chunks
 from vector_db.client import get_collection
-from sklearn.metrics.pairwise import cosine_similarity
-import fitz  # PyMuPDF
-import uuid
 import re
 
 router = APIRouter(prefix="/plagiarism", tags=["Plagiarism & PDF Upload"])
@@ -41,73 +42,103 @@ def split_sentences(text):
     return [s.strip() for s in re.split(r"[.!?]", text) if len(s.strip()) > 10]
 
 
-def extract_pdf_text(file_bytes):
-    try:
-        pdf = fitz.open(stream=file_bytes, filetype="pdf")
-        text = ""
-        for page in pdf:
-            text += page.get_text()
-        return text
-    except Exception:
-        return None
-
-
 # ========================= 1) PDF UPLOAD ========================= #
 
 @router.post("/upload-pdf")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), partition: dict = Depends(get_partition)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(400, "Only PDF files accepted")
 
-    content = await file.read()
-    text = extract_pdf_text(content)
+    # same pipeline as /upload – see utils/ingest.py (blocking: run in the threadpool)
+    result = await run_in_threadpool(ingest_pdf, file.filename, await file.read(), partition)
 
-    if not text or len(text) < 50:
+    if not result or result["text_chars"] < 50:
         raise HTTPException(500, "PDF text extraction failed or empty.")
 
-    chunks = [text[i:i+1500] for i in range(0, len(text), 1500)]
-    embeddings = get_embeddings(chunks)
-    collection = get_collection()
-
-    ids = [str(uuid.uuid4()) for _ in chunks]
-    collection.add(
-        documents=chunks,
-        embeddings=embeddings,
-        metadatas=[{"source": file.filename}] * len(chunks),
-        ids=ids
-    )
-
     return {
         "status": "success",
         "file": file.filename,
-        "chunks_stored": len(chunks),
+        "chunks_stored": result["stored"],
+        "chunks_reused": result["reused"],
+        "sentences_indexed": result["sentences"],
         "message": "PDF uploaded, processed & indexed successfully."
     }
 
 
 # ========================= 2) PLAGIARISM CHECK ========================= #
 
-@router.post("/check", response_model=PlagiarismResponse)
-def check_plagiarism(req: PlagiarismRequest):
+def best_matches(embeddings, partition: dict):
+    """Closest stored chunk per input embedding: [(chunk_id, cosine), ...], or None if the partition is empty.
 
-    collection = get_collection()
-    db = collection.get(include=["documents", "metadatas"])
+    Scans the memory-mapped embedding mirror; without it (or while it lags the
+    collection), falls back to the stored embeddings from Chroma (never
+    re-embeds the corpus).
+    """
+    import numpy as np
+    from vector_db.mirror import synced_mirror
 
-    if not db["documents"]:
-        raise HTTPException(400, "No papers found in database. Upload PDF first.")
+    mirror = synced_mirror()
+    if mirror is not None:
+        hits = mirror.scan_topk(embeddings, k=1, owner=partition["owner"], project=partition["project"])
+        return [h[0] for h in hits] if hits and hits[0] else None
+
+    db = get_collection().get(where=partition_filter(partition), include=["embeddings"])
+    if not db["ids"]:
+        return None
+    stored = np.asarray(db["embeddings"], dtype=np.float32)
+    stored /= np.linalg.norm(stored, axis=1, keepdims=True)
+    queries = np.asarray(embeddings, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    matrix = queries @ stored.T
+    best = matrix.argmax(axis=1)
+    return [(db["ids"][j], float(matrix[i, j])) for i, j in enumerate(best)]
+
+
+def chunk_hits(embeddings, partition: dict, threshold: float):
+    """Chunk-level fallback in the same shape as match_sentences() (preview instead of exact sentence)."""
+    best = best_matches(embeddings, partition)
+    if best is None:
+        return None
+    # only the chunks that are reported as matches are fetched
+    matched_ids = list({cid for cid, score in best if score > threshold})
+    found = get_collection().get(ids=matched_ids, include=["documents", "metadatas"]) if matched_ids else {"ids": []}
+    docs = {cid: (doc, meta) for cid, doc, meta in zip(found["ids"], found.get("documents") or [],
+                                                         found.get("metadatas") or [])}
+    hits = []
+    for chunk_id, score in best:
+        doc, meta = docs.get(chunk_id, (None, None))
+        hits.append({"id": chunk_id, "text": doc[:250] if doc else None, "similarity": score,
+                     "chunk_id": chunk_id, "start": None, "end": None,
+                     "source": (meta or {}).get("source", "Unknown")})
+    return hits
+
+
+@router.post("/check", response_model=PlagiarismResponse)
+def check_plagiarism(req: PlagiarismRequest, partition: dict = Depends(get_partition)):
 
     sentences = split_sentences(req.text)
-    input_embeddings = get_embeddings(sentences)
-    stored_embeddings = get_embeddings(db["documents"])
-    matrix = cosine_similarity(input_embeddings, stored_embeddings)
+    if not sentences:
+        raise HTTPException(400, "Text too short to check.")
+
+    input_embeddings = get_embeddings_batch(sentences)
+    with stage("retrieve"):
+        # exact source sentences when the sentence index covers this partition
+        hits = match_sentences(input_embeddings, partition)
+        if hits is None:
+            hits = chunk_hits(input_embeddings, partition, req.threshold)
+        elif uncovered_chunks(partition):
+            # some chunks have no sentences yet (stored with the index off / before it existed):
+            # scan the chunks too and keep the closer match per input sentence
+            chunks = chunk_hits(input_embeddings, partition, req.threshold) or hits
+            hits = [s if s["similarity"] >= c["similarity"] else c for s, c in zip(hits, chunks)]
+    if hits is None:
+        raise HTTPException(400, "No papers found in database. Upload PDF first.")
 
     reports, matches = [], []
     plag_weight = 0
 
-    for i, sentence in enumerate(sentences):
-        score = float(np.max(matrix[i]))
-        idx = int(np.argmax(matrix[i]))
-
+    for sentence, hit in zip(sentences, hits):
+        score = hit["similarity"]
         if score >= 0.85:
             label = "copied"; plag_weight += 1
         elif score >= 0.65:
@@ -121,11 +152,14 @@ def check_plagiarism(req: PlagiarismRequest):
             "label": label
         })
 
-        if score > req.threshold:
+        if score > req.threshold and hit["text"] is not None:
             matches.append({
-                "source": db["metadatas"][idx].get("source", "Unknown"),
+                "source": hit["source"],
                 "similarity": round(score, 3),
-                "matched_text": db["documents"][idx][:250]
+                "matched_text": hit["text"],
+                "chunk_id": hit["chunk_id"],
+                "start": hit["start"],
+                "end": hit["end"]
             })
 
     plagiarism_percent = round((plag_weight / len(sentences)) * 100, 2)
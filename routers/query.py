@@ -1,29 +1,40 @@
 # backend/routers/query.py
-from fastapi import APIRouter, HTTPException
-from models.query_schemas import QueryRequest, QueryResponse
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from models.query_schemas import QueryRequest, QueryResponse, BatchQueryRequest, BatchQueryItem, BatchQueryResponse
 from vector_db.client import get_collection
-from utils.embedding import get_embeddings
+from utils.embedding import get_embeddings, get_embeddings_batch
 from db.database import get_db_connection
-import requests
+from utils.ollama import generate, load_context, save_context
+from utils.metrics import stage, record_cache, inc
+from utils.partition import get_partition, partition_filter, partition_key
+from utils.ingest import sources_filter
+from utils.context_packer import CONTEXT_CANDIDATES, CONTEXT_PACKING, pack_context
+from utils.lexical_index import HYBRID_SEARCH, fuse, search_async
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+import json
+import os
 import uuid
 
 router = APIRouter(prefix="/query", tags=["query"])
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 
-def query_ollama(prompt: str, temperature: float = 0.7) -> str:
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature
-        }
-    }
-    response = requests.post(OLLAMA_URL, json=payload)
-    response.raise_for_status()
-    return response.json()["response"]
+# /batch: max questions per request, and generations in flight per request
+BATCH_QUERY_MAX = int(os.getenv("BATCH_QUERY_MAX", "64"))
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "4"))
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_QUERY_CONCURRENCY, thread_name_prefix="query-batch")
+
+STYLE_INSTRUCTIONS = {
+    "Concise": "Be concise and direct. Use short sentences.",
+    "Bullet": "Answer using clear bullet points.",
+    "Detailed": "Provide a detailed, comprehensive answer with explanations.",
+}
+
+def query_ollama(prompt: str, temperature: float = 0.7, context=None) -> dict:
+    """Returns Ollama's full response (answer in "response", KV state in "context")"""
+    return generate(prompt, MODEL_NAME, options={"temperature": temperature}, context=context)
 
 def get_chat_history(session_id: str):
     conn = get_db_connection()
@@ -33,27 +44,45 @@ def get_chat_history(session_id: str):
     conn.close()
     return [{"role": row["role"], "content": row["content"]} for row in rows]
 
-def save_message(session_id: str, role: str, content: str):
+def message_ids_since(session_id: str, first_id: int):
+    conn = get_db_connection()
+    rows = conn.execute("SELECT id FROM chat_history WHERE session_id = ? AND id >= ? ORDER BY id",
+                        (session_id, first_id)).fetchall()
+    conn.close()
+    return [row["id"] for row in rows]
+
+def save_message(session_id: str, role: str, content: str) -> int:
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute("INSERT INTO chat_history (session_id, role, content) VALUES (?, ?, ?)",
                    (session_id, role, content))
+    message_id = cursor.lastrowid
     conn.commit()
     conn.close()
+    return message_id
 
 @router.post("/", response_model=QueryResponse)
-async def query_research_bot(request: QueryRequest):
+def query_research_bot(request: QueryRequest, partition: dict = Depends(get_partition)):
     question = request.question.strip()
     if not question:
         raise HTTPException(status_code=400, detail="Question cannot be empty")
 
     # Session handle
     session_id = request.session_id or str(uuid.uuid4())
-    save_message(session_id, "user", question)
+    # stored under the caller's partition – a guessed session id shows nothing
+    history_key = partition_key(partition, session_id)
+    user_id = save_message(history_key, "user", question)
 
-    # Get previous history
-    history = get_chat_history(session_id)
-    history_context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history[:-1]])
+    # Reuse Ollama's KV context when we have one for this session + model,
+    # otherwise fall back to resending the text history
+    stored = load_context("query", history_key, MODEL_NAME)
+    if stored and message_ids_since(history_key, stored["last_seq"]) != [stored["last_seq"], user_id]:
+        stored = None   # context doesn't end right before this question (concurrent turn, history gone)
+    record_cache("llm_context", bool(stored))
+    history_context = ""
+    if not stored:
+        history = get_chat_history(history_key)
+        history_context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history[:-1]])
 
     # Advanced options with validation
     chunks = max(1, min(10, request.chunks or 5))
@@ -65,34 +94,64 @@ async def query_research_bot(request: QueryRequest):
     # Multi-doc filter
     filter_dict = None
     if request.document_names:
-        filter_dict = {"source": {"$in": request.document_names}}
+        filter_dict = sources_filter(request.document_names)
+
+    # BM25 lookup runs on its own thread while the question is embedded + searched
+    n_candidates = chunks * CONTEXT_CANDIDATES if CONTEXT_PACKING else chunks
+    include = ["documents", "metadatas", "embeddings"] if CONTEXT_PACKING else ["documents", "metadatas"]
+    lexical = search_async(question, partition, n_candidates, request.document_names) if HYBRID_SEARCH else None
 
     # Embed and search
     question_embedding = get_embeddings([question])[0]
     collection = get_collection()
-    results = collection.query(
-        query_embeddings=[question_embedding],
-        n_results=chunks,
-        where=filter_dict,
-        include=["documents", "metadatas"]
-    )
-
-    contexts = results["documents"][0] if results["documents"] else []
-    sources = list(set(meta["source"] for meta in results["metadatas"][0])) if results["metadatas"] else []
+    with stage("retrieve"):
+        results = collection.query(
+            query_embeddings=[question_embedding],
+            n_results=n_candidates,
+            where=partition_filter(partition, filter_dict),
+            include=include
+        )
+    if lexical is not None:
+        # reciprocal rank fusion of the two rankings
+        lexical_ids = lexical.result()
+        with stage("fuse"):
+            results = fuse(collection, results, lexical_ids, n_candidates, include)
 
-    context_str = "\n\n".join(contexts) if contexts else "No relevant documents found."
+    packed = None
+    if CONTEXT_PACKING and results["ids"] and results["ids"][0]:
+        # MMR over the candidates, sentence-level trimming, token budget
+        with stage("pack"):
+            packed = pack_context(question_embedding, results["ids"][0], results["documents"][0],
+                                  results["metadatas"][0], results["embeddings"][0], chunks,
+                                  scores=results["scores"][0] if "scores" in results else None)
+        inc("context_tokens_saved_total", {"route": "query"}, packed["tokens_saved"])
+        context_str = packed["text"]
+        sources = packed["sources"]
+    else:
+        contexts = results["documents"][0] if results["documents"] else []
+        sources = list(set(meta["source"] for meta in results["metadatas"][0])) if results["metadatas"] else []
+        context_str = "\n\n".join(contexts) if contexts else "No relevant documents found."
 
     # Style instruction
-    style_instruction = ""
-    if style == "Concise":
-        style_instruction = "Be concise and direct. Use short sentences."
-    elif style == "Bullet":
-        style_instruction = "Answer using clear bullet points."
-    else:  # Detailed
-        style_instruction = "Provide a detailed, comprehensive answer with explanations."
+    style_instruction = STYLE_INSTRUCTIONS[style]
 
     # Final prompt
-    prompt = f"""You are an expert research assistant. Answer based on the context and previous conversation.
+    if stored:
+        # preamble + earlier turns are already in the KV context
+        prompt = f"""
+
+Current context:
+{context_str}
+
+Instructions:
+- {style_instruction}
+- Be accurate and helpful.
+
+Question: {question}
+
+Answer:"""
+    else:
+        prompt = f"""You are an expert research assistant. Answer based on the context and previous conversation.
 
 Previous conversation:
 {history_context}
@@ -109,15 +168,106 @@ Question: {question}
 Answer:"""
 
     # Generate answer with temperature
-    answer = query_ollama(prompt, temperature)
+    result = query_ollama(prompt, temperature, context=stored["context"] if stored else None)
+    answer = result["response"]
 
     # Save and return
-    save_message(session_id, "assistant", answer)
-    full_history = get_chat_history(session_id)
+    message_id = save_message(history_key, "assistant", answer)
+    save_context("query", history_key, MODEL_NAME, result.get("context"), message_id)
+    full_history = get_chat_history(history_key)
 
     return QueryResponse(
         answer=answer,
         sources=sources,
         session_id=session_id,
-        history=full_history
-    )
\ No newline at end of file
+        history=full_history,
+        context_tokens=packed["tokens"] if packed else None,
+        context_tokens_saved=packed["tokens_saved"] if packed else None,
+    )
+
+
+# ==================== Batch ==================== #
+
+def _answer_one(index: int, question: str, context_str: str, sources: list,
+                style_instruction: str, temperature: float) -> BatchQueryItem:
+    prompt = f"""You are an expert research assistant. Answer based on the context.
+
+Current context:
+{context_str}
+
+Instructions:
+- {style_instruction}
+- Be accurate and helpful.
+
+Question: {question}
+
+Answer:"""
+    try:
+        answer = query_ollama(prompt, temperature)["response"]
+        return BatchQueryItem(index=index, question=question, answer=answer, sources=sources)
+    except HTTPException as e:   # admission control: queue full / deadline
+        return BatchQueryItem(index=index, question=question, sources=sources, error=f"{e.status_code}: {e.detail}")
+    except Exception as e:
+        return BatchQueryItem(index=index, question=question, sources=sources, error=f"LLM error: {e}")
+
+
+@router.post("/batch", response_model=BatchQueryResponse)
+def query_batch(request: BatchQueryRequest, partition: dict = Depends(get_partition)):
+    """Answer many independent questions against the same documents.
+
+    One batched embedding call, one multi-vector Chroma query, chunk texts
+    shared between questions, generations run concurrently. Stateless – no
+    chat history is read or written.
+    """
+    questions = [q.strip() for q in request.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if len(questions) > BATCH_QUERY_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_QUERY_MAX} questions per batch")
+
+    chunks = max(1, min(10, request.chunks or 5))
+    temperature = max(0.0, min(1.0, request.temperature or 0.7))
+    style = (request.style or "Detailed").capitalize()
+    style_instruction = STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS["Detailed"])
+    filter_dict = sources_filter(request.document_names) if request.document_names else None
+
+    embeddings = get_embeddings_batch(questions)
+    collection = get_collection()
+    with stage("retrieve"):
+        results = collection.query(
+            query_embeddings=embeddings,
+            n_results=chunks,
+            where=partition_filter(partition, filter_dict),
+            include=["documents", "metadatas"]
+        )
+
+    # one copy of each chunk no matter how many questions retrieved it
+    chunk_text, chunk_source = {}, {}
+    per_question = []
+    for ids, docs, metas in zip(results["ids"], results["documents"], results["metadatas"]):
+        for cid, doc, meta in zip(ids, docs, metas):
+            chunk_text.setdefault(cid, doc)
+            chunk_source.setdefault(cid, meta["source"])
+        per_question.append(ids)
+    while len(per_question) < len(questions):
+        per_question.append([])
+
+    # copy_context → admission priority + stage timings follow into the pool
+    futures = {}
+    for i, (question, ids) in enumerate(zip(questions, per_question)):
+        context_str = "\n\n".join(chunk_text[c] for c in ids) if ids else "No relevant documents found."
+        sources = list(dict.fromkeys(chunk_source[c] for c in ids))
+        future = _batch_pool.submit(contextvars.copy_context().run, _answer_one,
+                                    i, question, context_str, sources, style_instruction, temperature)
+        futures[future] = i
+
+    retrieved = sum(len(ids) for ids in per_question)
+    if request.stream:
+        def lines():
+            for future in as_completed(futures):
+                yield future.result().model_dump_json() + "\n"
+            yield json.dumps({"done": True, "retrieved_chunks": retrieved, "unique_chunks": len(chunk_text)}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    items = sorted((f.result() for f in futures), key=lambda item: item.index)
+    return BatchQueryResponse(results=items, retrieved_chunks=retrieved, unique_chunks=len(chunk_text))
@@ -1,16 +1,19 @@
 # backend/routers/topic_finder.py
-from fastapi import APIRouter, HTTPException, Query
-from vector_db.client import get_collection
+from fastapi import APIRouter, Depends, HTTPException, Query
 import requests
 from typing import List, Dict
 from pydantic import BaseModel
 import xml.etree.ElementTree as ET
-import re, json
 from collections import Counter
+from models.schemas import TopicSuggestion, TopicSuggestionList
+from utils.structured import generate_structured, StructuredOutputError
+from utils.partition import get_partition
+from utils.jobs import job_progress, submit_job
+from utils.ingest import list_documents
+from utils.topic_clusters import cluster_digest
 
 router = APIRouter(prefix="/topic-finder", tags=["topic-finder"])
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
 
 ARXIV_CATEGORIES = {
@@ -23,21 +26,12 @@ ARXIV_CATEGORIES = {
 }
 
 # ---------- Response Schemas ----------
-class TopicSuggestion(BaseModel):
-    topic: str
-    research_question: str
-    importance: str
-    current_direction: str
-    research_gap: str
-    confidence_score: int
-    status: str
-    sources: List[str]
-
 class TopicFinderResponse(BaseModel):
     topics: List[TopicSuggestion]
     trend_chart_config: Dict
     word_cloud_data: Dict
     paper_count: int
+    clusters: List[Dict] = []
     message: str = "Topics generated from uploaded documents"
 
 
@@ -47,8 +41,20 @@ def topic_finder(
     domain: str = Query(...),
     time_period: str = Query("Last 1 Year"),
     num_topics: int = Query(5, ge=3, le=10),
-    use_uploaded_docs: bool = Query(True)
+    use_uploaded_docs: bool = Query(True),
+    job: bool = Query(False, description="run in the background: 202 + job id, see /jobs"),
+    partition: dict = Depends(get_partition)
 ):
+    if job:
+        params = {"domain": domain, "time_period": time_period, "num_topics": num_topics,
+                  "use_uploaded_docs": use_uploaded_docs}
+        return submit_job("topic_finder", params, partition, find_topics,
+                          domain, time_period, num_topics, use_uploaded_docs, partition)
+    return find_topics(domain, time_period, num_topics, use_uploaded_docs, partition)
+
+
+def find_topics(domain: str, time_period: str, num_topics: int, use_uploaded_docs: bool,
+                partition: dict) -> TopicFinderResponse:
     # Time filter mapping
     time_filters = {
         "Last 1 Year": "since:2024-01-01",
@@ -58,6 +64,7 @@ def topic_finder(
     time_filter = time_filters.get(time_period)
 
     # ================== FETCH TRENDS ==================
+    job_progress(0.05, "fetching arXiv trends")
     trend_data = ""
     year_counts = Counter()
 
@@ -83,25 +90,29 @@ def topic_finder(
         trend_data = f"No trend data found. Error: {e}"
 
     # ================== UPLOADED DOCUMENTS PROCESSING ==================
+    # fixed-size digest of embedding clusters over the whole library (utils/topic_clusters.py)
     uploaded_context = ""
     paper_count = 0
+    clusters = []
     word_freq = Counter()
 
     if use_uploaded_docs:
-        coll = get_collection().get(include=["documents", "metadatas"])
-        if coll["documents"]:
-            paper_count = len(coll["documents"])
-            text = " ".join(coll["documents"]).lower()
-            uploaded_context = text[:5000]  # prevent token overload
-
-            for word in re.findall(r'\b[a-zA-Z]{4,}\b', text):
-                if word not in {"this","that","with","from","have","been","were","which"}:
-                    word_freq[word] += 1
+        job_progress(0.2, "clustering uploaded documents")
+        digest = cluster_digest(partition)
+        if digest:
+            paper_count = len(list_documents(partition))
+            clusters = digest["clusters"]
+            uploaded_context = digest["text"]
+
+            # word cloud: cluster keywords weighted by cluster size
+            for c in clusters:
+                for word in c["keywords"]:
+                    word_freq[word] += c["size"]
 
     # ================== LLM PROMPT ==================
     prompt = f"""
 Generate {num_topics} academic research topics in {domain}. 
-Use trend data and uploaded documents to identify research gaps.
+Use trend data and the topic clusters of the uploaded documents to identify research gaps.
 
 Trends:
 {trend_data}
@@ -109,18 +120,20 @@ Trends:
 User documents:
 {uploaded_context}
 
-Return JSON only with:
-topic, research_question, importance, current_direction, research_gap, confidence_score,
+Return JSON {{"topics": [...]}} where each topic has:
+topic, research_question, importance, current_direction, research_gap, confidence_score (0-100),
 status (Emerging/Well-established/High-risk), sources (2-3 links)
 """
 
+    job_progress(0.3, f"generating {num_topics} topics")
     try:
-        res = requests.post(OLLAMA_URL, json={"model": MODEL_NAME,"prompt": prompt,"stream":False}).json()
-        data = re.search(r'\[.*\]', res["response"], re.DOTALL).group(0)
-        topics = json.loads(data)
-
+        topics = generate_structured(prompt, TopicSuggestionList, MODEL_NAME, endpoint="topic_finder").topics
+    except StructuredOutputError as e:
+        raise HTTPException(502, f"LLM Output parsing failed → {e}")
+    except HTTPException:
+        raise   # 429/503 from admission control
     except Exception as e:
-        raise HTTPException(500, f"LLM Output parsing failed → {e}")
+        raise HTTPException(500, f"LLM error → {e}")
 
     # Trend chart generation
     trend_chart = {
@@ -135,5 +148,6 @@ status (Emerging/Well-established/High-risk), sources (2-3 links)
         topics=topics,
         trend_chart_config=trend_chart,
         word_cloud_data=word_cloud,
-        paper_count=paper_count
+        paper_count=paper_count,
+        clusters=clusters
     )
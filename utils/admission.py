@@ -0,0 +1,195 @@
+# backend/utils/admission.py
+"""Admission control in front of Ollama generations.
+
+Ollama only runs a few generations at once (OLLAMA_NUM_PARALLEL). Without a
+gate every request piles onto it and all of them slow down together until
+they time out. Here each `generate()` call first takes one of
+LLM_CONCURRENCY slots:
+
+- waiting callers are served by priority class (interactive > default > batch),
+  FIFO within a class – a chat turn overtakes a queued full-paper section
+- each class has a bounded queue; a full queue answers 429 straight away
+- each class has a queue-time deadline; giving up answers 503
+- both carry Retry-After, estimated from the recent slot hold time
+
+A waiting caller blocks the thread it runs on, and sync routes run on
+anyio's shared threadpool (THREADPOOL_SIZE tokens, set at startup). So all
+classes together never queue more than THREADPOOL_SIZE - LLM_CONCURRENCY -
+ADMISSION_THREAD_RESERVE callers: even with every slot busy and every queue
+full, the reserve is left for the routes that never touch Ollama (/ready,
+/metrics, auth, uploads). Beyond that the queue answers 429.
+
+The class comes from the request path (ADMISSION_ROUTES) and is set per
+request by AdmissionMiddleware; calls made outside a request use "default".
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict
+
+from fastapi import HTTPException
+
+from utils.metrics import inc, observe, set_gauge, stage
+
+PRIORITIES = ("interactive", "default", "batch")   # highest first
+
+
+def _parse_map(value: str, cast) -> Dict:
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {k.strip(): cast(v.strip()) for k, v in pairs}
+
+
+# concurrent generations let through to Ollama (match OLLAMA_NUM_PARALLEL)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "2"))
+ADMISSION_QUEUE_LIMITS = _parse_map(os.getenv("ADMISSION_QUEUE_LIMITS", "interactive=32,default=16,batch=4"), int)
+ADMISSION_QUEUE_TIMEOUT_S = _parse_map(
+    os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "interactive=15,default=30,batch=60"), float)
+# anyio threadpool size for sync routes (anyio's default is 40)
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+# request threads that waiting generations may never take
+ADMISSION_THREAD_RESERVE = int(os.getenv("ADMISSION_THREAD_RESERVE", "8"))
+# path prefix -> priority class, longest prefix wins
+ADMISSION_ROUTES = _parse_map(os.getenv(
+    "ADMISSION_ROUTES",
+    "/query=interactive,/query/batch=default,/grammar-style/chat=interactive,"
+    "/ai-writer/full-paper=batch,/literature-review=batch,/topic-finder=batch"), str)
+
+_priority: ContextVar[str] = ContextVar("admission_priority", default="default")
+
+
+class AdmissionRejected(HTTPException):
+    """429 (queue full) / 503 (queue deadline passed), with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(status_code, detail, headers={"Retry-After": str(retry_after)})
+
+
+class AdmissionController:
+    def __init__(self, slots: int, limits: Dict[str, int], timeouts: Dict[str, float], max_waiting: int):
+        self.slots = max(1, slots)
+        self.max_waiting = max(0, max_waiting)   # all classes together
+        self.limits = {p: min(limits.get(p, 16), self.max_waiting) for p in PRIORITIES}
+        self.timeouts = {p: timeouts.get(p, 30.0) for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._queues = {p: deque() for p in PRIORITIES}
+        self._hold_s = 5.0   # EWMA of how long a generation keeps its slot
+
+    # ---- queue bookkeeping (call with the lock held) ---- #
+
+    def _head(self):
+        for p in PRIORITIES:
+            if self._queues[p]:
+                return self._queues[p][0]
+        return None
+
+    def _publish(self):
+        for p in PRIORITIES:
+            set_gauge("llm_queue_depth", len(self._queues[p]), {"priority": p})
+        set_gauge("llm_inflight", self._inflight)
+
+    def _retry_after(self, priority: str) -> int:
+        ahead = sum(len(self._queues[p]) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        return max(1, math.ceil((ahead + 1) * self._hold_s / self.slots))
+
+    # ---- public API ---- #
+
+    def acquire(self, priority: str):
+        priority = priority if priority in self._queues else "default"
+        start = time.monotonic()
+        with self._cond:
+            if self._inflight < self.slots and self._head() is None:
+                self._inflight += 1
+                self._publish()
+                return
+            queue = self._queues[priority]
+            waiting = sum(len(q) for q in self._queues.values())
+            if len(queue) >= self.limits[priority] or waiting >= self.max_waiting:
+                inc("llm_admission_rejected_total", {"priority": priority, "reason": "queue_full"})
+                raise AdmissionRejected(429, f"LLM queue full ({priority}), try again later",
+                                        self._retry_after(priority))
+            ticket = object()
+            queue.append(ticket)
+            self._publish()
+            deadline = start + self.timeouts[priority]
+            try:
+                while not (self._head() is ticket and self._inflight < self.slots):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        inc("llm_admission_rejected_total", {"priority": priority, "reason": "timeout"})
+                        raise AdmissionRejected(503, f"LLM busy: waited {self.timeouts[priority]:.0f}s in queue",
+                                                self._retry_after(priority))
+                    self._cond.wait(remaining)
+                self._inflight += 1
+            finally:
+                queue.remove(ticket)
+                self._publish()
+                self._cond.notify_all()   # the next head may be able to go now
+        observe("llm_queue_wait_seconds", time.monotonic() - start, {"priority": priority})
+
+    def release(self, held_s: float):
+        with self._cond:
+            self._inflight -= 1
+            self._hold_s = 0.8 * self._hold_s + 0.2 * held_s
+            self._publish()
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return {"inflight": self._inflight, "slots": self.slots, "max_waiting": self.max_waiting,
+                    "queued": {p: len(q) for p, q in self._queues.items()}}
+
+
+_controller = AdmissionController(LLM_CONCURRENCY, ADMISSION_QUEUE_LIMITS, ADMISSION_QUEUE_TIMEOUT_S,
+                                  THREADPOOL_SIZE - LLM_CONCURRENCY - ADMISSION_THREAD_RESERVE)
+
+
+def configure_threadpool():
+    """Size anyio's threadpool to THREADPOOL_SIZE (call from the lifespan, inside the event loop)."""
+    from anyio.to_thread import current_default_thread_limiter
+
+    current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+@contextmanager
+def llm_slot():
+    """Hold one generation slot for the current request's priority class."""
+    with stage("queue"):
+        _controller.acquire(_priority.get())
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        _controller.release(time.monotonic() - start)
+
+
+def admission_snapshot() -> Dict:
+    return _controller.snapshot()
+
+
+def priority_for_path(path: str) -> str:
+    best, best_len = "default", -1
+    for prefix, priority in ADMISSION_ROUTES.items():
+        if path.startswith(prefix) and len(prefix) > best_len:
+            best, best_len = priority, len(prefix)
+    return best
+
+
+class AdmissionMiddleware:
+    """Tags each HTTP request with its priority class (read by llm_slot())."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _priority.set(priority_for_path(scope["path"]))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _priority.reset(token)
@@ -1,10 +1,22 @@
 # backend/utils/chunking.py
-import tiktoken
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    # building cl100k_base is expensive – do it once per process, on first use
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
 
 def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
-    encoding = tiktoken.get_encoding("cl100k_base")
+    encoding = get_encoding()
     tokens = encoding.encode(text)
-    
+
     chunks = []
     i = 0
     while i < len(tokens):
@@ -12,4 +24,4 @@ def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> l
         chunk_text = encoding.decode(chunk)
         chunks.append(chunk_text)
         i += chunk_size - chunk_overlap
-    return chunks
\ No newline at end of file
+    return chunks
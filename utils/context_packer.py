@@ -0,0 +1,145 @@
+# backend/utils/context_packer.py
+"""Token-budgeted prompt context for /query.
+
+Pasting the top-k chunks verbatim wastes most of the prompt: consecutive
+chunks share a 200-token overlap, near-identical passages show up from
+several papers, and only a few sentences of each 1000-token chunk actually
+answer the question. gemma's prefill time grows with every one of those
+tokens. The packer:
+
+1. over-fetches CONTEXT_CANDIDATES x k chunks and picks k of them with MMR
+   (relevance vs. similarity to what is already picked), dropping anything
+   with cosine >= CONTEXT_DUP_SIM to a picked chunk
+2. splits the picked chunks into their indexed sentences (sentence_index)
+   and ranks those against the question; every picked chunk keeps at least
+   its best sentence, sentences repeated through chunk overlap or
+   near-duplicates are kept once, and sentences further than
+   CONTEXT_SENTENCE_MARGIN below the best one are dropped
+3. fills CONTEXT_TOKEN_BUDGET with the best sentences and prints them back in
+   document order, grouped per chunk
+
+Chunks without indexed sentences are packed whole. The selection is NumPy
+on at most a few hundred vectors; the real cost is one sentence-collection
+read and token counting (~10 ms), against seconds of prefill saved.
+CONTEXT_PACKING=off restores the old top-k paste.
+"""
+import os
+from typing import Dict, List
+
+from utils.chunking import count_tokens
+from utils.sentence_index import chunk_sentences
+
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "on").lower() not in ("off", "0", "false", "no")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "3"))            # fetched = k x this
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))        # 1.0 = pure relevance
+CONTEXT_DUP_SIM = float(os.getenv("CONTEXT_DUP_SIM", "0.95"))
+CONTEXT_SENTENCE_MARGIN = float(os.getenv("CONTEXT_SENTENCE_MARGIN", "0.25"))
+
+
+def _unit(vectors) -> "np.ndarray":
+    import numpy as np   # keep numpy out of import time (routers.query imports this module)
+
+    m = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.maximum(norms, 1e-12)
+
+
+def mmr_select(relevance: "np.ndarray", vectors: "np.ndarray", k: int,
+               lam: float = CONTEXT_MMR_LAMBDA, dup_sim: float = CONTEXT_DUP_SIM) -> List[int]:
+    """Indices of up to k rows by maximal marginal relevance; near-duplicates are never picked."""
+    import numpy as np
+
+    redundancy = np.zeros(len(vectors), dtype=np.float32)   # max similarity to anything picked
+    available = np.ones(len(vectors), dtype=bool)
+    picked = []
+    while len(picked) < k and available.any():
+        score = np.where(available, lam * relevance - (1 - lam) * redundancy, -np.inf)
+        best = int(np.argmax(score))
+        picked.append(best)
+        sims = vectors @ vectors[best]
+        redundancy = np.maximum(redundancy, sims)
+        available &= sims < dup_sim
+        available[best] = False
+    return picked
+
+
+def _units(picked: List[int], ids: List[str], docs: List[str], embeddings) -> List[Dict]:
+    """Sentences of the picked chunks (or the whole chunk when it has none indexed)."""
+    sentences = chunk_sentences([ids[i] for i in picked])
+    units = []
+    for rank, i in enumerate(picked):
+        for s in sentences.get(ids[i]) or [{"text": docs[i], "start": 0, "embedding": embeddings[i]}]:
+            units.append({"rank": rank, "chunk": i, "start": s["start"], "text": s["text"],
+                          "embedding": s["embedding"]})
+    return units
+
+
+def pack_context(question_embedding, ids: List[str], docs: List[str], metas: List[Dict],
+                 embeddings, k: int, budget: int = CONTEXT_TOKEN_BUDGET, scores: List[float] = None) -> Dict:
+    """Build the prompt context from over-fetched candidates (ordered by relevance).
+
+    `scores` (e.g. the hybrid search's RRF scores) replace cosine similarity
+    as chunk relevance, so chunks found lexically are not ranked away again.
+    Returns {"text", "sources", "tokens", "raw_tokens", "tokens_saved", "chunks", "sentences"},
+    where raw_tokens is what pasting the top-k chunks would have cost.
+    """
+    import numpy as np
+
+    raw_tokens = count_tokens("\n\n".join(docs[:k]))
+    if not ids:
+        return {"text": "", "sources": [], "tokens": 0, "raw_tokens": 0, "tokens_saved": 0,
+                "chunks": 0, "sentences": 0}
+
+    query = _unit(question_embedding)
+    candidates = _unit(embeddings)
+    if scores is not None:
+        chunk_relevance = np.asarray(scores, dtype=np.float32) / max(max(scores), 1e-12)
+    else:
+        chunk_relevance = candidates @ query
+    picked = mmr_select(chunk_relevance, candidates, k)
+    units = _units(picked, ids, docs, embeddings)
+
+    vectors = _unit([u["embedding"] for u in units])
+    relevance = vectors @ query
+    by_relevance = np.argsort(-relevance)
+    floor = relevance[by_relevance[0]] - CONTEXT_SENTENCE_MARGIN
+    # the best sentence of each picked chunk first, then the rest by relevance
+    best_of_chunk = {}
+    for i in by_relevance:
+        best_of_chunk.setdefault(units[i]["rank"], int(i))
+    order = sorted(best_of_chunk.values(), key=lambda i: units[i]["rank"])
+    order += [int(i) for i in by_relevance if relevance[i] >= floor and int(i) not in order]
+    sims = vectors @ vectors.T
+
+    kept, seen, used = [], set(), 0
+    for i in order:
+        text = " ".join(units[i]["text"].split())
+        if text.lower() in seen or (kept and sims[i, kept].max() >= CONTEXT_DUP_SIM):
+            continue   # chunk overlap / the same passage in another paper
+        tokens = count_tokens(text)
+        if kept and used + tokens > budget:
+            continue   # a shorter, less relevant sentence may still fit
+        kept.append(int(i))
+        seen.add(text.lower())
+        used += tokens
+
+    kept.sort(key=lambda i: (units[i]["rank"], units[i]["start"]))
+    blocks, chunk_of_block = [], []
+    for i in kept:
+        if chunk_of_block and chunk_of_block[-1] == units[i]["chunk"]:
+            blocks[-1].append(units[i]["text"])
+        else:
+            blocks.append([units[i]["text"]])
+            chunk_of_block.append(units[i]["chunk"])
+    text = "\n\n".join(" ".join(block) for block in blocks)
+    tokens = count_tokens(text)
+    return {
+        "text": text,
+        "sources": list(dict.fromkeys(metas[c]["source"] for c in chunk_of_block)),
+        "tokens": tokens,
+        "raw_tokens": raw_tokens,
+        "tokens_saved": max(0, raw_tokens - tokens),
+        "chunks": len(blocks),
+        "sentences": len(kept),
+    }
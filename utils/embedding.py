@@ -5,6 +5,8 @@ from typing import List
 
 import requests
 
+from utils.metrics import stage
+
 # Ollama local server – default port 11434
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text:latest")
@@ -58,7 +60,40 @@ def get_embeddings(texts: List[str]) -> List[List[float]]:
     retries = int(os.getenv("OLLAMA_EMBED_RETRIES", "2"))
 
     try:
-        with requests.Session() as session:
+        with stage("embed"), requests.Session() as session:
             return [_embed_one(text, session=session, timeout_s=timeout_s, retries=retries) for text in texts]
     except Exception as e:
-        raise Exception(f"Embedding error: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Embedding error: {str(e)}")
+
+
+def get_embeddings_batch(texts: List[str], batch_size: int = None) -> List[List[float]]:
+    """Embed many texts with Ollama's batched /api/embed – one round trip per batch.
+
+    Unlike get_embeddings, empty texts are not dropped: the result lines up
+    1:1 with the input (callers index into it).
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    if not texts:
+        return []
+
+    batch_size = batch_size or int(os.getenv("OLLAMA_EMBED_BATCH", "64"))
+    timeout_s = float(os.getenv("OLLAMA_EMBED_TIMEOUT_S", "120"))
+    out: List[List[float]] = []
+    try:
+        with stage("embed"), requests.Session() as session:
+            for i in range(0, len(texts), batch_size):
+                batch = [t if t and str(t).strip() else " " for t in texts[i:i + batch_size]]
+                resp = session.post(f"{OLLAMA_BASE_URL}/api/embed",
+                                    json={"model": OLLAMA_EMBED_MODEL, "input": batch}, timeout=timeout_s)
+                if resp.status_code == 404:
+                    # older Ollama without /api/embed – fall back to one call per text
+                    out += [_embed_one(t, session=session, timeout_s=timeout_s, retries=2) for t in batch]
+                    continue
+                resp.raise_for_status()
+                out += resp.json()["embeddings"]
+    except requests.exceptions.ConnectionError as e:
+        raise Exception("Embedding error: Ollama not running! Run 'ollama serve' in terminal.") from e
+    except Exception as e:
+        raise Exception(f"Embedding error: {str(e)}")
+    return out
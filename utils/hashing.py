@@ -1,9 +1,60 @@
-from passlib.context import CryptContext
+# backend/utils/hashing.py
+"""bcrypt password hashing, off the event loop.
+
+bcrypt is slow on purpose (~250 ms per hash/verify at 12 rounds). Called
+inline from an `async def` handler it would stall every other request on the
+loop for that long, so the async helpers run it in a small dedicated pool.
+HASH_WORKERS bounds how many CPU cores logins can eat at once; extra logins
+queue in the pool instead of piling onto the CPU.
+
+(bcrypt is used directly – passlib 1.7 no longer works with bcrypt >= 4.1.)
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+def _secret(password: str) -> bytes:
+    return password.encode("utf-8")[:72]   # bcrypt only looks at the first 72 bytes
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("ascii")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    try:
+        return bcrypt.checkpw(_secret(plain_password), hashed_password.encode("ascii"))
+    except ValueError:   # malformed hash
+        return False
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> str:
+    # compared against for unknown usernames, so they take as long as a wrong password
+    return hash_password("not-a-real-password")
+
+
+def _verify_or_dummy(plain_password: str, hashed_password):
+    if hashed_password is None:
+        verify_password(plain_password, _dummy_hash())
+        return False
+    return verify_password(plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str = None) -> bool:
+    """Verify in the hash pool; with no stored hash, burns the same time and returns False."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _hash_pool, _verify_or_dummy, plain_password, hashed_password)
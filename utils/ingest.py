@@ -0,0 +1,465 @@
+# backend/utils/ingest.py
+"""One ingestion pipeline for /upload and /plagiarism/upload-pdf.
+
+Both endpoints used to write the same papers into the collection in two
+shapes (1000-token chunks with `file_chunk_i` ids vs 1500-char slices with
+random uuids), so every paper was stored and embedded twice. Now both go
+through ingest_pdf():
+
+    save file -> extract text -> chunk_text() -> content-hash ids
+    -> embed + store only chunks the partition does not have yet
+    -> add this source to the `sources` list of chunks it already has
+    -> sentence index + keyword catalog for the new chunks
+    -> fold the new vectors into the partition's topic clusters
+
+A chunk id is partition_key(partition, blake2b(normalised text)), so an
+identical chunk is stored once per partition no matter how many papers
+contain it. Its metadata keeps `source` (the first paper that stored it –
+shard routing and the mirror use this) and `sources` (every paper that
+references it); filter by paper with sources_filter().
+
+Collections filled before this change are deduplicated with
+
+    python -m utils.ingest migrate [--dry-run]
+
+delete_document() undoes an ingest: the paper is dropped from `sources`,
+chunks no other paper references are deleted (vectors, mirror rows,
+sentences, IDF counts), and the keyword catalog row, the partition's cached
+LLM contexts, the `documents` row and the stored file go too.
+
+    python -m utils.ingest orphans [--delete]   # chunks whose PDF is gone
+
+A paper restored from a snapshot without its PDF (vector_db/snapshot.py,
+--no-pdfs or a snapshot from before PDFs were included) has
+documents.without_file set: its chunks are not orphans, and
+`orphans --delete` leaves them alone.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from db.database import get_db_connection
+from utils.chunking import chunk_text
+from utils.embedding import get_embeddings_batch
+from utils.keywords import delete_document_keywords, index_document_keywords, remove_term_stats
+from utils.lexical_index import delete_chunks, index_chunks, set_sources
+from utils.metrics import stage
+from utils.partition import partition_filter, partition_key, partition_metadata
+from utils.pdf_parser import extract_text_from_pdf
+from utils.sentence_index import delete_sentences, embed_sentences, retag_sentences, store_sentences
+from utils.topic_clusters import absorb_new
+
+UPLOAD_FOLDER = "uploaded_pdfs"
+# rows per get / add call in the migration
+_MIGRATE_BATCH = 1000
+
+_WS_RE = re.compile(r"\s+")
+
+
+def content_hash(text: str) -> str:
+    """Stable digest of a chunk's text (whitespace-insensitive)."""
+    normalised = _WS_RE.sub(" ", text).strip()
+    return hashlib.blake2b(normalised.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def chunk_id(partition: Dict[str, str], text: str) -> str:
+    return partition_key(partition, content_hash(text))
+
+
+def sources_filter(names: List[str]) -> Dict:
+    """Chroma `where` matching chunks referenced by any of the given papers."""
+    clauses = [{"sources": {"$contains": name}} for name in names]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def file_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def source_filter(source: str) -> Dict:
+    """Chunks referenced by one paper (also matches rows from before `sources` existed)."""
+    return {"$or": [{"sources": {"$contains": source}}, {"source": source}]}
+
+
+def pdf_path(partition: Dict[str, str], filename: str) -> str:
+    # each user/project gets its own folder – file names repeat across users
+    folder = os.path.join(UPLOAD_FOLDER, partition["owner"], partition["project"])
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, os.path.basename(filename))
+
+
+# ==================== Pipeline ==================== #
+
+def store_chunks(source: str, chunks: List[str], partition: Dict[str, str]) -> Dict:
+    """Store a document's chunks, embedding only the ones the partition does not already hold.
+
+    Embedding (chunks and their sentences) happens before write_lock is
+    taken, so other writers and compaction never wait on Ollama; under the
+    lock the partition is checked again and only what is still missing is added.
+    """
+    from vector_db.client import get_collection, write_lock
+
+    collection = get_collection()
+    ids, first = [], {}          # first: chunk id -> index of its first occurrence in this doc
+    for i, chunk in enumerate(chunks):
+        cid = chunk_id(partition, chunk)
+        ids.append(cid)
+        first.setdefault(cid, i)
+
+    def metadata(cid):
+        return {"source": source, "sources": [source], "chunk_index": first[cid], **partition_metadata(partition)}
+
+    unique = list(first)
+    held = set(collection.get(ids=unique, include=[])["ids"])
+    todo = [cid for cid in unique if cid not in held]
+    todo_chunks = [chunks[first[cid]] for cid in todo]
+    embedded = dict(zip(todo, get_embeddings_batch(todo_chunks)))
+    sentence_rows = embed_sentences(todo, todo_chunks, [metadata(cid) for cid in todo])
+
+    with write_lock:
+        # reopen: a compaction (any worker) may have swapped the generation while we embedded
+        collection = get_collection()
+        existing = collection.get(ids=unique, include=["metadatas"])
+        known = dict(zip(existing["ids"], existing["metadatas"]))
+
+        new_ids = [cid for cid in unique if cid not in known]
+        new_chunks = [chunks[first[cid]] for cid in new_ids]
+        new_metas = [metadata(cid) for cid in new_ids]
+        # deleted by another writer since the first check (rare): embed those now
+        late = [cid for cid in new_ids if cid not in embedded]
+        if late:
+            late_chunks = [chunks[first[cid]] for cid in late]
+            embedded.update(zip(late, get_embeddings_batch(late_chunks)))
+            late_rows = embed_sentences(late, late_chunks, [metadata(cid) for cid in late])
+            for key in sentence_rows:
+                sentence_rows[key] = list(sentence_rows[key]) + list(late_rows[key])
+        if new_ids:
+            with stage("index"):
+                collection.add(ids=new_ids, embeddings=[embedded[cid] for cid in new_ids],
+                               documents=new_chunks, metadatas=new_metas)
+            index_chunks(new_ids, new_chunks, new_metas)
+
+        # chunks another paper already stored: just add this paper as a reference
+        ref_ids, ref_metas = [], []
+        for cid, meta in known.items():
+            meta = dict(meta or {})
+            sources = list(meta.get("sources") or [meta.get("source")])
+            if source not in sources:
+                meta["sources"] = sources + [source]
+                ref_ids.append(cid)
+                ref_metas.append(meta)
+        if ref_ids:
+            with stage("index"):
+                collection.update(ids=ref_ids, metadatas=ref_metas)
+            set_sources({cid: meta["sources"] for cid, meta in zip(ref_ids, ref_metas)})
+
+        sentences = store_sentences(sentence_rows, new_ids)
+    if new_ids:
+        absorb_new(partition)
+    return {"ids": ids, "new_chunks": new_chunks, "stored": len(new_ids), "reused": len(known),
+            "sentences": sentences}
+
+
+def ingest_pdf(filename: str, content: bytes, partition: Dict[str, str]) -> Optional[Dict]:
+    """Save, parse, chunk and store one PDF; None if no text could be extracted."""
+    path = pdf_path(partition, filename)
+    with open(path, "wb") as fh:
+        fh.write(content)
+
+    text = extract_text_from_pdf(path)
+    if not text:
+        os.remove(path)
+        return None
+
+    chunks = chunk_text(text)
+    result = store_chunks(filename, chunks, partition)
+    # keywords precomputed once here, looked up later by /ai-writer;
+    # only chunks new to the corpus count towards the IDF statistics
+    index_document_keywords(partition_key(partition, filename), text, result.pop("new_chunks"))
+    _catalog_add(partition, filename, file_hash(content), path, len(chunks))
+    return {"source": filename, "chunks": len(chunks), "text_chars": len(text), **result}
+
+
+# ==================== Catalog + delete ==================== #
+
+def _catalog_add(partition: Dict[str, str], source: str, digest: str, path: str, chunks: int):
+    conn = get_db_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO documents (owner, project, source, file_hash, path, chunks) VALUES (?, ?, ?, ?, ?, ?)",
+        (partition["owner"], partition["project"], source, digest, path, chunks)
+    )
+    conn.commit()
+    conn.close()
+
+
+def list_documents(partition: Dict[str, str]) -> List[Dict]:
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT source, file_hash, chunks, created_at FROM documents WHERE owner = ? AND project = ? ORDER BY source",
+        (partition["owner"], partition["project"])
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def sources_for_hash(partition: Dict[str, str], digest: str) -> List[str]:
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT source FROM documents WHERE owner = ? AND project = ? AND file_hash = ?",
+        (partition["owner"], partition["project"], digest)
+    ).fetchall()
+    conn.close()
+    return [r["source"] for r in rows]
+
+
+def corpus_version(partition: Dict[str, str]) -> str:
+    """Digest of the partition's document catalog – changes on every ingest / delete."""
+    digest = hashlib.blake2b(digest_size=8)
+    for doc in list_documents(partition):
+        digest.update(f"{doc['source']}\0{doc['file_hash']}\0{doc['chunks']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _stored_file(partition: Dict[str, str], source: str) -> Optional[str]:
+    """Path of the stored PDF: partition folder, or the flat folder used before partitioning."""
+    for path in (os.path.join(UPLOAD_FOLDER, partition["owner"], partition["project"], source),
+                 os.path.join(UPLOAD_FOLDER, source)):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _drop_llm_contexts(partition: Dict[str, str]):
+    # cached /query KV contexts may hold text of the deleted paper
+    conn = get_db_connection()
+    conn.execute("DELETE FROM llm_context WHERE scope = 'query' AND session_id LIKE ?",
+                 (partition_key(partition, "%"),))
+    conn.commit()
+    conn.close()
+
+
+def delete_document(source: str, partition: Dict[str, str], remove_file: bool = True) -> Dict:
+    """Remove one paper from the partition; chunks shared with other papers stay, minus this reference."""
+    from vector_db.client import get_collection, write_lock
+
+    with write_lock:
+        collection = get_collection()   # opened under the lock: the live generation
+        found = collection.get(where=partition_filter(partition, source_filter(source)),
+                               include=["documents", "metadatas"])
+        drop_ids, drop_docs, keep_ids, keep_metas, retag = [], [], [], [], {}
+        for cid, doc, meta in zip(found["ids"], found["documents"], found["metadatas"]):
+            meta = dict(meta or {})
+            remaining = [s for s in (meta.get("sources") or [meta.get("source")]) if s != source]
+            if remaining:
+                meta["sources"] = remaining
+                if meta.get("source") == source:
+                    meta["source"] = retag[cid] = remaining[0]
+                keep_ids.append(cid)
+                keep_metas.append(meta)
+            else:
+                drop_ids.append(cid)
+                drop_docs.append(doc or "")
+
+        with stage("delete"):
+            if drop_ids:
+                collection.delete(ids=drop_ids)
+                delete_sentences(drop_ids)
+                delete_chunks(drop_ids)
+            if keep_ids:
+                collection.update(ids=keep_ids, metadatas=keep_metas)
+                set_sources({cid: meta["sources"] for cid, meta in zip(keep_ids, keep_metas)})
+            if retag:
+                retag_sentences(retag)
+    if drop_docs:
+        remove_term_stats(drop_docs)
+    delete_document_keywords(partition_key(partition, source))
+    _drop_llm_contexts(partition)
+
+    conn = get_db_connection()
+    row = conn.execute("DELETE FROM documents WHERE owner = ? AND project = ? AND source = ? RETURNING path",
+                       (partition["owner"], partition["project"], source)).fetchone()
+    conn.commit()
+    conn.close()
+    path = row["path"] if row else _stored_file(partition, source)
+    file_removed = False
+    if remove_file and path and os.path.exists(path):
+        os.remove(path)
+        file_removed = True
+
+    from vector_db.compaction import note_deleted
+    note_deleted(len(drop_ids))
+    return {"source": source, "chunks_deleted": len(drop_ids), "chunks_unshared": len(keep_ids),
+            "catalog_row": bool(row), "file_removed": file_removed}
+
+
+def find_orphans(partition: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """Chunks none of whose source PDFs exist on disk any more (read-only).
+
+    Papers restored from a snapshot without their PDF count as present.
+    """
+    from vector_db.client import get_collection
+
+    where = partition_filter(partition) if partition else None
+    data = get_collection().get(where=where, include=["metadatas"])
+    conn = get_db_connection()
+    exists: Dict[tuple, bool] = {(r["owner"], r["project"], r["source"]): True for r in conn.execute(
+        "SELECT owner, project, source FROM documents WHERE without_file = 1")}
+    conn.close()
+    orphans: Dict[tuple, Dict] = {}
+    for cid, meta in zip(data["ids"], data["metadatas"]):
+        meta = meta or {}
+        part = {"owner": meta.get("owner", ""), "project": meta.get("project", "")}
+        sources = meta.get("sources") or [meta.get("source")]
+        missing = True
+        for source in sources:
+            key = (part["owner"], part["project"], source)
+            if key not in exists:
+                exists[key] = bool(source) and _stored_file(part, source) is not None
+            missing = missing and not exists[key]
+        if missing:
+            key = (part["owner"], part["project"], tuple(sources))
+            entry = orphans.setdefault(key, {**part, "sources": list(sources), "chunk_ids": []})
+            entry["chunk_ids"].append(cid)
+    return [{**o, "chunks": len(o["chunk_ids"])} for o in orphans.values()]
+
+
+# ==================== Migration ==================== #
+
+def plan_migration(data: Dict) -> Dict:
+    """Work out the dedupe of an existing collection from its ids / documents / metadatas.
+
+    - every tagged row is re-keyed to its content-hash id; rows with the same
+      id (identical text in one partition) collapse into one, their sources merged
+    - the 1500-char slices from the old plagiarism upload (no chunk_index) are
+      dropped for papers that also have /upload chunks in the same partition –
+      they were a second copy of the same text
+    - rows without an owner are left alone (run `python -m utils.partition assign` first)
+    """
+    upload_shaped = set()
+    for meta in data["metadatas"]:
+        meta = meta or {}
+        if "owner" in meta and "chunk_index" in meta:
+            upload_shaped.add((meta["owner"], meta.get("project"), meta.get("source")))
+
+    groups: Dict[str, Dict] = {}
+    drop, untagged = [], 0
+    for old_id, doc, meta in zip(data["ids"], data["documents"], data["metadatas"]):
+        meta = meta or {}
+        if "owner" not in meta:
+            untagged += 1
+            continue
+        partition = {"owner": meta["owner"], "project": meta.get("project")}
+        if "chunk_index" not in meta and (meta["owner"], meta.get("project"), meta.get("source")) in upload_shaped:
+            drop.append(old_id)
+            continue
+        new_id = chunk_id(partition, doc or "")
+        group = groups.setdefault(new_id, {"from": [], "meta": dict(meta), "sources": []})
+        group["from"].append(old_id)
+        for source in meta.get("sources") or [meta.get("source")]:
+            if source not in group["sources"]:
+                group["sources"].append(source)
+
+    rewrite = {}
+    for new_id, group in groups.items():
+        meta = {**group["meta"], "sources": group["sources"], "chunk_index": group["meta"].get("chunk_index", 0)}
+        if group["from"] == [new_id] and meta == group["meta"]:
+            continue   # already migrated
+        rewrite[new_id] = {"from": group["from"], "meta": meta}
+    return {"rewrite": rewrite, "drop": drop, "untagged": untagged}
+
+
+def _migrate_sentences(id_map: Dict[str, str], dropped: List[str]):
+    """Re-key sentence rows to the new chunk ids (no re-embedding); drop the dropped chunks' sentences."""
+    from vector_db.client import get_sentence_collection
+
+    sentences = get_sentence_collection()
+    old_ids = list(id_map) + dropped
+    for i in range(0, len(old_ids), _MIGRATE_BATCH):
+        batch = old_ids[i:i + _MIGRATE_BATCH]
+        found = sentences.get(where={"chunk_id": {"$in": batch}},
+                              include=["embeddings", "documents", "metadatas"])
+        if not found["ids"]:
+            continue
+        keep = [r for r, meta in enumerate(found["metadatas"]) if meta["chunk_id"] in id_map]
+        rows = {}
+        for r in keep:
+            new_chunk = id_map[found["metadatas"][r]["chunk_id"]]
+            suffix = found["ids"][r].rsplit(":", 1)[1]
+            rows.setdefault(f"{new_chunk}:{suffix}", r)   # identical chunks -> identical sentences
+        if rows:
+            picked = list(rows.values())
+            sentences.upsert(ids=list(rows), embeddings=[found["embeddings"][r] for r in picked],
+                             documents=[found["documents"][r] for r in picked],
+                             metadatas=[{**found["metadatas"][r], "chunk_id": id_map[found["metadatas"][r]["chunk_id"]]}
+                                        for r in picked])
+        stale = [sid for sid in found["ids"] if sid not in rows]
+        if stale:
+            sentences.delete(ids=stale)
+
+
+def migrate(dry_run: bool = False) -> Dict:
+    """Deduplicate the collection in place (see plan_migration); embeddings are copied, not recomputed.
+
+    The BM25 index (lexical_chunks) follows the new ids, like the sentence index.
+    """
+    from vector_db.client import get_collection
+
+    collection = get_collection()
+    before = collection.count()
+    data = collection.get(include=["documents", "metadatas"])
+    plan = plan_migration(data)
+    report = {"rows_before": before, "rekeyed_groups": len(plan["rewrite"]),
+              "merged_duplicates": sum(len(g["from"]) - 1 for g in plan["rewrite"].values()),
+              "dropped_plagiarism_slices": len(plan["drop"]), "untagged_skipped": plan["untagged"]}
+    if dry_run:
+        return {**report, "dry_run": True}
+
+    items = list(plan["rewrite"].items())
+    id_map = {}
+    for i in range(0, len(items), _MIGRATE_BATCH):
+        batch = items[i:i + _MIGRATE_BATCH]
+        sources = [group["from"][0] for _, group in batch]
+        found = collection.get(ids=sources, include=["embeddings", "documents"])
+        rows = dict(zip(found["ids"], zip(found["embeddings"], found["documents"])))
+        new_ids = [new_id for new_id, _ in batch]
+        collection.upsert(ids=new_ids,
+                          embeddings=[rows[s][0] for s in sources],
+                          documents=[rows[s][1] for s in sources],
+                          metadatas=[group["meta"] for _, group in batch])
+        index_chunks(new_ids, [rows[s][1] for s in sources], [group["meta"] for _, group in batch])
+        stale = [old for new_id, group in batch for old in group["from"] if old != new_id]
+        if stale:
+            collection.delete(ids=stale)
+            delete_chunks(stale)
+        id_map.update({old: new_id for new_id, group in batch for old in group["from"]})
+    for i in range(0, len(plan["drop"]), _MIGRATE_BATCH):
+        collection.delete(ids=plan["drop"][i:i + _MIGRATE_BATCH])
+    delete_chunks(plan["drop"])
+
+    _migrate_sentences({old: new for old, new in id_map.items() if old != new}, plan["drop"])
+    return {**report, "rows_after": collection.count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    cmd = sub.add_parser("migrate", help="deduplicate an existing chroma_db to content-hash ids")
+    cmd.add_argument("--dry-run", action="store_true", help="only report what would change")
+    cmd = sub.add_parser("orphans", help="list chunks whose source PDF no longer exists")
+    cmd.add_argument("--delete", action="store_true", help="delete them instead of only listing")
+    args = parser.parse_args()
+    if args.cmd == "migrate":
+        result = migrate(dry_run=args.dry_run)
+    else:
+        result = find_orphans()
+        if args.delete:
+            result = [delete_document(source, {"owner": o["owner"], "project": o["project"]}, remove_file=False)
+                      for o in result for source in o["sources"]]
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
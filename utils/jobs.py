@@ -0,0 +1,237 @@
+# backend/utils/jobs.py
+"""Background jobs for the long generations (literature review, topic
+finder, full paper).
+
+These take minutes; proxies time out on the synchronous request, and a
+page refresh used to start the whole generation again. With `?job=true`
+the endpoint instead answers 202 with a job id right away and the work runs
+in a small pool (JOB_WORKERS). The client polls GET /jobs/{id} or
+subscribes to GET /jobs/{id}/events (server-sent events) and reads the
+result from the job once it is done.
+
+Jobs and results live in the `jobs` table, so they survive restarts and
+are visible to every worker process. Each job has a dedup key –
+hash(kind, params, partition, corpus version) – and submitting:
+
+- attaches to a queued / running job with the same key (unique partial
+  index, so this also holds across processes)
+- returns the stored result of a finished job with the same key younger
+  than JOB_RESULT_TTL_S
+- otherwise starts a new job
+
+The corpus version (utils.ingest.corpus_version) changes with every upload
+or delete, so a result is never reused for a different set of papers.
+Failed jobs are not reused. The process that owns a queued / running job
+stamps its heartbeat every JOB_HEARTBEAT_S, also while it waits in the
+queue or sits inside one long generation. A live job without a heartbeat
+for JOB_STALE_S (its process died) is marked failed when someone submits
+it again. A job marked failed is never overwritten by a late finish.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from db.database import get_db_connection
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RESULT_TTL_S = float(os.getenv("JOB_RESULT_TTL_S", str(7 * 24 * 3600)))
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", "900"))
+# well below JOB_STALE_S, so a busy process is never taken for a dead one
+JOB_HEARTBEAT_S = min(float(os.getenv("JOB_HEARTBEAT_S", "30")), JOB_STALE_S / 3)
+
+# inserts tried when the live-job index keeps rejecting ours (racing submitters)
+_SUBMIT_ATTEMPTS = 3
+
+_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_submit_lock = threading.Lock()
+_owned = set()   # ids of the queued / running jobs of this process
+_owned_lock = threading.Lock()
+_heartbeat_thread: Optional[threading.Thread] = None
+_current_job: ContextVar[Optional[str]] = ContextVar("current_job", default=None)
+
+_FIELDS = ("id", "kind", "status", "progress", "message", "error", "error_status", "corpus_version",
+           "created_at", "started_at", "finished_at", "updated_at")
+
+
+def _dedup_key(kind: str, params: Dict, partition: Dict[str, str], version: str) -> str:
+    blob = json.dumps([kind, params, partition["owner"], partition["project"], version], sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _update(job_id: str, **fields):
+    # only live jobs: one already marked abandoned keeps its error
+    fields["updated_at"] = time.time()
+    conn = get_db_connection()
+    conn.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} "
+                 "WHERE id = ? AND status IN ('queued', 'running')", (*fields.values(), job_id))
+    conn.commit()
+    conn.close()
+
+
+def _row_to_job(row, with_result: bool = True) -> Dict:
+    job = {k: row[k] for k in _FIELDS}
+    job["params"] = json.loads(row["params"])
+    if with_result and row["result"] is not None:
+        job["result"] = json.loads(row["result"])
+    return job
+
+
+# ==================== Lookup ==================== #
+
+def get_job(job_id: str, partition: Dict[str, str], with_result: bool = True) -> Optional[Dict]:
+    """The job if it belongs to this partition (someone else's id looks like a missing one)."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT * FROM jobs WHERE id = ? AND owner = ? AND project = ?",
+                       (job_id, partition["owner"], partition["project"])).fetchone()
+    conn.close()
+    return _row_to_job(row, with_result) if row else None
+
+
+def list_jobs(partition: Dict[str, str], limit: int = 50) -> List[Dict]:
+    conn = get_db_connection()
+    rows = conn.execute("SELECT * FROM jobs WHERE owner = ? AND project = ? ORDER BY created_at DESC LIMIT ?",
+                        (partition["owner"], partition["project"], limit)).fetchall()
+    conn.close()
+    return [_row_to_job(r, with_result=False) for r in rows]
+
+
+def _find_reusable(conn, key: str) -> Optional[sqlite3.Row]:
+    now = time.time()
+    live = conn.execute("SELECT * FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+                        (key,)).fetchone()
+    if live is not None:
+        if now - max(live["updated_at"], live["heartbeat_at"] or 0) < JOB_STALE_S:
+            return live
+        conn.execute("UPDATE jobs SET status = 'error', error = 'abandoned (worker stopped)', "
+                     "finished_at = ?, updated_at = ? WHERE id = ?", (now, now, live["id"]))
+        conn.commit()
+    return conn.execute("SELECT * FROM jobs WHERE dedup_key = ? AND status = 'done' AND finished_at > ? "
+                        "ORDER BY finished_at DESC LIMIT 1", (key, now - JOB_RESULT_TTL_S)).fetchone()
+
+
+def purge_expired() -> int:
+    """Drop finished jobs older than JOB_RESULT_TTL_S; returns the count."""
+    conn = get_db_connection()
+    cur = conn.execute("DELETE FROM jobs WHERE status IN ('done', 'error') AND finished_at < ?",
+                       (time.time() - JOB_RESULT_TTL_S,))
+    conn.commit()
+    conn.close()
+    return cur.rowcount
+
+
+# ==================== Running ==================== #
+
+def _heartbeat():
+    while True:
+        time.sleep(JOB_HEARTBEAT_S)
+        with _owned_lock:
+            ids = list(_owned)
+        if not ids:
+            continue
+        try:
+            conn = get_db_connection()
+            conn.execute(f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({', '.join('?' * len(ids))})",
+                         (time.time(), *ids))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error:
+            pass   # next beat; JOB_STALE_S leaves room for a few missed ones
+
+
+def _own(job_id: str):
+    global _heartbeat_thread
+    with _owned_lock:
+        _owned.add(job_id)
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name="job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+
+def job_progress(fraction: float, message: str = None):
+    """Report progress from inside a job (no-op when the code runs as a plain request)."""
+    job_id = _current_job.get()
+    if job_id is not None:
+        _update(job_id, progress=round(max(0.0, min(1.0, fraction)), 3), message=message)
+
+
+def _run(job_id: str, fn, args):
+    _current_job.set(job_id)
+    _update(job_id, status="running", started_at=time.time(), message="started")
+    try:
+        result = jsonable_encoder(fn(*args))
+    except HTTPException as e:   # what the endpoint would have answered, e.g. 404 no documents
+        _update(job_id, status="error", error=str(e.detail), error_status=e.status_code,
+                finished_at=time.time())
+    except Exception as e:
+        _update(job_id, status="error", error=f"{type(e).__name__}: {e}", error_status=500,
+                finished_at=time.time())
+    else:
+        _update(job_id, status="done", progress=1.0, message="done",
+                result=json.dumps(result), finished_at=time.time())
+    finally:
+        with _owned_lock:
+            _owned.discard(job_id)
+
+
+def submit_job(kind: str, params: Dict, partition: Dict[str, str], fn, *args) -> JSONResponse:
+    """Start `fn(*args)` as a background job (or attach to an identical one); answers 202."""
+    from utils.ingest import corpus_version
+
+    version = corpus_version(partition)
+    key = _dedup_key(kind, params, partition, version)
+    existing, job_id = None, None
+    conn = get_db_connection()
+    try:
+        with _submit_lock:
+            for _ in range(_SUBMIT_ATTEMPTS):
+                existing = _find_reusable(conn, key)
+                if existing is not None:
+                    break
+                job_id, now = uuid.uuid4().hex, time.time()
+                try:
+                    conn.execute(
+                        "INSERT INTO jobs (id, kind, owner, project, dedup_key, params, corpus_version, status, "
+                        "message, created_at, updated_at, heartbeat_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, 'queued', 'queued', ?, ?, ?)",
+                        (job_id, kind, partition["owner"], partition["project"], key, json.dumps(params),
+                         version, now, now, now))
+                    conn.commit()
+                    break
+                except sqlite3.IntegrityError:
+                    # another process just submitted the same job – attach to it, or (if it
+                    # already ended) try again with a fresh id
+                    conn.rollback()
+                    job_id = None
+    finally:
+        conn.close()
+
+    if existing is None and job_id is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Could not register the job, retry shortly")
+    if existing is not None:
+        job_id, state, deduplicated = existing["id"], existing["status"], True
+    else:
+        _own(job_id)   # heartbeat from now on, also while it waits for a pool worker
+        # copy_context → admission priority (batch) + stage timings follow into the pool
+        _pool.submit(contextvars.copy_context().run, _run, job_id, fn, args)
+        state, deduplicated = "queued", False
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+        "job_id": job_id,
+        "status": state,
+        "deduplicated": deduplicated,
+        "corpus_version": version,
+        "poll": f"/jobs/{job_id}",
+        "events": f"/jobs/{job_id}/events",
+    })
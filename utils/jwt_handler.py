@@ -1,7 +1,12 @@
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from db.database import get_db_connection
+from utils.metrics import record_cache
 from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -13,7 +18,41 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# decoded claims of recently seen tokens: token -> (claims, cache deadline).
+# Every authenticated request decodes + HMAC-checks its JWT; a client sends
+# the same token over and over, so a short TTL cache skips that work. An
+# entry never outlives the token's own `exp`.
+JWT_CACHE_TTL_S = float(os.getenv("JWT_CACHE_TTL_S", "60"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "1024"))
+_claims_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def _cached_claims(token: str):
+    entry = _claims_cache.get(token)
+    if entry is None:
+        return None
+    if entry[1] <= time.time():
+        _claims_cache.pop(token, None)
+        return None
+    _claims_cache.move_to_end(token)
+    return entry[0]
+
+
+def _cache_claims(token: str, claims: dict, exp):
+    deadline = time.time() + JWT_CACHE_TTL_S
+    if exp is not None:
+        deadline = min(deadline, float(exp))
+    _claims_cache[token] = (claims, deadline)
+    while len(_claims_cache) > JWT_CACHE_SIZE:
+        _claims_cache.popitem(last=False)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    # async dependency: runs on the event loop thread, so the cache needs no lock
+    claims = _cached_claims(token) if JWT_CACHE_TTL_S > 0 else None
+    if claims is not None:
+        record_cache("jwt_claims", True)
+        return dict(claims)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -25,6 +64,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         user_id: int = payload.get("user_id")
         if username is None or user_id is None:
             raise credentials_exception
-        return {"username": username, "user_id": user_id}
+        claims = {"username": username, "user_id": user_id}
+        if JWT_CACHE_TTL_S > 0:
+            record_cache("jwt_claims", False)
+            _cache_claims(token, claims, payload.get("exp"))
+        return dict(claims)
     except JWTError:
         raise credentials_exception
+
+def _is_admin(user_id) -> bool:
+    # looked up on every admin request (not cached, not a JWT claim): revoking takes effect at once
+    conn = get_db_connection()
+    row = conn.execute("SELECT is_admin FROM users WHERE id = ?", (user_id,)).fetchone()
+    conn.close()
+    return bool(row and row["is_admin"])
+
+
+def require_admin(current_user: dict = Depends(get_current_user)):
+    # sync: the users lookup runs in the threadpool, not on the event loop
+    if not _is_admin(current_user["user_id"]):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
+
+
+def is_admin_token(token: str) -> bool:
+    """Plain check for code outside the dependency system (e.g. middleware)."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return False
+    return payload.get("user_id") is not None and _is_admin(payload["user_id"])
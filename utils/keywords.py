@@ -0,0 +1,233 @@
+# backend/utils/keywords.py
+"""Local keyword + extractive summary engine.
+
+TF-IDF / RAKE-style scoring done with NumPy. The IDF side comes from the
+term statistics of the uploaded corpus (one "document" = one stored chunk),
+which the ingestion pipeline keeps up to date in SQLite.
+
+NumPy / sklearn are imported on first use, not at import time.
+"""
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List
+
+from db.database import get_db_connection
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9\-]{2,}")
+_FRAGMENT_SPLIT_RE = re.compile(r"[.,;:!?()\[\]{}\"'\n\r\t]+")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+MAX_PHRASE_WORDS = 3
+SQL_BATCH = 900   # stay under SQLite's bound-variable limit
+
+
+# ==================== Corpus term statistics ==================== #
+
+@lru_cache(maxsize=1)
+def _stop_words() -> frozenset:
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return frozenset(ENGLISH_STOP_WORDS)
+
+
+def _terms(text: str) -> List[str]:
+    stop_words = _stop_words()
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in stop_words]
+
+
+def update_term_stats(chunks: List[str]):
+    """Add document frequencies of the given chunks to the corpus IDF reference."""
+    df = Counter()
+    for chunk in chunks:
+        df.update(set(_terms(chunk)))
+    if not df:
+        return
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO term_stats (term, df) VALUES (?, ?) "
+        "ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+        df.items()
+    )
+    cursor.execute("UPDATE corpus_stats SET n_docs = n_docs + ? WHERE id = 1", (len(chunks),))
+    conn.commit()
+    conn.close()
+
+
+def remove_term_stats(chunks: List[str]):
+    """Take deleted chunks back out of the corpus IDF reference."""
+    df = Counter()
+    for chunk in chunks:
+        df.update(set(_terms(chunk)))
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany("UPDATE term_stats SET df = MAX(df - ?, 0) WHERE term = ?",
+                       [(n, term) for term, n in df.items()])
+    cursor.execute("DELETE FROM term_stats WHERE df = 0")
+    cursor.execute("UPDATE corpus_stats SET n_docs = MAX(n_docs - ?, 0) WHERE id = 1", (len(chunks),))
+    conn.commit()
+    conn.close()
+
+
+def corpus_idf(terms: List[str]):
+    """Smoothed IDF for each term (NumPy array), looked up against the corpus statistics.
+
+    Terms the corpus has never seen get the maximum IDF. With an empty corpus
+    every weight is 1, i.e. scoring degrades to plain term frequency.
+    """
+    import numpy as np
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    row = cursor.execute("SELECT n_docs FROM corpus_stats WHERE id = 1").fetchone()
+    n_docs = row["n_docs"] if row else 0
+
+    df = {}
+    if n_docs:
+        for i in range(0, len(terms), SQL_BATCH):
+            batch = terms[i:i + SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            cursor.execute(f"SELECT term, df FROM term_stats WHERE term IN ({placeholders})", batch)
+            df.update({r["term"]: r["df"] for r in cursor.fetchall()})
+    conn.close()
+
+    if not n_docs:
+        return np.ones(len(terms))
+    counts = np.array([df.get(t, 0) for t in terms], dtype=np.float64)
+    return np.log((n_docs + 1) / (counts + 1)) + 1.0
+
+
+# ==================== Keyword extraction ==================== #
+
+def _candidate_phrases(text: str) -> List[tuple]:
+    """RAKE-style candidates: runs of content words split at stopwords/punctuation."""
+    stop_words = _stop_words()
+    phrases = []
+    for fragment in _FRAGMENT_SPLIT_RE.split(text.lower()):
+        run = []
+        for token in fragment.split():
+            if _WORD_RE.fullmatch(token) and token not in stop_words:
+                run.append(token)
+                continue
+            if run:
+                phrases.append(tuple(run))
+            run = []
+        if run:
+            phrases.append(tuple(run))
+    # long runs are usually extraction noise (tables, references) – keep the words only
+    out = []
+    for p in phrases:
+        out.extend([p] if len(p) <= MAX_PHRASE_WORDS else [(w,) for w in p])
+    return out
+
+
+def extract_keywords(text: str, top_k: int = 10) -> List[str]:
+    import numpy as np
+
+    phrases = _candidate_phrases(text)
+    if not phrases:
+        return []
+
+    vocab = sorted({w for p in phrases for w in p})
+    index = {w: i for i, w in enumerate(vocab)}
+
+    # flatten phrases → word ids, one boundary offset per phrase
+    lengths = np.fromiter((len(p) for p in phrases), dtype=np.int64, count=len(phrases))
+    flat = np.fromiter((index[w] for p in phrases for w in p), dtype=np.int64, count=int(lengths.sum()))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    freq = np.bincount(flat, minlength=len(vocab)).astype(np.float64)
+    degree = np.bincount(flat, weights=np.repeat(lengths, lengths), minlength=len(vocab))
+    idf = corpus_idf(vocab)
+
+    # RAKE degree/frequency ratio, weighted by corpus TF-IDF
+    word_score = (freq / freq.sum()) * idf * (degree / freq)
+    phrase_score = np.add.reduceat(word_score[flat], offsets)
+
+    best: Dict[tuple, float] = {}
+    for phrase, score in zip(phrases, phrase_score.tolist()):
+        best[phrase] = max(score, best.get(phrase, 0.0))
+
+    keywords, covered = [], set()
+    for phrase, _ in sorted(best.items(), key=lambda kv: kv[1], reverse=True):
+        if len(phrase) == 1 and phrase[0] in covered:
+            continue
+        keywords.append(" ".join(phrase))
+        covered.update(phrase)
+        if len(keywords) >= top_k:
+            break
+    return keywords
+
+
+# ==================== Extractive summary ==================== #
+
+def extractive_summary(text: str, max_sentences: int = 5, max_words: int = 250) -> str:
+    """Pick the sentences closest to the document's TF-IDF centroid, in original order."""
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    sentences = [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if len(s.split()) >= 5]
+    if len(sentences) <= 1:
+        return " ".join(sentences) or text.strip()[:max_words * 8]
+
+    vectorizer = CountVectorizer(token_pattern=_WORD_RE.pattern, stop_words="english")
+    try:
+        counts = vectorizer.fit_transform(sentences)
+    except ValueError:   # only stopwords
+        return " ".join(sentences[:max_sentences])
+
+    idf = corpus_idf(vectorizer.get_feature_names_out().tolist())
+    weighted = counts.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1))).ravel()
+    norms[norms == 0] = 1.0
+    centroid = np.asarray(weighted.mean(axis=0)).ravel()
+    scores = (weighted @ centroid) / norms
+
+    chosen, words = [], 0
+    for i in np.argsort(-scores):
+        n = len(sentences[i].split())
+        if chosen and words + n > max_words:
+            continue
+        chosen.append(int(i))
+        words += n
+        if len(chosen) >= max_sentences:
+            break
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+# ==================== Per-document keyword catalog ==================== #
+
+def save_document_keywords(source: str, keywords: List[str]):
+    conn = get_db_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO document_keywords (source, keywords) VALUES (?, ?)",
+        (source, json.dumps(keywords))
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_document_keywords(source: str):
+    conn = get_db_connection()
+    row = conn.execute("SELECT keywords FROM document_keywords WHERE source = ?", (source,)).fetchone()
+    conn.close()
+    return json.loads(row["keywords"]) if row else None
+
+
+def delete_document_keywords(source: str):
+    conn = get_db_connection()
+    conn.execute("DELETE FROM document_keywords WHERE source = ?", (source,))
+    conn.commit()
+    conn.close()
+
+
+def index_document_keywords(source: str, text: str, chunks: List[str], top_k: int = 12) -> List[str]:
+    """Ingestion hook: fold the chunks into the IDF reference, then store the doc's keywords."""
+    if get_document_keywords(source) is None:   # re-uploads must not double count
+        update_term_stats(chunks)
+    keywords = extract_keywords(text, top_k=top_k)
+    save_document_keywords(source, keywords)
+    return keywords
@@ -0,0 +1,190 @@
+# backend/utils/lexical_index.py
+"""BM25 (SQLite FTS5) index over chunk text, fused with the vector search.
+
+Embedding search is weak on exact terms – acronyms, dataset ids ("DS-17"),
+author names, equation labels – which a 768-d sentence vector barely
+registers. Every stored chunk is also written to `lexical_chunks`, whose
+text is indexed by the `chunk_fts` FTS5 table (porter stemming, BM25
+ranking; see db/schema.py). It is kept in step with the vector store by
+utils/ingest.py (store / add reference / delete) and by snapshot import.
+
+/query runs both searches at once: the lexical lookup goes to a small pool
+before the question is embedded, and the two ranked lists are merged with
+reciprocal rank fusion (score = sum of 1 / (RRF_K + rank)). Chunks only the
+lexical side found are fetched from Chroma by id. HYBRID_SEARCH=off turns
+the query side off; the index is still maintained.
+
+Existing stores are backfilled with:
+
+    python -m utils.lexical_index rebuild
+"""
+import argparse
+import contextvars
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from db.database import get_db_connection
+from utils.metrics import stage
+
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "on").lower() not in ("off", "0", "false", "no")
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_MAX_TERMS = int(os.getenv("LEXICAL_MAX_TERMS", "16"))
+_BATCH = 500
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lexical")
+_TOKEN_RE = re.compile(r"\w[\w\-.]*\w|\w")
+# question words that would only widen the match set; BM25's IDF handles the rest
+_STOP = frozenset("""a an and are as at be by can do does for from has have how i in is it its of on or
+that the their there these this to was were what when where which who why will with you your
+paper papers study studies about describe explain""".split())
+
+
+# ==================== Maintenance ==================== #
+
+def index_chunks(chunk_ids: List[str], chunks: List[str], metadatas: List[Dict]):
+    """Insert (or refresh) freshly stored chunks."""
+    rows = [(cid, meta.get("owner"), meta.get("project"),
+             json.dumps(meta.get("sources") or [meta.get("source")]), text)
+            for cid, text, meta in zip(chunk_ids, chunks, metadatas)]
+    if not rows:
+        return
+    conn = get_db_connection()
+    with stage("lexical_index"):
+        conn.executemany(
+            "INSERT INTO lexical_chunks (chunk_id, owner, project, sources, text) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (chunk_id) DO UPDATE SET owner = excluded.owner, project = excluded.project, "
+            "sources = excluded.sources, text = excluded.text", rows)
+        conn.commit()
+    conn.close()
+
+
+def set_sources(chunk_sources: Dict[str, List[str]]):
+    """A paper was added to / removed from chunks other papers also contain."""
+    if not chunk_sources:
+        return
+    conn = get_db_connection()
+    conn.executemany("UPDATE lexical_chunks SET sources = ? WHERE chunk_id = ?",
+                     [(json.dumps(sources), cid) for cid, sources in chunk_sources.items()])
+    conn.commit()
+    conn.close()
+
+
+def delete_chunks(chunk_ids: List[str]):
+    conn = get_db_connection()
+    for i in range(0, len(chunk_ids), _BATCH):
+        part = chunk_ids[i:i + _BATCH]
+        conn.execute(f"DELETE FROM lexical_chunks WHERE chunk_id IN ({', '.join('?' * len(part))})", part)
+    conn.commit()
+    conn.close()
+
+
+def rebuild(batch: int = 2000) -> Dict:
+    """Refill the index from the vector store (first run on an existing store)."""
+    from vector_db.client import get_collection, write_lock
+
+    conn = get_db_connection()
+    conn.execute("DELETE FROM lexical_chunks")
+    conn.commit()
+    conn.close()
+    collection = get_collection()
+    total, offset = 0, 0
+    with write_lock:
+        while True:
+            page = collection.get(limit=batch, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            index_chunks(page["ids"], page["documents"], [m or {} for m in page["metadatas"]])
+            total += len(page["ids"])
+            offset += len(page["ids"])
+    return {"indexed": total}
+
+
+# ==================== Search ==================== #
+
+def fts_query(question: str) -> Optional[str]:
+    """Question → FTS5 query: each remaining token as a quoted phrase, OR-ed ("DS-17" stays one phrase)."""
+    terms = []
+    for token in _TOKEN_RE.findall(question.lower()):
+        if len(token) > 1 and token not in _STOP and token not in terms:
+            terms.append(token)
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms[:LEXICAL_MAX_TERMS]) or None
+
+
+def search(question: str, partition: Dict[str, str], limit: int, sources: List[str] = None) -> List[str]:
+    """Chunk ids of the partition ranked by BM25, best first."""
+    match = fts_query(question)
+    if match is None:
+        return []
+    sql = ("SELECT c.chunk_id FROM chunk_fts JOIN lexical_chunks c ON c.id = chunk_fts.rowid "
+           "WHERE chunk_fts MATCH ? AND c.owner = ? AND c.project = ?")
+    params = [match, partition["owner"], partition["project"]]
+    if sources:
+        sql += f" AND EXISTS (SELECT 1 FROM json_each(c.sources) WHERE value IN ({', '.join('?' * len(sources))}))"
+        params += list(sources)
+    sql += " ORDER BY bm25(chunk_fts) LIMIT ?"
+    params.append(limit)
+
+    conn = get_db_connection()
+    try:
+        with stage("lexical"):
+            rows = conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:   # index not created yet (init_lexical_tables)
+        rows = []
+    finally:
+        conn.close()
+    return [r["chunk_id"] for r in rows]
+
+
+def search_async(question: str, partition: Dict[str, str], limit: int, sources: List[str] = None) -> Future:
+    """search() on the lexical pool, so it overlaps with embedding + the vector query."""
+    return _pool.submit(contextvars.copy_context().run, search, question, partition, limit, sources)
+
+
+def rrf(rankings: List[List[str]], k: int = RRF_K) -> Dict[str, float]:
+    """Reciprocal rank fusion: chunk id -> score, best first."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking):
+            scores[cid] = scores.get(cid, 0.0) + 1.0 / (k + rank + 1)
+    return dict(sorted(scores.items(), key=lambda kv: -kv[1]))
+
+
+def fuse(collection, results: Dict, lexical_ids: List[str], n: int, include: List[str]) -> Dict:
+    """Single-query Chroma `results` re-ranked by RRF with the lexical hits, same shape, top n.
+
+    Adds "scores" (the fused RRF score per hit) next to ids / documents / ...
+    """
+    vector_ids = results["ids"][0] if results["ids"] else []
+    scores = rrf([vector_ids, lexical_ids])
+    fused = list(scores)[:n]
+    rows = {cid: {key: results[key][0][i] for key in include} for i, cid in enumerate(vector_ids)}
+    missing = [cid for cid in fused if cid not in rows]
+    if missing:
+        found = collection.get(ids=missing, include=include)
+        for i, cid in enumerate(found["ids"]):
+            rows[cid] = {key: found[key][i] for key in include}
+    fused = [cid for cid in fused if cid in rows]   # index ahead of a just-deleted chunk
+    return {"ids": [fused], "scores": [[scores[cid] for cid in fused]],
+            **{key: [[rows[cid][key] for cid in fused]] for key in include}}
+
+
+def main():
+    from db.schema import init_embedding_mirror_table, init_lexical_tables
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="refill the FTS index from the vector store")
+    args = parser.parse_args()
+
+    init_lexical_tables()
+    init_embedding_mirror_table()
+    if args.cmd == "rebuild":
+        print(json.dumps(rebuild()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# backend/utils/metrics.py
+"""In-process request metrics, exported in Prometheus text format.
+
+- per-route latency histograms (MetricsMiddleware)
+- per-stage timings: embed / retrieve / index / generate / parse / db (`stage()`)
+- LLM token counters and cache hit/miss counters
+- a rolling log of the SLOW_LOG_SIZE slowest requests of the last
+  SLOW_LOG_WINDOW_S seconds, with their stage timings (`slow_requests()`)
+
+Recording is a couple of dict updates under a lock; the text exposition is
+only built when /metrics is scraped. Each response also gets a
+`Server-Timing` header with the stages that ran for that request.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+SLOW_LOG_SIZE = int(os.getenv("SLOW_LOG_SIZE", "20"))          # 0 disables
+SLOW_LOG_WINDOW_S = float(os.getenv("SLOW_LOG_WINDOW_S", "3600"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Tuple], list] = {}     # (name, labels) → [bucket counts..., sum, count]
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_gauges: Dict[Tuple[str, Tuple], float] = {}
+_slow: list = []   # dicts, at most SLOW_LOG_SIZE, newest window only
+_help = {
+    "http_request_duration_seconds": "Request latency by route",
+    "stage_duration_seconds": "Time spent per pipeline stage",
+    "llm_tokens_total": "Ollama prompt/completion tokens",
+    "cache_requests_total": "Cache lookups by cache and result",
+    "llm_queue_depth": "Generations waiting for an admission slot",
+    "llm_inflight": "Generations currently running against Ollama",
+    "llm_queue_wait_seconds": "Time spent waiting for an admission slot",
+    "llm_admission_rejected_total": "Generations rejected by admission control",
+    "context_tokens_saved_total": "Prompt tokens removed by the context packer",
+    "llm_structured_output_total": "Structured generations by endpoint and outcome (requests, parse_failures, local_repairs, llm_repairs, repair_failures)",
+}
+
+# stage timings of the request being served (shared into threadpool workers)
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def _labels(labels: Optional[Dict]) -> Tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def observe(name: str, value: float, labels: Optional[Dict] = None):
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                h[i] += 1
+                break
+        h[-2] += value
+        h[-1] += 1
+
+
+def inc(name: str, labels: Optional[Dict] = None, value: float = 1):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, labels: Optional[Dict] = None):
+    with _lock:
+        _gauges[(name, _labels(labels))] = value
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as pipeline stage `name` (global histogram + this request's Server-Timing)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_duration_seconds", elapsed, {"stage": name})
+        stages = _current.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+def record_tokens(prompt_tokens: Optional[int], completion_tokens: Optional[int], model: str):
+    if prompt_tokens:
+        inc("llm_tokens_total", {"model": model, "kind": "prompt"}, prompt_tokens)
+    if completion_tokens:
+        inc("llm_tokens_total", {"model": model, "kind": "completion"}, completion_tokens)
+
+
+def record_cache(cache: str, hit: bool):
+    inc("cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+
+def current_stages() -> Optional[Dict[str, float]]:
+    return _current.get()
+
+
+# ==================== Slow request log ==================== #
+
+def _record_slow(method: str, path: str, route: str, status: int, duration: float, stages: Dict[str, float]):
+    now = time.time()
+    with _lock:
+        if len(_slow) >= SLOW_LOG_SIZE:
+            _slow[:] = [e for e in _slow if now - e["at"] <= SLOW_LOG_WINDOW_S]
+        if len(_slow) >= SLOW_LOG_SIZE:
+            fastest = min(range(len(_slow)), key=lambda i: _slow[i]["duration_ms"])
+            if _slow[fastest]["duration_ms"] >= duration * 1000:
+                return
+            del _slow[fastest]
+        _slow.append({"at": now, "method": method, "path": path, "route": route, "status": status,
+                      "duration_ms": round(duration * 1000, 1),
+                      "stages_ms": {k: round(v * 1000, 1) for k, v in stages.items()}})
+
+
+def slow_requests():
+    now = time.time()
+    with _lock:
+        live = [e for e in _slow if now - e["at"] <= SLOW_LOG_WINDOW_S]
+    return sorted(live, key=lambda e: -e["duration_ms"])
+
+
+# ==================== Prometheus exposition ==================== #
+
+def _fmt_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines, seen = [], set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), h in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, h):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f"{name}_bucket{_fmt_labels(labels, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_fmt_labels(labels, le)} {h[-1]}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-2]}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {h[-1]}")
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        header(name, "gauge")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ==================== ASGI middleware ==================== #
+
+class MetricsMiddleware:
+    """Route latency histogram + Server-Timing header for every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stages: Dict[str, float] = {}
+        token = _current.set(stages)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = [f"{k};dur={v * 1000:.1f}" for k, v in stages.items()]
+                timing.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(timing).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            # templated path keeps label cardinality bounded
+            path = getattr(route, "path", None) or "unmatched"
+            elapsed = time.perf_counter() - start
+            observe("http_request_duration_seconds", elapsed,
+                    {"method": scope["method"], "route": path, "status": str(status)})
+            if SLOW_LOG_SIZE > 0:
+                _record_slow(scope["method"], scope["path"], path, status, elapsed, stages)
@@ -0,0 +1,122 @@
+# backend/utils/ollama.py
+"""Shared Ollama generate client + per-session KV context reuse.
+
+/api/generate returns a `context` token array that encodes the whole
+conversation so far. Sending it back with the next prompt lets Ollama skip
+re-prefilling the history, so a chat turn only pays for the new message.
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from db.database import get_db_connection
+from utils.admission import llm_slot
+from utils.embedding import OLLAMA_BASE_URL
+from utils.metrics import stage, record_tokens
+
+OLLAMA_GENERATE_URL = f"{OLLAMA_BASE_URL}/api/generate"
+# keep the model (and its KV cache) resident between turns
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# past this many tokens Ollama would truncate the context anyway – start over from text
+OLLAMA_MAX_CONTEXT_TOKENS = int(os.getenv("OLLAMA_MAX_CONTEXT_TOKENS", "8192"))
+# upper bound on one generation once admitted (queue time is bounded separately)
+OLLAMA_GENERATE_TIMEOUT_S = float(os.getenv("OLLAMA_GENERATE_TIMEOUT_S", "300"))
+# stored contexts not refreshed for this long are dropped (the next turn rebuilds from text)
+LLM_CONTEXT_TTL_S = float(os.getenv("LLM_CONTEXT_TTL_S", str(24 * 3600)))
+_CONTEXT_SWEEP_INTERVAL_S = 60.0
+_last_context_sweep = 0.0
+
+# one pooled HTTP connection instead of a new TCP handshake per call
+_http = requests.Session()
+
+
+def generate(prompt: str, model: str, options: Optional[Dict] = None,
+             context: Optional[List[int]] = None, format: Optional[Dict] = None,
+             timeout: Optional[float] = None) -> Dict:
+    """Non-streaming /api/generate call; returns Ollama's full JSON response.
+
+    `format` is a JSON schema – Ollama then constrains decoding to it.
+    Waits for an admission slot first (may raise AdmissionRejected → 429/503).
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    if options:
+        payload["options"] = options
+    if context:
+        payload["context"] = context
+    if format:
+        payload["format"] = format
+    with llm_slot(), stage("generate"):
+        response = _http.post(OLLAMA_GENERATE_URL, json=payload, timeout=timeout or OLLAMA_GENERATE_TIMEOUT_S)
+        response.raise_for_status()
+        data = response.json()
+    record_tokens(data.get("prompt_eval_count"), data.get("eval_count"), model)
+    return data
+
+
+# ==================== KV context per session ==================== #
+
+def load_context(scope: str, session_id: str, model: str, epoch: Optional[str] = None) -> Optional[Dict]:
+    """Stored context for a session, or None when the caller must fall back to text history.
+
+    Falls back when nothing is stored, when the session was last served by a
+    different model (token ids are model specific), when the context has
+    grown past OLLAMA_MAX_CONTEXT_TOKENS, or when `epoch` is given and the
+    context belongs to another lifetime of the session (its last_seq would
+    point into a different message numbering).
+    """
+    conn = get_db_connection()
+    row = conn.execute(
+        "SELECT model, context, last_seq, epoch FROM llm_context WHERE scope = ? AND session_id = ?",
+        (scope, session_id)
+    ).fetchone()
+    conn.close()
+    if row is None or row["model"] != model:
+        return None
+    if epoch is not None and row["epoch"] != epoch:
+        return None
+    context = json.loads(row["context"])
+    if not context or len(context) > OLLAMA_MAX_CONTEXT_TOKENS:
+        return None
+    return {"context": context, "last_seq": row["last_seq"]}
+
+
+def save_context(scope: str, session_id: str, model: str, context: Optional[List[int]], last_seq: int,
+                 epoch: Optional[str] = None):
+    """Remember the context returned for a turn; last_seq is the newest message it covers."""
+    conn = get_db_connection()
+    if context:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_context (scope, session_id, model, context, last_seq, epoch) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (scope, session_id, model, json.dumps(context), last_seq, epoch)
+        )
+    else:
+        conn.execute("DELETE FROM llm_context WHERE scope = ? AND session_id = ?", (scope, session_id))
+    conn.commit()
+    conn.close()
+    _maybe_purge_contexts()
+
+
+def _maybe_purge_contexts():
+    global _last_context_sweep
+    now = time.time()
+    if now - _last_context_sweep < _CONTEXT_SWEEP_INTERVAL_S:
+        return
+    _last_context_sweep = now
+    conn = get_db_connection()
+    conn.execute("DELETE FROM llm_context WHERE updated_at < datetime('now', ?)",
+                 (f"-{int(LLM_CONTEXT_TTL_S)} seconds",))
+    conn.commit()
+    conn.close()
+
+
+def clear_context(scope: str, session_id: str):
+    save_context(scope, session_id, "", None, 0)
@@ -0,0 +1,94 @@
+# backend/utils/partition.py
+"""Per-user / per-project data partitions.
+
+Every chunk is tagged at ingest with `owner` (the user_id from the JWT) and
+`project` (X-Project header, "default" when absent). Every router that reads
+the vector store takes `partition = Depends(get_partition)` and wraps its
+`where` in partition_filter(), so a request only ever sees – and only ever
+scans – the caller's own documents. With VECTOR_SHARD_KEY=owner the filter
+also pins the query to that owner's shard.
+
+Chunks stored before partitioning have no owner tag and are invisible until
+they are assigned to someone:
+
+    python -m utils.partition assign --owner 1 --project default
+"""
+import argparse
+import json
+import re
+from typing import Dict, Optional
+
+from fastapi import Depends, Header, HTTPException
+
+from utils.jwt_handler import get_current_user
+
+DEFAULT_PROJECT = "default"
+_PROJECT_RE = re.compile(r"^[\w.-]{1,64}$")
+
+
+async def get_partition(current_user: dict = Depends(get_current_user),
+                        x_project: Optional[str] = Header(None)) -> Dict[str, str]:
+    """FastAPI dependency: the caller's partition {"owner", "project"}."""
+    project = (x_project or DEFAULT_PROJECT).strip()
+    if not _PROJECT_RE.match(project):
+        raise HTTPException(400, "Invalid X-Project header")
+    return {"owner": str(current_user["user_id"]), "project": project}
+
+
+def partition_metadata(partition: Dict[str, str]) -> Dict[str, str]:
+    """Metadata tags every stored chunk of this partition carries."""
+    return {"owner": partition["owner"], "project": partition["project"]}
+
+
+def partition_filter(partition: Dict[str, str], where: Optional[Dict] = None) -> Dict:
+    """Chroma `where` restricted to the partition (plus an optional extra filter)."""
+    clauses = [{"owner": partition["owner"]}, {"project": partition["project"]}]
+    if where:
+        clauses.append(where)
+    return {"$and": clauses}
+
+
+def partition_key(partition: Dict[str, str], name: str) -> str:
+    """Namespaced key for per-document rows / ids (file names repeat across users)."""
+    return f"{partition['owner']}:{partition['project']}:{name}"
+
+
+# ==================== Legacy data ==================== #
+
+def assign_untagged(owner: str, project: str = DEFAULT_PROJECT, batch: int = 1000) -> int:
+    """Tag every chunk that has no owner yet with (owner, project); returns the count.
+
+    The chunks' BM25 rows (utils/lexical_index.py) are re-tagged / added too,
+    or partition-filtered lexical search would never find them.
+    """
+    from utils.lexical_index import index_chunks
+    from vector_db.client import get_collection
+
+    collection = get_collection()
+    data = collection.get(include=["documents", "metadatas"])
+    ids, docs, metas = [], [], []
+    for cid, doc, meta in zip(data["ids"], data["documents"], data["metadatas"]):
+        meta = dict(meta or {})
+        if "owner" not in meta:
+            meta.update(owner=str(owner), project=project)
+            ids.append(cid)
+            docs.append(doc or "")
+            metas.append(meta)
+    for i in range(0, len(ids), batch):
+        collection.update(ids=ids[i:i + batch], metadatas=metas[i:i + batch])
+        index_chunks(ids[i:i + batch], docs[i:i + batch], metas[i:i + batch])
+    return len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    assign = sub.add_parser("assign", help="give untagged (pre-partitioning) chunks an owner")
+    assign.add_argument("--owner", required=True)
+    assign.add_argument("--project", default=DEFAULT_PROJECT)
+    args = parser.parse_args()
+    print(json.dumps({"assigned": assign_untagged(args.owner, args.project)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
-import fitz
 from typing import List
+from utils.metrics import stage
 
 def extract_text_from_pdf(file_path: str) -> str:
+    with stage("parse"):
+        return _extract_text(file_path)
+
+def _extract_text(file_path: str) -> str:
+    import fitz  # PyMuPDF – heavy, loaded on first upload
     doc = fitz.open(file_path)
     text = ""
     
@@ -0,0 +1,261 @@
+# backend/utils/profiling.py
+"""On-demand sampling profiler for live requests (admin only).
+
+A request is profiled when an admin sends it with `X-Profile: 1`, or when
+it matches a prefix armed through POST /debug/profile ("the next 5 requests
+to /plagiarism/check"). While at least one profiled request is in flight a
+sampler thread reads sys._current_frames() every PROFILE_INTERVAL_MS and
+folds the stacks of the threads that request is running on:
+
+- the event-loop thread, for async handlers (samples there also show what
+  else the loop was busy with – which is what delays an async handler)
+- the threadpool worker a sync handler runs on – instrument_sync_routes()
+  wraps every sync endpoint so the worker attaches itself to the session
+
+Output is the collapsed-stack format (`frame;frame;frame count` per line)
+that flamegraph.pl, inferno and speedscope read directly, written to
+PROFILE_DIR with a header comment carrying route, status, duration and the
+request's stage timings. Only the newest PROFILE_KEEP files are kept.
+
+Disabled cost: no sampler thread exists, the middleware only looks at one
+header and an empty dict, and sync endpoints do one ContextVar lookup.
+"""
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from utils.metrics import current_stages
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_DEPTH = 128
+PROFILE_HEADER = b"x-profile"
+
+
+class ProfileSession:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.threads: Dict[int, int] = {}      # thread id -> attach count
+        self.stacks: Dict[str, int] = {}       # folded stack -> samples
+        self.samples = 0
+
+    def attach(self, ident: int):
+        with _lock:
+            self.threads[ident] = self.threads.get(ident, 0) + 1
+
+    def detach(self, ident: int):
+        with _lock:
+            left = self.threads.get(ident, 0) - 1
+            if left > 0:
+                self.threads[ident] = left
+            else:
+                self.threads.pop(ident, None)
+
+
+_lock = threading.Lock()
+_sessions: List[ProfileSession] = []
+_sampler: Optional[threading.Thread] = None
+_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+# armed through /debug/profile: path prefix -> requests left to profile
+_armed: Dict[str, int] = {}
+
+
+# ==================== Sampler ==================== #
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sample_loop():
+    global _sampler
+    interval = PROFILE_INTERVAL_MS / 1000
+    while True:
+        frames = sys._current_frames()
+        with _lock:   # _stop() takes the lock, so a finished session is never written to
+            if not _sessions:
+                _sampler = None   # last session finished – the thread goes away
+                return
+            for session in _sessions:
+                for ident in session.threads:
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stack = _fold(frame)
+                        session.stacks[stack] = session.stacks.get(stack, 0) + 1
+                        session.samples += 1
+        del frames
+        time.sleep(interval)
+
+
+def _start(session: ProfileSession):
+    global _sampler
+    with _lock:
+        _sessions.append(session)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="profile-sampler", daemon=True)
+            _sampler.start()
+
+
+def _stop(session: ProfileSession):
+    with _lock:
+        if session in _sessions:
+            _sessions.remove(session)
+
+
+# ==================== Storage ==================== #
+
+def _save(session: ProfileSession, status: int, duration_s: float, stages: Optional[Dict[str, float]]) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = session.path.strip("/").replace("/", "_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}_{session.method}_{route}_{duration_s * 1000:.0f}ms.folded"
+    stage_text = " ".join(f"{k}={v * 1000:.1f}ms" for k, v in (stages or {}).items())
+    with open(os.path.join(PROFILE_DIR, name), "w") as fh:
+        fh.write(f"# {session.method} {session.path} status={status} duration={duration_s * 1000:.1f}ms "
+                 f"samples={session.samples} interval={PROFILE_INTERVAL_MS}ms stages: {stage_text}\n")
+        for stack, count in sorted(session.stacks.items(), key=lambda kv: -kv[1]):
+            fh.write(f"{stack} {count}\n")
+    _enforce_retention()
+    return name
+
+
+def _enforce_retention():
+    files = sorted(f for f in os.listdir(PROFILE_DIR) if f.endswith(".folded"))
+    for old in files[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else files:
+        os.remove(os.path.join(PROFILE_DIR, old))
+
+
+def list_profiles() -> List[Dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    out = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if name.endswith(".folded"):
+            with open(os.path.join(PROFILE_DIR, name)) as fh:
+                out.append({"name": name, "summary": fh.readline().lstrip("# ").strip()})
+    return out
+
+
+def profile_path(name: str) -> Optional[str]:
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    return path if name.endswith(".folded") and os.path.exists(path) else None
+
+
+# ==================== Arming ==================== #
+
+def arm(prefix: str, count: int):
+    with _lock:
+        if count > 0:
+            _armed[prefix] = count
+        else:
+            _armed.pop(prefix, None)
+
+
+def armed() -> Dict[str, int]:
+    with _lock:
+        return dict(_armed)
+
+
+def _take_armed(path: str) -> bool:
+    with _lock:
+        for prefix, left in list(_armed.items()):
+            if path.startswith(prefix):
+                if left <= 1:
+                    del _armed[prefix]
+                else:
+                    _armed[prefix] = left - 1
+                return True
+    return False
+
+
+def _admin_header(headers) -> bool:
+    """X-Profile: 1 together with an admin's bearer token."""
+    from utils.jwt_handler import is_admin_token
+
+    wanted, token = False, None
+    for key, value in headers:
+        if key == PROFILE_HEADER:
+            wanted = value.strip() not in (b"", b"0")
+        elif key == b"authorization" and value[:7].lower() == b"bearer ":
+            token = value[7:].decode("latin-1")
+    return wanted and token is not None and is_admin_token(token)
+
+
+# ==================== Hooks ==================== #
+
+class ProfilingMiddleware:
+    """Starts a ProfileSession for requests that asked for one (header or armed prefix)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+                (_armed and _take_armed(scope["path"]))
+                or (any(k == PROFILE_HEADER for k, _ in scope["headers"]) and _admin_header(scope["headers"]))):
+            return await self.app(scope, receive, send)
+
+        session = ProfileSession(scope["method"], scope["path"])
+        token = _session.set(session)
+        loop_thread = threading.get_ident()
+        session.attach(loop_thread)
+        _start(session)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.detach(loop_thread)
+            _stop(session)
+            _session.reset(token)
+            _save(session, status, time.perf_counter() - start, current_stages())
+
+
+def _attach_worker(call):
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        session = _session.get()
+        if session is None:
+            return call(*args, **kwargs)
+        ident = threading.get_ident()
+        session.attach(ident)
+        try:
+            return call(*args, **kwargs)
+        finally:
+            session.detach(ident)
+    wrapper._profiled = True
+    return wrapper
+
+
+def instrument_sync_routes(router):
+    """Let sync endpoints (run in the threadpool) attach their worker thread to a profile session.
+
+    Call on each APIRouter before app.include_router() – included routes are
+    rebuilt from `route.endpoint` – and on the app itself for its own routes,
+    whose handler reads `dependant.call` per request. The wrapper is sync, so
+    FastAPI still sends the endpoint to the threadpool.
+    """
+    from fastapi.routing import APIRoute
+
+    for route in router.routes:
+        if isinstance(route, APIRoute):
+            call = route.endpoint
+            if not (inspect.iscoroutinefunction(call) or getattr(call, "_profiled", False)):
+                route.endpoint = route.dependant.call = _attach_worker(call)
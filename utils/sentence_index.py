@@ -0,0 +1,247 @@
+# backend/utils/sentence_index.py
+"""Sentence-level index for /plagiarism/check.
+
+Chunk-level matching can only say "this sentence looks like somewhere in
+that 1500-char chunk". Here every stored chunk is also split into sentences
+at ingest; each sentence is embedded (batched through /api/embed) and stored
+in its own collection with the chunk id and its character offsets inside the
+chunk. The check then runs one ANN query for all input sentences and can
+report the exact source sentence instead of a chunk preview.
+
+It makes ingest slower (roughly one extra embedding per sentence), so it can
+be switched off with SENTENCE_INDEX=off – /check then falls back to
+chunk-level matching.
+
+Coverage is tracked per chunk (lexical_chunks.sentences). Chunks stored
+while the index was off, or before it existed, have no sentences; while a
+partition has any, /check merges the sentence matches with the chunk-level
+scan so those papers are still found. Fill the gaps with
+
+    python -m utils.sentence_index rebuild [--all]
+
+which embeds only the chunks without sentences (--all: every chunk). Run it
+after `python -m utils.lexical_index rebuild` too (that resets the marks;
+chunks whose sentences are stored are only marked again, not re-embedded).
+"""
+import argparse
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from db.database import get_db_connection
+from utils.embedding import get_embeddings_batch
+from utils.metrics import stage
+from utils.partition import partition_filter
+
+SENTENCE_INDEX = os.getenv("SENTENCE_INDEX", "on").lower() not in ("off", "0", "false", "no")
+# shorter fragments (headings, "Fig. 3", reference numbers) are not indexed
+SENTENCE_MIN_CHARS = int(os.getenv("SENTENCE_MIN_CHARS", "30"))
+# rows per collection.add() call
+_ADD_BATCH = 1000
+
+_SENTENCE_RE = re.compile(r"[^.!?]+[.!?]*")
+# metadata copied from the chunk onto each of its sentences
+_INHERITED = ("source", "owner", "project")
+
+
+def sentence_spans(text: str, min_chars: int = SENTENCE_MIN_CHARS) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of the sentences in `text`, whitespace trimmed."""
+    spans = []
+    for m in _SENTENCE_RE.finditer(text):
+        raw = m.group()
+        start = m.start() + (len(raw) - len(raw.lstrip()))
+        end = m.end() - (len(raw) - len(raw.rstrip()))
+        if end - start >= min_chars:
+            spans.append((start, end))
+    return spans
+
+
+def embed_sentences(chunk_ids: List[str], chunks: List[str], metadatas: List[Dict]) -> Dict[str, List]:
+    """Split and embed the sentences of chunks about to be stored (no writes)."""
+    rows = {"ids": [], "documents": [], "metadatas": [], "embeddings": [], "chunk_ids": list(chunk_ids)}
+    if not SENTENCE_INDEX:
+        return rows
+    for chunk_id, chunk, meta in zip(chunk_ids, chunks, metadatas):
+        inherited = {k: meta[k] for k in _INHERITED if k in (meta or {})}
+        for n, (start, end) in enumerate(sentence_spans(chunk)):
+            rows["ids"].append(f"{chunk_id}:s{n}")
+            rows["documents"].append(chunk[start:end])
+            rows["metadatas"].append({"chunk_id": chunk_id, "start": start, "end": end, **inherited})
+    if rows["ids"]:
+        with stage("sentence_embed"):
+            rows["embeddings"] = get_embeddings_batch(rows["documents"])
+    return rows
+
+
+def store_sentences(rows: Dict[str, List], chunk_ids: Optional[List[str]] = None) -> int:
+    """Store sentences from embed_sentences() – only those of `chunk_ids` when given; returns the count."""
+    if not SENTENCE_INDEX:
+        return 0
+    covered = rows["chunk_ids"] if chunk_ids is None else chunk_ids
+    if chunk_ids is not None:
+        keep = set(chunk_ids)
+        picked = [i for i, meta in enumerate(rows["metadatas"]) if meta["chunk_id"] in keep]
+        rows = {k: [rows[k][i] for i in picked] for k in ("ids", "documents", "metadatas", "embeddings")}
+    ids = rows["ids"]
+    if ids:
+        from vector_db.client import get_sentence_collection
+
+        collection = get_sentence_collection()
+        with stage("sentence_index"):
+            for i in range(0, len(ids), _ADD_BATCH):
+                sl = slice(i, i + _ADD_BATCH)
+                collection.upsert(ids=ids[sl], embeddings=rows["embeddings"][sl], documents=rows["documents"][sl],
+                                  metadatas=rows["metadatas"][sl])
+    _mark_covered(covered)   # also chunks without an indexable sentence: nothing missing there
+    return len(ids)
+
+
+def _mark_covered(chunk_ids: List[str]):
+    conn = get_db_connection()
+    for i in range(0, len(chunk_ids), _ADD_BATCH):
+        part = chunk_ids[i:i + _ADD_BATCH]
+        conn.execute(f"UPDATE lexical_chunks SET sentences = 1 WHERE chunk_id IN ({', '.join('?' * len(part))})",
+                     part)
+    conn.commit()
+    conn.close()
+
+
+def uncovered_chunks(partition: Dict) -> int:
+    """Chunks of the partition the sentence index has no sentences for."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT COUNT(*) AS n FROM lexical_chunks WHERE owner = ? AND project = ? AND sentences = 0",
+                       (partition["owner"], partition["project"])).fetchone()
+    conn.close()
+    return row["n"]
+
+
+def delete_sentences(chunk_ids: List[str]):
+    """Drop the sentence rows of deleted chunks."""
+    from vector_db.client import get_sentence_collection
+
+    collection = get_sentence_collection()
+    for i in range(0, len(chunk_ids), _ADD_BATCH):
+        collection.delete(where={"chunk_id": {"$in": chunk_ids[i:i + _ADD_BATCH]}})
+
+
+def retag_sentences(chunk_sources: Dict[str, str]):
+    """Point the sentences of these chunks at a new primary source (after that paper was deleted)."""
+    from vector_db.client import get_sentence_collection
+
+    collection = get_sentence_collection()
+    chunk_ids = list(chunk_sources)
+    for i in range(0, len(chunk_ids), _ADD_BATCH):
+        found = collection.get(where={"chunk_id": {"$in": chunk_ids[i:i + _ADD_BATCH]}}, include=["metadatas"])
+        if found["ids"]:
+            collection.update(ids=found["ids"], metadatas=[{**m, "source": chunk_sources[m["chunk_id"]]}
+                                                           for m in found["metadatas"]])
+
+
+def match_sentences(embeddings, partition: Dict) -> Optional[List[Dict]]:
+    """Nearest stored sentence per input embedding, or None if the partition has none indexed.
+
+    Each hit: {"id", "text", "similarity", "chunk_id", "start", "end", "source"}.
+    """
+    if not SENTENCE_INDEX:
+        return None
+    from vector_db.client import get_sentence_collection
+
+    result = get_sentence_collection().query(
+        query_embeddings=embeddings, n_results=1, where=partition_filter(partition),
+        include=["documents", "metadatas", "distances"])
+    if not result["ids"] or not result["ids"][0]:
+        return None
+
+    hits = []
+    for ids, docs, metas, dists in zip(result["ids"], result["documents"], result["metadatas"],
+                                       result["distances"]):
+        meta = metas[0] or {}
+        hits.append({
+            "id": ids[0],
+            "text": docs[0],
+            "similarity": 1.0 - float(dists[0]),   # cosine space: distance = 1 - cos
+            "chunk_id": meta.get("chunk_id"),
+            "start": meta.get("start"),
+            "end": meta.get("end"),
+            "source": meta.get("source", "Unknown"),
+        })
+    return hits
+
+
+def chunk_sentences(chunk_ids: List[str]) -> Dict[str, List[Dict]]:
+    """Stored sentences (text, offsets, embedding) of these chunks, in chunk order.
+
+    Chunks without indexed sentences (index off, or stored before it existed)
+    are simply missing from the result.
+    """
+    if not SENTENCE_INDEX or not chunk_ids:
+        return {}
+    from vector_db.client import get_sentence_collection
+
+    found = get_sentence_collection().get(where={"chunk_id": {"$in": list(chunk_ids)}},
+                                          include=["documents", "metadatas", "embeddings"])
+    out: Dict[str, List[Dict]] = {}
+    for doc, meta, emb in zip(found["documents"], found["metadatas"], found["embeddings"]):
+        out.setdefault(meta["chunk_id"], []).append(
+            {"text": doc, "start": meta["start"], "end": meta["end"], "embedding": emb})
+    for sentences in out.values():
+        sentences.sort(key=lambda s: s["start"])
+    return out
+
+
+# ==================== Rebuild ==================== #
+
+def rebuild(all_chunks: bool = False, batch: int = 500) -> Dict:
+    """Index the sentences of chunks that have none (every chunk with all_chunks).
+
+    Chunks whose sentences are already stored (e.g. restored from a
+    snapshot) are only marked as covered, not embedded again.
+    """
+    from vector_db.client import get_collection, get_sentence_collection, write_lock
+
+    if not SENTENCE_INDEX:
+        raise RuntimeError("SENTENCE_INDEX is off")
+    conn = get_db_connection()
+    if all_chunks:
+        conn.execute("UPDATE lexical_chunks SET sentences = 0")
+        conn.commit()
+    pending = [r["chunk_id"] for r in conn.execute("SELECT chunk_id FROM lexical_chunks WHERE sentences = 0")]
+    conn.close()
+
+    collection, sentences = get_collection(), get_sentence_collection()
+    report = {"chunks": len(pending), "marked": 0, "embedded": 0, "sentences": 0}
+    for i in range(0, len(pending), batch):
+        part = pending[i:i + batch]
+        if not all_chunks:
+            present = {m["chunk_id"] for m in sentences.get(where={"chunk_id": {"$in": part}},
+                                                            include=["metadatas"])["metadatas"]}
+            _mark_covered(list(present))
+            report["marked"] += len(present)
+            part = [cid for cid in part if cid not in present]
+        found = collection.get(ids=part, include=["documents", "metadatas"]) if part else {"ids": []}
+        if not found["ids"]:
+            continue
+        rows = embed_sentences(found["ids"], found["documents"], [m or {} for m in found["metadatas"]])
+        with write_lock:   # store only chunks not deleted while their sentences were embedded
+            alive = collection.get(ids=found["ids"], include=[])["ids"]
+            report["sentences"] += store_sentences(rows, alive)
+        report["embedded"] += len(alive)
+    return report
+
+
+def main():
+    from db.schema import init_lexical_tables
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    cmd = sub.add_parser("rebuild", help="index the sentences of chunks that have none")
+    cmd.add_argument("--all", action="store_true", help="re-embed the sentences of every chunk")
+    args = parser.parse_args()
+
+    init_lexical_tables()
+    print(json.dumps(rebuild(all_chunks=args.all), indent=2))
+
+
+if __name__ == "__main__":
+    main()
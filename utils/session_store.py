@@ -0,0 +1,256 @@
+# backend/utils/session_store.py
+"""Bounded chat-session storage for the writing assistant.
+
+Two backends with the same API:
+- "sqlite" (default): shared by every uvicorn worker through research_bot.db
+- "memory": per-process, for single-worker / dev setups
+
+Both expire idle sessions after SESSION_TTL_S, evict the least recently used
+sessions beyond SESSION_MAX_SESSIONS, keep at most SESSION_MAX_MESSAGES per
+session and hand back only the newest messages that fit a token budget.
+Appending a message is O(1): it never re-reads or rebuilds the transcript.
+
+Sequence numbers are only comparable within one epoch of a session:
+SQLite ids are global and never reused (one epoch for the whole store),
+in-memory counters restart whenever a session is created again – after a
+restart, an eviction, or in another worker. A stored Ollama context
+(llm_context, scope "grammar") records the epoch its last_seq belongs to,
+and is deleted together with the session when it expires or is evicted.
+"""
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from db.database import get_db_connection
+from utils.chunking import count_tokens
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", str(24 * 3600)))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+SESSION_WINDOW_TOKENS = int(os.getenv("SESSION_WINDOW_TOKENS", "2000"))
+
+# how often (seconds) a process runs the TTL/LRU sweep on the shared table
+_SWEEP_INTERVAL_S = 60.0
+# trim a session only once it overshoots by this many rows (amortised O(1))
+_TRIM_SLACK = 10
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    def append(self, session_id: str, role: str, content: str) -> int:
+        """Store a message; returns its sequence number (increasing per session)."""
+
+    @abstractmethod
+    def window(self, session_id: str, token_budget: Optional[int] = None) -> List[Dict]:
+        """Newest messages (oldest first) whose total tokens fit the budget."""
+
+    @abstractmethod
+    def since(self, session_id: str, seq: int) -> List[Dict]:
+        """Messages appended after sequence number `seq`, oldest first (with their "seq")."""
+
+    @abstractmethod
+    def epoch(self, session_id: str) -> str:
+        """Identifies the numbering `seq` values of this session belong to."""
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        """Forget the session and its messages."""
+
+
+def _drop_contexts(session_ids: List[str]):
+    """Forget the grammar chat's Ollama contexts of sessions that are gone."""
+    if not session_ids:
+        return
+    conn = get_db_connection()
+    conn.executemany("DELETE FROM llm_context WHERE scope = 'grammar' AND session_id = ?",
+                     [(s,) for s in session_ids])
+    conn.commit()
+    conn.close()
+
+
+# ==================== SQLite backend ==================== #
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self):
+        self._last_sweep = 0.0
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        now = time.time()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO writing_messages (session_id, role, content, tokens) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, count_tokens(content))
+        )
+        seq = cursor.lastrowid
+        cursor.execute('''
+            INSERT INTO writing_sessions (session_id, last_access, message_count) VALUES (?, ?, 1)
+            ON CONFLICT(session_id) DO UPDATE SET
+                last_access = excluded.last_access,
+                message_count = message_count + 1
+            RETURNING message_count
+        ''', (session_id, now))
+        count = cursor.fetchone()["message_count"]
+
+        if count > SESSION_MAX_MESSAGES + _TRIM_SLACK:
+            cursor.execute('''
+                DELETE FROM writing_messages WHERE session_id = ? AND id NOT IN (
+                    SELECT id FROM writing_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?
+                )
+            ''', (session_id, session_id, SESSION_MAX_MESSAGES))
+            cursor.execute("UPDATE writing_sessions SET message_count = ? WHERE session_id = ?",
+                           (SESSION_MAX_MESSAGES, session_id))
+        conn.commit()
+        conn.close()
+        self._maybe_sweep(now)
+        return seq
+
+    def window(self, session_id: str, token_budget: Optional[int] = None) -> List[Dict]:
+        budget = token_budget or SESSION_WINDOW_TOKENS
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT role, content FROM (
+                SELECT id, role, content,
+                       SUM(tokens) OVER (ORDER BY id DESC) AS running
+                FROM (
+                    SELECT id, role, content, tokens FROM writing_messages
+                    WHERE session_id = ? ORDER BY id DESC LIMIT ?
+                )
+            ) WHERE running <= ? ORDER BY id
+        ''', (session_id, SESSION_MAX_MESSAGES, budget))
+        rows = cursor.fetchall()
+        cursor.execute("UPDATE writing_sessions SET last_access = ? WHERE session_id = ?",
+                       (time.time(), session_id))
+        conn.commit()
+        conn.close()
+        return [{"role": r["role"], "content": r["content"]} for r in rows]
+
+    def since(self, session_id: str, seq: int) -> List[Dict]:
+        conn = get_db_connection()
+        rows = conn.execute(
+            "SELECT id, role, content FROM writing_messages WHERE session_id = ? AND id > ? ORDER BY id",
+            (session_id, seq)
+        ).fetchall()
+        conn.close()
+        return [{"role": r["role"], "content": r["content"], "seq": r["id"]} for r in rows]
+
+    def epoch(self, session_id: str) -> str:
+        return "sqlite"   # AUTOINCREMENT ids: one numbering shared by every worker, never reused
+
+    def clear(self, session_id: str):
+        conn = get_db_connection()
+        conn.execute("DELETE FROM writing_messages WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM writing_sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+        conn.close()
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep < _SWEEP_INTERVAL_S:
+            return
+        self._last_sweep = now
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # TTL expiry, then LRU eviction of whatever is over the cap
+        cursor.execute("DELETE FROM writing_sessions WHERE last_access < ?", (now - SESSION_TTL_S,))
+        cursor.execute('''
+            DELETE FROM writing_sessions WHERE session_id IN (
+                SELECT session_id FROM writing_sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (SESSION_MAX_SESSIONS,))
+        cursor.execute('''
+            DELETE FROM writing_messages
+            WHERE session_id NOT IN (SELECT session_id FROM writing_sessions)
+        ''')
+        cursor.execute('''
+            DELETE FROM llm_context
+            WHERE scope = 'grammar' AND session_id NOT IN (SELECT session_id FROM writing_sessions)
+        ''')
+        conn.commit()
+        conn.close()
+
+
+# ==================== In-memory backend ==================== #
+
+class MemorySessionStore(SessionStore):
+    def __init__(self):
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, session_id: str, now: float, create: bool, dropped: List[str]):
+        """Caller holds the lock; ids of expired / evicted sessions are added to `dropped`."""
+        sess = self._sessions.get(session_id)
+        if sess is not None and now - sess["last_access"] > SESSION_TTL_S:
+            del self._sessions[session_id]
+            dropped.append(session_id)
+            sess = None
+        if sess is None and create:
+            sess = {"messages": deque(maxlen=SESSION_MAX_MESSAGES), "last_access": now, "seq": 0,
+                    "epoch": uuid.uuid4().hex}
+            self._sessions[session_id] = sess
+            while len(self._sessions) > SESSION_MAX_SESSIONS:
+                dropped.append(self._sessions.popitem(last=False)[0])   # least recently used
+        if sess is not None:
+            sess["last_access"] = now
+            self._sessions.move_to_end(session_id)
+        return sess
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        tokens = count_tokens(content)
+        dropped = []
+        with self._lock:
+            sess = self._get(session_id, time.time(), create=True, dropped=dropped)
+            sess["seq"] += 1
+            sess["messages"].append((role, content, tokens, sess["seq"]))
+            seq = sess["seq"]
+        _drop_contexts(dropped)
+        return seq
+
+    def window(self, session_id: str, token_budget: Optional[int] = None) -> List[Dict]:
+        budget = token_budget or SESSION_WINDOW_TOKENS
+        dropped = []
+        with self._lock:
+            sess = self._get(session_id, time.time(), create=False, dropped=dropped)
+            messages = list(sess["messages"]) if sess else []
+        _drop_contexts(dropped)
+
+        out, used = [], 0
+        for role, content, tokens, _ in reversed(messages):
+            used += tokens
+            if used > budget:
+                break
+            out.append({"role": role, "content": content})
+        return out[::-1]
+
+    def since(self, session_id: str, seq: int) -> List[Dict]:
+        dropped = []
+        with self._lock:
+            sess = self._get(session_id, time.time(), create=False, dropped=dropped)
+            messages = list(sess["messages"]) if sess else []
+        _drop_contexts(dropped)
+        return [{"role": m[0], "content": m[1], "seq": m[3]} for m in messages if m[3] > seq]
+
+    def epoch(self, session_id: str) -> str:
+        # a fresh id per session object: differs per process, and after expiry / eviction
+        with self._lock:
+            sess = self._sessions.get(session_id)
+            return sess["epoch"] if sess else ""
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = MemorySessionStore() if SESSION_BACKEND == "memory" else SQLiteSessionStore()
+    return _store
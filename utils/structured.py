@@ -0,0 +1,110 @@
+# backend/utils/structured.py
+"""Schema-constrained generation for every endpoint that expects JSON back.
+
+The Pydantic model's JSON schema goes to Ollama as `format`, so decoding is
+constrained to valid JSON of the right shape. Whatever comes back is still
+validated; if that fails we try, in order of cost:
+  1. a local repair (strip code fences / prose, trailing commas, bare list)
+  2. one short LLM "fix this JSON" pass – it only re-emits the JSON, it does
+     not redo the expensive generation
+Per-endpoint counters (`llm_structured_output_total` on /metrics) track how
+often each path is taken; the parse-failure rate is
+parse_failures / requests, the repair rate (local_repairs + llm_repairs) /
+parse_failures.
+"""
+import json
+import re
+from typing import Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from utils.admission import AdmissionRejected
+from utils.ollama import generate
+from utils.metrics import inc
+
+T = TypeVar("T", bound=BaseModel)
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+class StructuredOutputError(Exception):
+    """The model output could not be turned into the requested schema."""
+
+
+def _count(endpoint: str, key: str):
+    inc("llm_structured_output_total", {"endpoint": endpoint, "outcome": key})
+
+
+def _local_repair(raw: str, schema: Type[T]) -> Optional[T]:
+    text = raw.strip()
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    block = re.search(r"\{.*\}|\[.*\]", text, re.DOTALL)
+    if block:
+        text = block.group(0)
+    text = _TRAILING_COMMA_RE.sub(r"\1", text)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+    # model returned the bare list for a single-list-field wrapper
+    fields = list(schema.model_fields)
+    if isinstance(data, list) and len(fields) == 1:
+        data = {fields[0]: data}
+    try:
+        return schema.model_validate(data)
+    except ValidationError:
+        return None
+
+
+def _llm_repair(raw: str, error: str, schema: Type[T], model: str) -> Optional[T]:
+    prompt = f"""The JSON below does not match the required schema.
+Fix it. Keep all the content, only correct the structure.
+Return the corrected JSON only.
+
+Validation errors:
+{error[:1000]}
+
+JSON:
+{raw[:8000]}
+"""
+    try:
+        res = generate(prompt, model, options={"temperature": 0}, format=schema.model_json_schema())
+        return schema.model_validate_json(res.get("response", ""))
+    except AdmissionRejected:
+        raise
+    except Exception:
+        return None
+
+
+def generate_structured(prompt: str, schema: Type[T], model: str,
+                        options: Optional[Dict] = None, endpoint: str = "default") -> T:
+    """Generate an instance of `schema`; raises StructuredOutputError if even the repair fails.
+
+    Connection/HTTP errors from Ollama propagate unchanged.
+    """
+    _count(endpoint, "requests")
+    res = generate(prompt, model, options=options, format=schema.model_json_schema())
+    raw = res.get("response", "")
+
+    try:
+        return schema.model_validate_json(raw)
+    except ValidationError as e:
+        error = str(e)
+    _count(endpoint, "parse_failures")
+
+    repaired = _local_repair(raw, schema)
+    if repaired is not None:
+        _count(endpoint, "local_repairs")
+        return repaired
+
+    repaired = _llm_repair(raw, error, schema, model)
+    if repaired is not None:
+        _count(endpoint, "llm_repairs")
+        return repaired
+
+    _count(endpoint, "repair_failures")
+    raise StructuredOutputError(f"Model returned invalid JSON for {schema.__name__}: {error[:300]}")
@@ -0,0 +1,332 @@
+# backend/utils/topic_clusters.py
+"""Corpus-wide topic digest for /topic-finder: mini-batch k-means over the
+stored embeddings.
+
+The topic finder used to hand the LLM the first 5000 characters of the
+lowercased, concatenated corpus – the first paper or two, whatever the
+library size – after reading every chunk out of Chroma. Now the
+partition's embeddings are clustered and the prompt gets a digest of
+TOPIC_CLUSTERS clusters, largest first: size and share of the corpus,
+keywords, and the TOPIC_REPRESENTATIVES chunks closest to each centroid
+(trimmed to TOPIC_SNIPPET_CHARS). Its size is bounded by those settings,
+not by the number of papers.
+
+Clustering is spherical (cosine) mini-batch k-means (Sculley 2010) over
+the unit vectors of the embedding mirror (vector_db/mirror.py), streamed
+in TOPIC_BATCH-row blocks, so memory stays at one block:
+
+- full fit: k-means++ seeding on a sample, then TOPIC_PASSES shuffled
+  passes of mini-batch updates
+- incremental: store_chunks() folds the vectors of a new paper into the
+  existing centroids (one mini-batch step over the rows after `last_row`)
+- a refit happens when chunks were deleted, k changed, or the corpus grew
+  by more than TOPIC_REFIT_GROWTH since the last full fit
+
+Centroids, per-centroid counts and the row watermark live in the
+`topic_clusters` table. The digest itself (sizes and representatives need
+one assignment pass over the partition) is cached there under the corpus
+version and rebuilt only after an upload or delete. With
+EMBEDDING_MIRROR=off the vectors are read from Chroma and every rebuild is
+a full fit.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from db.database import get_db_connection
+from utils.metrics import stage
+
+TOPIC_CLUSTERS = int(os.getenv("TOPIC_CLUSTERS", "8"))
+TOPIC_REPRESENTATIVES = int(os.getenv("TOPIC_REPRESENTATIVES", "2"))
+TOPIC_SNIPPET_CHARS = int(os.getenv("TOPIC_SNIPPET_CHARS", "240"))
+TOPIC_KEYWORDS = int(os.getenv("TOPIC_KEYWORDS", "5"))
+TOPIC_BATCH = int(os.getenv("TOPIC_BATCH", "1024"))
+TOPIC_PASSES = int(os.getenv("TOPIC_PASSES", "3"))
+TOPIC_REFIT_GROWTH = float(os.getenv("TOPIC_REFIT_GROWTH", "1.0"))
+_SEED_SAMPLE = 4096          # rows k-means++ seeds from
+
+_lock = threading.Lock()
+# numpy is imported per function: utils.ingest and routers.topic_finder import this module at startup
+
+
+# ==================== Vectors ==================== #
+
+class _Vectors:
+    """The partition's unit vectors: mirror rows (memory-mapped) or, without a mirror, a Chroma read."""
+
+    def __init__(self, partition: Dict[str, str]):
+        import numpy as np
+        from vector_db.mirror import synced_mirror
+
+        self.mirror = synced_mirror()   # None while it lags the collection: read Chroma
+        if self.mirror is not None:
+            self.rows = self.mirror.live_rows(partition["owner"], partition["project"])
+            self.dim = self.mirror.dim
+            return
+        from utils.partition import partition_filter
+        from vector_db.client import get_collection
+
+        found = get_collection().get(where=partition_filter(partition), include=["embeddings"])
+        self._ids = list(found["ids"])
+        data = np.asarray(found["embeddings"] if len(self._ids) else np.zeros((0, 0)), dtype=np.float32)
+        norms = np.linalg.norm(data, axis=1, keepdims=True) if data.size else 1
+        self._data = data / np.where(norms == 0, 1, norms)
+        self.rows = np.arange(len(self._ids), dtype=np.int64)
+        self.dim = self._data.shape[1] if self._data.size else None
+
+    @property
+    def incremental(self) -> bool:
+        return self.mirror is not None
+
+    def blocks(self, rows: "np.ndarray", block: int = TOPIC_BATCH):
+        """(offset into `rows`, float32 block); `rows` must be ascending."""
+        if self.mirror is not None:
+            yield from self.mirror.iter_blocks(rows, block)
+            return
+        for start in range(0, len(rows), block):
+            yield start, self._data[rows[start:start + block]]
+
+    def ids(self, rows) -> List[str]:
+        if self.mirror is not None:
+            return self.mirror.chunk_ids(rows)
+        return [self._ids[int(r)] for r in rows]
+
+
+# ==================== k-means ==================== #
+
+def _seed(sample: "np.ndarray", k: int, rng: "np.random.Generator") -> "np.ndarray":
+    """k-means++ on cosine distance."""
+    import numpy as np
+
+    centroids = [sample[rng.integers(len(sample))]]
+    dist = 1.0 - sample @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(dist, 0, None)
+        total = weights.sum()
+        pick = rng.choice(len(sample), p=weights / total) if total > 0 else rng.integers(len(sample))
+        centroids.append(sample[pick])
+        dist = np.minimum(dist, 1.0 - sample @ sample[pick])
+    return np.array(centroids, dtype=np.float32)
+
+
+def _partial_fit(centroids: "np.ndarray", counts: "np.ndarray", batch: "np.ndarray"):
+    """One mini-batch step, in place: per-centroid learning rate 1 / (vectors seen)."""
+    import numpy as np
+
+    labels = np.argmax(batch @ centroids.T, axis=1)
+    k = len(centroids)
+    n = np.bincount(labels, minlength=k).astype(np.float64)
+    onehot = np.zeros((k, len(batch)), dtype=np.float32)
+    onehot[labels, np.arange(len(batch))] = 1.0
+    sums = onehot @ batch
+    hit = n > 0
+    counts[hit] += n[hit]
+    eta = (n[hit] / counts[hit]).astype(np.float32)[:, None]
+    centroids[hit] += eta * (sums[hit] / n[hit, None].astype(np.float32) - centroids[hit])
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    centroids /= np.where(norms == 0, 1, norms)
+
+
+def _fit(vectors: _Vectors, k: int, seed: int = 0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    rows = vectors.rows
+    sample = np.sort(rng.choice(rows, size=min(len(rows), max(_SEED_SAMPLE, 8 * k)), replace=False))
+    seed_data = np.concatenate([b for _, b in vectors.blocks(sample, len(sample))])
+    centroids = _seed(seed_data, k, rng)
+    counts = np.zeros(k, dtype=np.float64)
+    for _ in range(TOPIC_PASSES):
+        order = rng.permutation(rows)
+        for start in range(0, len(order), TOPIC_BATCH):
+            for _, batch in vectors.blocks(np.sort(order[start:start + TOPIC_BATCH])):
+                _partial_fit(centroids, counts, batch)
+    return centroids, counts
+
+
+def _assign(vectors: _Vectors, centroids: "np.ndarray", keep: int):
+    """One pass: cluster sizes, mean cosine to the centroid, `keep` rows nearest each centroid."""
+    import numpy as np
+
+    k = len(centroids)
+    sizes = np.zeros(k, dtype=np.int64)
+    sim_sum = np.zeros(k, dtype=np.float64)
+    best_s = [np.zeros(0, dtype=np.float32) for _ in range(k)]
+    best_r = [np.zeros(0, dtype=np.int64) for _ in range(k)]
+    for offset, block in vectors.blocks(vectors.rows, 8 * TOPIC_BATCH):
+        sims = block @ centroids.T
+        labels = np.argmax(sims, axis=1)
+        top = sims[np.arange(len(block)), labels]
+        sizes += np.bincount(labels, minlength=k)
+        sim_sum += np.bincount(labels, weights=top, minlength=k)
+        for c in np.unique(labels):
+            members = np.flatnonzero(labels == c)
+            cand_s = np.concatenate([best_s[c], top[members]])
+            cand_r = np.concatenate([best_r[c], vectors.rows[offset + members]])
+            if len(cand_s) > keep:
+                pick = np.argpartition(-cand_s, keep - 1)[:keep]
+                cand_s, cand_r = cand_s[pick], cand_r[pick]
+            best_s[c], best_r[c] = cand_s, cand_r
+    reps = []
+    for s, r in zip(best_s, best_r):
+        order = np.argsort(-s)
+        reps.append(r[order])
+    cohesion = sim_sum / np.where(sizes == 0, 1, sizes)
+    return sizes, cohesion, reps
+
+
+# ==================== State ==================== #
+
+def _load(partition: Dict[str, str]) -> Optional[Dict]:
+    import numpy as np
+
+    conn = get_db_connection()
+    row = conn.execute("SELECT * FROM topic_clusters WHERE owner = ? AND project = ?",
+                       (partition["owner"], partition["project"])).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    state = dict(row)
+    state["centroids"] = np.frombuffer(row["centroids"], dtype=np.float32).reshape(row["k"], row["dim"]).copy()
+    state["counts"] = np.frombuffer(row["counts"], dtype=np.float64).copy()
+    state["digest"] = json.loads(row["digest"]) if row["digest"] else None
+    return state
+
+
+def _save(partition: Dict[str, str], centroids: "np.ndarray", counts: "np.ndarray", last_row: int,
+          n_rows: int, fit_rows: int, version: Optional[str] = None, digest: Optional[Dict] = None):
+    import numpy as np
+
+    conn = get_db_connection()
+    conn.execute(
+        "INSERT OR REPLACE INTO topic_clusters (owner, project, k, dim, centroids, counts, last_row, n_rows, "
+        "fit_rows, corpus_version, digest, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (partition["owner"], partition["project"], centroids.shape[0], centroids.shape[1],
+         centroids.astype(np.float32).tobytes(), counts.astype(np.float64).tobytes(), last_row, n_rows,
+         fit_rows, version, json.dumps(digest) if digest is not None else None, time.time()))
+    conn.commit()
+    conn.close()
+
+
+def _config() -> List[int]:
+    return [TOPIC_CLUSTERS, TOPIC_REPRESENTATIVES, TOPIC_SNIPPET_CHARS, TOPIC_KEYWORDS]
+
+
+def absorb_new(partition: Dict[str, str]):
+    """Fold rows stored since the last update into the centroids (called by store_chunks)."""
+    from vector_db.mirror import synced_mirror
+
+    mirror = synced_mirror()
+    if mirror is None:
+        return
+    with _lock:
+        state = _load(partition)
+        if state is None:
+            return   # nothing fitted yet – the first digest does a full fit
+        rows = mirror.live_rows(partition["owner"], partition["project"])
+        new = rows[rows > state["last_row"]]
+        if not len(new) or state["n_rows"] + len(new) != len(rows) or mirror.dim != state["dim"]:
+            return   # deletions / re-dimensioned store: leave it to the refit
+        centroids, counts = state["centroids"], state["counts"]
+        with stage("topic_clusters"):
+            for _, batch in mirror.iter_blocks(new, TOPIC_BATCH):
+                _partial_fit(centroids, counts, batch)
+        _save(partition, centroids, counts, int(rows[-1]), len(rows), state["fit_rows"])
+
+
+# ==================== Digest ==================== #
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    # overlapping chunks start mid-sentence: begin at the first sentence start if it is close
+    cut = text.find(". ", 0, TOPIC_SNIPPET_CHARS // 3)
+    if not text[:1].isupper():
+        text = text[cut + 2:] if cut != -1 else text.split(" ", 1)[-1]
+    if len(text) <= TOPIC_SNIPPET_CHARS:
+        return text
+    return text[:TOPIC_SNIPPET_CHARS].rsplit(" ", 1)[0] + " …"
+
+
+def _describe(vectors: _Vectors, centroids: "np.ndarray") -> List[Dict]:
+    import numpy as np
+    from utils.keywords import extract_keywords
+    from vector_db.client import get_collection
+
+    sizes, cohesion, reps = _assign(vectors, centroids, max(TOPIC_REPRESENTATIVES, 1))
+    total = int(sizes.sum())
+    order = [int(c) for c in np.argsort(-sizes) if sizes[c] > 0]
+    rep_rows = {c: reps[c][:TOPIC_REPRESENTATIVES] for c in order}
+    flat = np.concatenate([rep_rows[c] for c in order]) if order else np.zeros(0, dtype=np.int64)
+    ids = vectors.ids(flat)
+    found = get_collection().get(ids=ids, include=["documents", "metadatas"]) if ids else {"ids": []}
+    by_id = {cid: (doc, meta or {}) for cid, doc, meta in
+             zip(found["ids"], found.get("documents") or [], found.get("metadatas") or [])}
+
+    clusters, pos = [], 0
+    for rank, c in enumerate(order):
+        chunk_ids = ids[pos:pos + len(rep_rows[c])]
+        pos += len(rep_rows[c])
+        texts = [by_id[cid][0] for cid in chunk_ids if cid in by_id]
+        clusters.append({
+            "cluster": rank + 1,
+            "size": int(sizes[c]),
+            "share": round(float(sizes[c]) / total, 3),
+            "cohesion": round(float(cohesion[c]), 3),
+            "keywords": extract_keywords(" ".join(texts), TOPIC_KEYWORDS) if texts else [],
+            "representatives": [{"chunk_id": cid, "source": by_id[cid][1].get("source"),
+                                 "snippet": _snippet(by_id[cid][0])} for cid in chunk_ids if cid in by_id],
+        })
+    return clusters
+
+
+def digest_text(clusters: List[Dict]) -> str:
+    """Prompt text – at most TOPIC_CLUSTERS x TOPIC_REPRESENTATIVES snippets, whatever the corpus size."""
+    total = sum(c["size"] for c in clusters)
+    lines = [f"{len(clusters)} topic clusters over {total} chunks (largest first):"]
+    for c in clusters:
+        lines.append(f"[{c['cluster']}] {c['share'] * 100:.0f}% of chunks – {', '.join(c['keywords'])}")
+        lines.extend(f'  - "{r["snippet"]}" ({r["source"]})' for r in c["representatives"])
+    return "\n".join(lines)
+
+
+def cluster_digest(partition: Dict[str, str]) -> Optional[Dict]:
+    """{"clusters": [...], "text", "mode", "chunks"} for the partition; None if it holds no vectors.
+
+    mode: "cached" (same corpus version), "incremental" (centroids kept,
+    sizes / representatives recomputed) or "full" (refit).
+    """
+    from utils.ingest import corpus_version
+
+    version = corpus_version(partition)
+    with _lock:
+        state = _load(partition)
+        if (state is not None and state["digest"] is not None and state["corpus_version"] == version
+                and state["digest"].get("config") == _config()):
+            return {**state["digest"], "mode": "cached"}
+
+        with stage("topic_clusters"):
+            vectors = _Vectors(partition)
+            n = len(vectors.rows)
+            if n == 0 or vectors.dim is None:
+                return None
+            k = min(TOPIC_CLUSTERS, n)
+            mode = "full"
+            if (state is not None and vectors.incremental and state["k"] == k and state["dim"] == vectors.dim
+                    and n <= state["fit_rows"] * (1 + TOPIC_REFIT_GROWTH)):
+                new = vectors.rows[vectors.rows > state["last_row"]]
+                if state["n_rows"] + len(new) == n:   # no deletions since
+                    centroids, counts, fit_rows = state["centroids"], state["counts"], state["fit_rows"]
+                    for _, batch in vectors.blocks(new):
+                        _partial_fit(centroids, counts, batch)
+                    mode = "incremental"
+            if mode == "full":
+                centroids, counts = _fit(vectors, k)
+                fit_rows = n
+            clusters = _describe(vectors, centroids)
+
+        digest = {"clusters": clusters, "text": digest_text(clusters), "chunks": n, "config": _config()}
+        last_row = int(vectors.rows[-1]) if vectors.incremental else -1
+        _save(partition, centroids, counts, last_row, n, fit_rows, version, digest)
+    return {**digest, "mode": mode}
@@ -0,0 +1,127 @@
+# backend/utils/warmup.py
+"""Startup warm-up, run from the FastAPI lifespan.
+
+A fresh worker otherwise pays for everything on its first request: Ollama
+loading gemma3:4b / nomic-embed-text into memory, tiktoken building
+cl100k_base, Chroma opening the collection and loading the HNSW index, and
+the lazily imported NumPy / sklearn stack. Each step here does one of those
+up front. The server binds immediately and `/ready` answers 503 until every
+step has finished, so a load balancer only routes traffic once it is warm.
+
+WARMUP_STEPS picks the steps (comma list, "none" to skip warm-up).
+A failing step is recorded but does not block readiness – a worker that
+cannot reach Ollama should still serve the endpoints that do not need it.
+"""
+import os
+import time
+from typing import Dict, List
+
+from utils.embedding import OLLAMA_BASE_URL, OLLAMA_EMBED_MODEL
+
+WARMUP_STEPS = os.getenv("WARMUP_STEPS", "models,encoder,collection,mirror,caches")
+# generation models to load into Ollama (the routers all use gemma3:4b)
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "gemma3:4b")
+WARMUP_TIMEOUT_S = float(os.getenv("WARMUP_TIMEOUT_S", "300"))
+
+_state: Dict = {"ready": False, "started_at": None, "total_ms": None, "steps": {}}
+
+
+# ==================== Steps ==================== #
+
+def _warm_models():
+    """Load the generate + embed models and pin them with keep_alive."""
+    from utils.ollama import OLLAMA_KEEP_ALIVE, _http
+
+    for model in [m.strip() for m in WARMUP_MODELS.split(",") if m.strip()]:
+        # a generate call without a prompt just loads the model
+        resp = _http.post(f"{OLLAMA_BASE_URL}/api/generate",
+                          json={"model": model, "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE},
+                          timeout=WARMUP_TIMEOUT_S)
+        resp.raise_for_status()
+    resp = _http.post(f"{OLLAMA_BASE_URL}/api/embed",
+                      json={"model": OLLAMA_EMBED_MODEL, "input": ["warm-up"], "keep_alive": OLLAMA_KEEP_ALIVE},
+                      timeout=WARMUP_TIMEOUT_S)
+    resp.raise_for_status()
+
+
+def _warm_encoder():
+    from utils.chunking import count_tokens
+    count_tokens("warm-up")   # builds + caches cl100k_base
+
+
+def _warm_collection():
+    """Open the Chroma client and run one query per collection so the HNSW indexes are loaded."""
+    from utils.sentence_index import SENTENCE_INDEX
+    from vector_db.client import get_collection, get_sentence_collection
+
+    collections = [get_collection()] + ([get_sentence_collection()] if SENTENCE_INDEX else [])
+    for collection in collections:
+        sample = collection.peek(limit=1)
+        embeddings = sample.get("embeddings")
+        if embeddings is not None and len(embeddings):
+            collection.query(query_embeddings=[list(embeddings[0])], n_results=1, include=[])
+
+
+def _warm_mirror():
+    """Backfill the embedding mirror if it lags the collection (vectors stored before it existed)."""
+    from vector_db.mirror import backfill
+    backfill()
+
+
+def _warm_caches():
+    """Heavy imports the routers defer, plus the DB pool and session store."""
+    import numpy  # noqa: F401
+    from db.database import get_db_connection, DB_POOL_SIZE
+    from utils.hashing import _dummy_hash
+    from utils.keywords import _stop_words
+    from utils.session_store import get_session_store
+
+    _dummy_hash()   # one bcrypt round-trip, used for unknown-user logins
+    _stop_words()
+    get_session_store()
+    conns = [get_db_connection() for _ in range(DB_POOL_SIZE)]
+    for conn in conns:
+        conn.close()   # back into the pool, pragmas already applied
+
+
+STEPS = {
+    "models": _warm_models,
+    "encoder": _warm_encoder,
+    "collection": _warm_collection,
+    "mirror": _warm_mirror,
+    "caches": _warm_caches,
+}
+
+
+def selected_steps() -> List[str]:
+    wanted = [s.strip() for s in WARMUP_STEPS.split(",") if s.strip()]
+    if wanted == ["none"]:
+        return []
+    unknown = [s for s in wanted if s not in STEPS]
+    if unknown:
+        raise RuntimeError(f"Unknown WARMUP_STEPS: {', '.join(unknown)}")
+    return wanted
+
+
+# ==================== Runner ==================== #
+
+def run_warmup(steps: List[str]) -> Dict:
+    """Run the steps in order (blocking); returns the readiness state."""
+    start = time.perf_counter()
+    _state.update(ready=False, started_at=time.time(), total_ms=None, steps={})
+    for name in steps:
+        t0 = time.perf_counter()
+        try:
+            STEPS[name]()
+            result = {"ok": True}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        _state["steps"][name] = result
+    _state["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    _state["ready"] = True
+    return _state
+
+
+def warmup_state() -> Dict:
+    return _state
@@ -1,25 +1,122 @@
 # backend/vector_db/client.py
-import chromadb
-from chromadb.config import Settings
 import os
+import threading
+
+from vector_db.hnsw import open_collection
+from vector_db.sharding import VECTOR_SHARDS, VECTOR_SHARD_KEY, ShardedCollection
 
 # Persistent directory – data server restart holeo thakbe
 CHROMA_DATA_PATH = "chroma_db"
 COLLECTION_NAME = "research_documents"
+# sentence-granularity index used by /plagiarism/check (utils/sentence_index.py)
+SENTENCE_COLLECTION_NAME = "research_sentences"
+
+_client = None
+_client_lock = threading.Lock()
+_sharded = {}
+
+
+class _WriteLock:
+    """Re-entrant lock that also excludes the other worker processes.
+
+    A thread RLock orders the threads of this process; the outermost
+    acquire additionally takes an exclusive flock on
+    CHROMA_DATA_PATH/write.lock, which every worker shares. The file is
+    opened per acquire (not once per process), so a worker forked while the
+    master held it does not inherit the lock.
+    """
+
+    def __init__(self):
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def acquire(self):
+        self._rlock.acquire()
+        if self._depth == 0:
+            import fcntl
+            os.makedirs(CHROMA_DATA_PATH, exist_ok=True)
+            fh = open(os.path.join(CHROMA_DATA_PATH, "write.lock"), "a")
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            except BaseException:
+                fh.close()
+                self._rlock.release()
+                raise
+            self._fh = fh
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            import fcntl
+            fh, self._fh = self._fh, None
+            fcntl.flock(fh, fcntl.LOCK_UN)
+            fh.close()
+        self._rlock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
 
-# Create directory if not exists
-os.makedirs(CHROMA_DATA_PATH, exist_ok=True)
+# held by vector writers (ingest / delete) in every worker; compaction and
+# shard rebuilds hold it while they copy a collection, so no write – from
+# this process or another – lands in the copy's source mid-way
+write_lock = _WriteLock()
+
+
+def get_client():
+    """Chroma client (persistent), opened on first use.
+
+    chromadb is heavy to import and opening the PersistentClient touches
+    disk, so neither happens at import time – workers that never serve a
+    vector endpoint never pay for it.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import chromadb
+                # Create directory if not exists
+                os.makedirs(CHROMA_DATA_PATH, exist_ok=True)
+                _client = chromadb.PersistentClient(path=CHROMA_DATA_PATH)
+    return _client
 
-# Chroma client (persistent)
-client = chromadb.PersistentClient(path=CHROMA_DATA_PATH)
 
 def get_collection():
-    """Get or create the Chroma collection"""
-    try:
-        collection = client.get_collection(name=COLLECTION_NAME)
-    except:
-        collection = client.create_collection(
-            name=COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}  # cosine similarity better for text
-        )
-    return collection
\ No newline at end of file
+    """Get or create the Chroma collection.
+
+    With VECTOR_SHARDS > 1 this is a ShardedCollection (same add / query /
+    get / delete / count API) spread over N collections – see sharding.py.
+    Unless EMBEDDING_MIRROR=off, writes are also mirrored into the
+    memory-mapped embedding matrix used for full scans – see mirror.py.
+    """
+    collection = _get_sharded(COLLECTION_NAME) if VECTOR_SHARDS > 1 else _get_single()
+    from vector_db.mirror import MirroredCollection, get_mirror   # numpy – keep out of import time
+    mirror = get_mirror()
+    return MirroredCollection(collection, mirror) if mirror is not None else collection
+
+
+def _get_single():
+    # HNSW space / M / ef from the environment – see hnsw.py
+    return open_collection(get_client(), COLLECTION_NAME)
+
+
+def get_sentence_collection():
+    """Sentence-level index (one row per stored sentence, not mirrored)."""
+    if VECTOR_SHARDS > 1:
+        return _get_sharded(SENTENCE_COLLECTION_NAME)
+    return open_collection(get_client(), SENTENCE_COLLECTION_NAME)
+
+
+def _get_sharded(name: str):
+    if name not in _sharded:
+        client = get_client()   # takes _client_lock itself
+        with _client_lock:
+            if name not in _sharded:
+                _sharded[name] = ShardedCollection(client, name, VECTOR_SHARDS, VECTOR_SHARD_KEY)
+    return _sharded[name]
@@ -0,0 +1,158 @@
+# backend/vector_db/compaction.py
+"""HNSW compaction after heavy churn.
+
+Chroma's HNSW index only marks deleted vectors; the files on disk (and the
+graph in memory) keep every slot, so after many document deletes the index
+is mostly dead weight and search walks past tombstones. Compaction rebuilds
+each collection from its live rows into a fresh graph:
+
+- single store: copy into the next generation (`<name>_g<N>`), point the
+  name at it, drop the old one (vector_db/generations.py)
+- sharded store: ShardedCollection.rebuild_shard() for every shard
+
+The new graphs are built with the current HNSW_M / HNSW_CONSTRUCTION_EF
+(vector_db/hnsw.py), so compaction is also how changed settings reach an
+existing store.
+
+It runs in a background thread (one at a time), started by the admin
+endpoint or automatically once COMPACT_AFTER_DELETES chunks have been deleted
+since the last run. Writers in every worker wait on
+vector_db.client.write_lock (a thread lock plus a flock shared by all
+processes) while a collection is being copied; reads keep using the old
+generation until the pointer flips.
+
+    python -m vector_db.compaction          # compact now, print before/after sizes
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+COMPACT_AFTER_DELETES = int(os.getenv("COMPACT_AFTER_DELETES", "5000"))   # 0 = only on request
+_COPY_BATCH = 1000
+
+_state: Dict = {"running": False, "reason": None, "started_at": None, "finished_at": None,
+                "result": None, "error": None}
+_state_lock = threading.Lock()
+_deleted_since = 0
+
+
+def index_bytes(name: str) -> int:
+    """On-disk size of the HNSW segment(s) of a collection (and its shards)."""
+    from vector_db.client import CHROMA_DATA_PATH
+    from vector_db.generations import live_name
+    from vector_db.sharding import VECTOR_SHARDS, shard_name
+
+    db_path = os.path.join(CHROMA_DATA_PATH, "chroma.sqlite3")
+    if not os.path.exists(db_path):
+        return 0
+    names = [live_name(name)]
+    if VECTOR_SHARDS > 1:
+        names += [live_name(shard_name(name, i)) for i in range(VECTOR_SHARDS)]
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        segments = [r[0] for r in conn.execute(
+            "SELECT s.id FROM segments s JOIN collections c ON c.id = s.collection "
+            f"WHERE s.scope = 'VECTOR' AND c.name IN ({','.join('?' * len(names))})", names)]
+    finally:
+        conn.close()
+    total = 0
+    for segment in segments:
+        folder = os.path.join(CHROMA_DATA_PATH, segment)
+        if os.path.isdir(folder):
+            total += sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+    return total
+
+
+def _rebuild_single(client, name: str) -> int:
+    from vector_db.generations import drop_stale, live_name, next_generation, recover_interrupted, set_live
+    from vector_db.hnsw import carry_metadata, hnsw_configuration
+
+    recover_interrupted(client, name)
+    drop_stale(client, name)   # partial copy of an interrupted run
+    current = live_name(name)
+    old = client.get_collection(current)
+    # current HNSW settings (vector_db/hnsw.py) – compaction is how a new M / ef_construction lands
+    new = client.create_collection(next_generation(name), configuration=hnsw_configuration(),
+                                   metadata=carry_metadata(old.metadata))
+    rows, offset = 0, 0
+    while True:
+        page = old.get(limit=_COPY_BATCH, offset=offset, include=["embeddings", "documents", "metadatas"])
+        if not page["ids"]:
+            break
+        new.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                metadatas=page["metadatas"])
+        rows += len(page["ids"])
+        offset += _COPY_BATCH
+    set_live(name, new.name)   # readers switch here; until now they used the intact old generation
+    client.delete_collection(current)
+    return rows
+
+
+def compact_collection(name: str) -> Dict:
+    from vector_db.client import VECTOR_SHARDS, _get_sharded, get_client, write_lock
+    from vector_db.generations import live_name
+
+    client = get_client()
+    if VECTOR_SHARDS <= 1 and live_name(name) not in [c.name for c in client.list_collections()]:
+        return {"collection": name, "rows": 0, "bytes_before": 0, "bytes_after": 0}
+    before = index_bytes(name)
+    t0 = time.perf_counter()
+    with write_lock:   # excludes store_chunks / delete_document in all workers until the flip
+        if VECTOR_SHARDS > 1:
+            sharded = _get_sharded(name)
+            rows = sum(sharded.rebuild_shard(i)["rows"] for i in range(sharded.n_shards))
+        else:
+            rows = _rebuild_single(client, name)
+    return {"collection": name, "rows": rows, "bytes_before": before, "bytes_after": index_bytes(name),
+            "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def run_compaction() -> List[Dict]:
+    from vector_db.client import COLLECTION_NAME, SENTENCE_COLLECTION_NAME
+    return [compact_collection(name) for name in (COLLECTION_NAME, SENTENCE_COLLECTION_NAME)]
+
+
+# ==================== Background job ==================== #
+
+def _job():
+    try:
+        result, error = run_compaction(), None
+    except Exception as e:
+        result, error = None, str(e)
+    with _state_lock:
+        _state.update(running=False, finished_at=time.time(), result=result, error=error)
+
+
+def start_compaction(reason: str = "manual") -> bool:
+    """Start a background compaction; False if one is already running."""
+    global _deleted_since
+    with _state_lock:
+        if _state["running"]:
+            return False
+        _state.update(running=True, reason=reason, started_at=time.time(), finished_at=None,
+                      result=None, error=None)
+        _deleted_since = 0
+    threading.Thread(target=_job, name="hnsw-compaction", daemon=True).start()
+    return True
+
+
+def note_deleted(n: int):
+    """Called after chunk deletes; kicks off compaction once enough have piled up."""
+    global _deleted_since
+    with _state_lock:
+        _deleted_since += n
+        due = COMPACT_AFTER_DELETES and _deleted_since >= COMPACT_AFTER_DELETES
+    if due:
+        start_compaction("churn")
+
+
+def compaction_state() -> Dict:
+    with _state_lock:
+        return {**_state, "deleted_since_last": _deleted_since, "auto_after_deletes": COMPACT_AFTER_DELETES}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_compaction(), indent=2))
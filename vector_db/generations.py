@@ -0,0 +1,114 @@
+# backend/vector_db/generations.py
+"""Which physical Chroma collection serves a logical collection name.
+
+A rebuild (compaction, ShardedCollection.rebuild_shard) must never leave a
+moment where a name has no data behind it: a reader opening the name in
+between gets an empty collection created under it, and the copy can no
+longer be renamed into place. So a rebuild writes a new generation,
+`<name>_g<N>`, next to the live one, and only once the copy is complete
+flips the pointer in CHROMA_DATA_PATH/generations.json (written to a temp
+file and os.replace'd, so readers see the old or the new map, never half of
+one). Every open goes through live_name(), so new requests in every worker
+use the new generation; the old one is deleted after the flip. A crash
+mid-copy leaves the pointer on the old generation and a partial copy that
+the next rebuild drops.
+
+Names without an entry map to themselves (stores from before generations).
+A shard is a name of its own (`<name>_s03`), rebuilt and swapped alone.
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+_FILE = "generations.json"
+_lock = threading.Lock()
+_cache: Dict = {"key": None, "map": {}}
+
+
+def _path(path: Optional[str]) -> str:
+    if path is None:
+        from vector_db.client import CHROMA_DATA_PATH
+        path = CHROMA_DATA_PATH
+    return os.path.join(path, _FILE)
+
+
+def _read(path: Optional[str] = None) -> Dict[str, str]:
+    file = _path(path)
+    try:
+        stat = os.stat(file)
+    except FileNotFoundError:
+        return {}
+    key = (file, stat.st_mtime_ns, stat.st_size)
+    if _cache["key"] != key:
+        with open(file, encoding="utf-8") as fh:
+            _cache.update(key=key, map=json.load(fh))
+    return _cache["map"]
+
+
+def version(path: Optional[str] = None):
+    """Changes whenever the pointer file does (cheap: one stat)."""
+    try:
+        stat = os.stat(_path(path))
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def live_name(name: str, path: Optional[str] = None) -> str:
+    """Physical collection currently serving `name`."""
+    return _read(path).get(name, name)
+
+
+def next_generation(name: str) -> str:
+    match = re.fullmatch(re.escape(name) + r"_g(\d+)", live_name(name))
+    return f"{name}_g{int(match.group(1)) + 1 if match else 1}"
+
+
+def set_live(name: str, physical: str):
+    """Point `name` at `physical` (atomic for readers in every process)."""
+    file = _path(None)
+    with _lock:
+        pointers = dict(_read())
+        pointers[name] = physical
+        tmp = f"{file}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(pointers, fh, indent=2)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, file)
+
+
+def drop_stale(client, name: str):
+    """Delete generations of `name` that are not live: partial copies of an
+    interrupted rebuild, or an old generation a reader re-created (empty)
+    after it was deleted. Call with vector_db.client.write_lock held."""
+    live = live_name(name)
+    pattern = re.compile(re.escape(name) + r"(_g\d+)?")
+    for collection in client.list_collections():
+        if collection.name != live and pattern.fullmatch(collection.name):
+            client.delete_collection(collection.name)
+
+
+def recover_interrupted(client, name: str):
+    """Finish what the rename-based compaction left behind.
+
+    It copied into `<name>_compact`, deleted `<name>` and renamed the copy –
+    interrupted between the delete and the rename (or with a reader having
+    re-created an empty `<name>` in the gap), the data is only in the copy.
+    Then the copy becomes the live collection; otherwise it is a partial copy
+    and is dropped.
+    """
+    leftover = f"{name}_compact"
+    live = live_name(name)
+    existing = {c.name for c in client.list_collections()}
+    if leftover not in existing or leftover == live:
+        return
+    live_rows = client.get_collection(live).count() if live in existing else 0
+    if not live_rows and client.get_collection(leftover).count():
+        set_live(name, leftover)
+        if live in existing:
+            client.delete_collection(live)
+    else:
+        client.delete_collection(leftover)
@@ -0,0 +1,155 @@
+# backend/vector_db/hnsw.py
+"""HNSW parameters of the Chroma collections, and index statistics.
+
+Every collection used to be created with only `hnsw:space=cosine`, i.e.
+Chroma's defaults (M=16, ef_construction=100, ef_search=100). They are now
+set from the environment:
+
+- HNSW_M                neighbours per node (`max_neighbors`): recall and
+                        memory both grow with it
+- HNSW_CONSTRUCTION_EF  candidate list while building: better graph, slower
+                        ingest
+- HNSW_SEARCH_EF        candidate list per query: recall vs query latency
+
+ef_search can change on an existing collection – it is applied when a
+collection is opened, before the first query loads the index (Chroma reads
+it once per loaded index, so a running process keeps its value). M and
+ef_construction are fixed when the graph is built: new collections get
+them, existing ones at the next compaction (POST /documents/compact), which
+rebuilds every collection with the current configuration.
+
+Pick the values with benchmarks/hnsw_sweep.py, which measures recall
+against exact search and query latency for a grid of settings on the
+stored vectors.
+"""
+import os
+from typing import Dict, List
+
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "100"))
+
+_tuned = set()   # collection ids whose ef_search was checked in this process
+_recovered = set()   # names checked for an interrupted compaction in this process
+
+
+def hnsw_configuration(m: int = None, construction_ef: int = None, search_ef: int = None) -> Dict:
+    """`configuration=` for client.create_collection / get_or_create_collection."""
+    return {"hnsw": {
+        "space": "cosine",   # cosine similarity better for text
+        "max_neighbors": m or HNSW_M,
+        "ef_construction": construction_ef or HNSW_CONSTRUCTION_EF,
+        "ef_search": search_ef or HNSW_SEARCH_EF,
+    }}
+
+
+def _hnsw(collection) -> Dict:
+    return (collection.configuration or {}).get("hnsw") or {}
+
+
+def apply_search_ef(collection):
+    """Bring an opened collection's ef_search in line with HNSW_SEARCH_EF (once per process)."""
+    if collection.id in _tuned:
+        return collection
+    if _hnsw(collection).get("ef_search") != HNSW_SEARCH_EF:
+        collection.modify(configuration={"hnsw": {"ef_search": HNSW_SEARCH_EF}})
+    _tuned.add(collection.id)
+    return collection
+
+
+def open_collection(client, name: str):
+    """Get or create the live generation of a collection (vector_db/generations.py)
+    with the configured HNSW parameters."""
+    from vector_db.generations import live_name, recover_interrupted
+
+    if name not in _recovered:
+        recover_interrupted(client, name)
+        _recovered.add(name)
+    return apply_search_ef(client.get_or_create_collection(live_name(name), configuration=hnsw_configuration()))
+
+
+def carry_metadata(metadata) -> Dict:
+    """Collection metadata for a rebuilt copy, minus legacy `hnsw:*` keys (the configuration replaces them)."""
+    kept = {k: v for k, v in (metadata or {}).items() if not k.startswith("hnsw:")}
+    return kept or None
+
+
+# ==================== Statistics ==================== #
+
+def estimate_memory_bytes(count: int, dim: int, m: int) -> int:
+    """hnswlib's in-memory size: level 0 holds the vector, label and 2M links per
+    element; an element has 1/(M-1) upper levels on average, M links each."""
+    level0 = 4 * dim + 8 + 4 * (2 * m) + 4
+    upper = (4 * m + 4) / max(m - 1, 1)
+    return int(count * (level0 + upper))
+
+
+def _physical(name: str) -> List:
+    """The Chroma collections behind a logical name: itself, or its shards."""
+    from vector_db.client import VECTOR_SHARDS, _get_sharded, get_client
+    from vector_db.generations import live_name
+
+    if VECTOR_SHARDS > 1:
+        return list(_get_sharded(name).shards)
+    client = get_client()
+    if live_name(name) not in [c.name for c in client.list_collections()]:
+        return []
+    return [client.get_collection(live_name(name))]
+
+
+def collection_stats(name: str) -> Dict:
+    from vector_db.compaction import index_bytes
+
+    configured = hnsw_configuration()["hnsw"]
+    parts = []
+    for collection in _physical(name):
+        count = collection.count()
+        hnsw = _hnsw(collection)
+        dim = None
+        if count:
+            sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+            dim = len(sample[0]) if len(sample) else None
+        m = hnsw.get("max_neighbors") or 16
+        parts.append({
+            "collection": collection.name,
+            "vectors": count,
+            "dim": dim,
+            "hnsw": {k: hnsw.get(k) for k in ("space", "max_neighbors", "ef_construction", "ef_search")},
+            # built with other M / ef_construction than configured: compaction rebuilds it
+            "rebuild_pending": (hnsw.get("max_neighbors"), hnsw.get("ef_construction"))
+                               != (configured["max_neighbors"], configured["ef_construction"]),
+            "memory_bytes_est": estimate_memory_bytes(count, dim, m) if dim else 0,
+            # 0 until the first sync_threshold vectors are flushed from Chroma's log
+            "disk_bytes": index_bytes(collection.name),
+        })
+    return {
+        "name": name,
+        "vectors": sum(p["vectors"] for p in parts),
+        "memory_bytes_est": sum(p["memory_bytes_est"] for p in parts),
+        "disk_bytes": sum(p["disk_bytes"] for p in parts),
+        "collections": parts,
+    }
+
+
+def source_counts(top: int = 50) -> Dict:
+    """Chunks per (owner, project, source), largest first – a shared chunk counts for every paper."""
+    from db.database import get_db_connection
+
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT c.owner, c.project, s.value AS source, COUNT(*) AS chunks "
+        "FROM lexical_chunks c, json_each(c.sources) s "
+        "GROUP BY c.owner, c.project, s.value ORDER BY chunks DESC").fetchall()
+    conn.close()
+    return {"sources_total": len(rows), "sources": [dict(r) for r in rows[:top]]}
+
+
+def index_stats(top: int = 50) -> Dict:
+    from vector_db.client import COLLECTION_NAME, SENTENCE_COLLECTION_NAME
+
+    return {
+        "configured": hnsw_configuration()["hnsw"],
+        "chunks": collection_stats(COLLECTION_NAME),
+        "sentences": collection_stats(SENTENCE_COLLECTION_NAME),
+        **source_counts(top),
+    }
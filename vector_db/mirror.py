@@ -0,0 +1,410 @@
+# backend/vector_db/mirror.py
+"""Memory-mapped, quantized mirror of every stored embedding.
+
+Full scans (plagiarism sweeps, clustering, duplicate detection) cannot use
+HNSW, and `collection.get(include=["embeddings"])` materialises every vector
+as Python floats – ~30 bytes per dimension and seconds per 100k chunks. The
+mirror keeps the same vectors, L2-normalised, in one flat file:
+
+- chroma_db/mirror/embeddings.<dtype>   float16 (2 B/dim) or int8 (1 B/dim, v*127)
+- embedding_mirror table (SQLite)       row -> chunk id, owner, project, source
+
+scan_topk() streams the matrix in blocks through a float32 matmul and keeps
+a running top-k with argpartition, so memory stays at one block regardless of
+corpus size. Cosine similarity = dot product because rows are normalised.
+
+get_collection() wraps the store in MirroredCollection, which forwards every
+add / upsert / update / delete to the mirror, so the two stay in sync at
+ingest and delete time. Deleted rows are zeroed and tombstoned.
+
+EMBEDDING_MIRROR = float16 (default) | int8 | off
+
+Vectors stored before the mirror existed (or while it was off) are not in
+it. Readers therefore use synced_mirror(), which returns the mirror only
+while its live row count matches the collection's and None otherwise, so
+the caller reads Chroma instead. The "mirror" warm-up step backfills a
+mirror that is out of step (one worker at a time, under a file lock).
+
+Every worker maps the same file, so writes (add / delete / clear) take an
+flock on mirror/write.lock besides the thread lock. clear() never unlinks
+or shrinks the file – other workers may have it mapped – it empties the
+row table and bumps the epoch in meta.json; rebuild then overwrites rows
+from 1 in place. Workers re-read meta.json in synced_mirror() and drop
+their mapping (and cached dim) when the epoch changed.
+
+    python -m vector_db.mirror rebuild    # (re)build from the collection
+    python -m vector_db.mirror stats
+"""
+import argparse
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db.database import get_db_connection
+
+EMBEDDING_MIRROR = os.getenv("EMBEDDING_MIRROR", "float16")
+_SCAN_BLOCK = 8192           # rows per matmul block (~25 MB float32 at 768-d)
+_GROW_ROWS = 4096            # minimum file growth step (then doubling)
+_INT8_SCALE = 127.0
+
+
+class EmbeddingMirror:
+    def __init__(self, directory: str, dtype: str = "float16"):
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported mirror dtype: {dtype}")
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self.path = os.path.join(directory, f"embeddings.{dtype}")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, "write.lock")
+        self.dim: Optional[int] = None
+        self.epoch = 0
+        self._mm: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load_meta()
+
+    # ---- storage ---- #
+
+    def _load_meta(self):
+        """Pick up dim / epoch written by another worker; a new epoch (clear) drops the mapping."""
+        try:
+            with open(self.meta_path) as fh:
+                meta = json.load(fh)
+        except FileNotFoundError:
+            return
+        if meta.get("epoch", 0) != self.epoch:
+            self._mm = None
+            self.epoch = meta.get("epoch", 0)
+            self.dim = None
+        if self.dim is None:
+            self.dim = meta.get("dim")   # fixed by the first add after a clear
+
+    def _write_meta(self, dim: Optional[int], epoch: int):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump({"dim": dim, "dtype": self.dtype.name, "epoch": epoch}, fh)
+        os.replace(tmp, self.meta_path)   # readers see the old or the new meta, never half of it
+        self.dim, self.epoch = dim, epoch
+
+    def _set_dim(self, dim: int):
+        if self.dim is None:
+            self._write_meta(dim, self.epoch)
+        elif self.dim != dim:
+            raise ValueError(f"Mirror holds {self.dim}-d vectors, got {dim}-d – run `python -m vector_db.mirror rebuild`")
+
+    @contextmanager
+    def _write_locked(self):
+        """Thread lock + flock shared by every worker writing this mirror."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_path, "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)   # released when the file is closed
+                self._load_meta()
+                yield
+
+    def _map(self, min_rows: int) -> np.memmap:
+        """Current mapping, grown (file + map) so at least min_rows rows exist."""
+        row_bytes = self.dim * self.dtype.itemsize
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < min_rows * row_bytes:
+            size = max(min_rows, 2 * (size // row_bytes), _GROW_ROWS) * row_bytes
+            with open(self.path, "ab") as fh:
+                fh.truncate(size)   # sparse zero fill
+        rows = size // row_bytes
+        if self._mm is None or self._mm.shape[0] != rows:
+            # another worker process may have grown the file – remap to its size
+            self._mm = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(rows, self.dim))
+        return self._mm
+
+    def _encode(self, vectors) -> np.ndarray:
+        v = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(v, axis=1, keepdims=True)
+        v = v / np.where(norms == 0, 1, norms)
+        if self.dtype == np.int8:
+            return np.round(v * _INT8_SCALE).astype(np.int8)
+        return v.astype(np.float16)
+
+    # ---- writes ---- #
+
+    def add(self, ids: List[str], embeddings, metadatas: Optional[List[Dict]] = None):
+        """Insert or overwrite rows for these chunk ids."""
+        if not ids:
+            return
+        encoded = self._encode(embeddings)
+        metadatas = metadatas or [{}] * len(ids)
+        with self._write_locked():
+            self._set_dim(encoded.shape[1])
+            conn = get_db_connection()
+            rows = [conn.execute(
+                """INSERT INTO embedding_mirror (chunk_id, owner, project, source) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(chunk_id) DO UPDATE SET owner = excluded.owner, project = excluded.project,
+                       source = excluded.source, deleted = 0
+                   RETURNING row""",
+                (cid, (m or {}).get("owner"), (m or {}).get("project"), (m or {}).get("source"))
+            ).fetchone()[0] for cid, m in zip(ids, metadatas)]
+            mm = self._map(max(rows) + 1)
+            mm[np.array(rows)] = encoded
+            mm.flush()
+            conn.commit()   # rows become visible to scans only once the vectors are written
+            conn.close()
+
+    def update_meta(self, ids: List[str], metadatas: List[Dict]):
+        with self._write_locked():
+            conn = get_db_connection()
+            conn.executemany(
+                "UPDATE embedding_mirror SET owner = ?, project = ?, source = ? WHERE chunk_id = ?",
+                [((m or {}).get("owner"), (m or {}).get("project"), (m or {}).get("source"), cid)
+                 for cid, m in zip(ids, metadatas)]
+            )
+            conn.commit()
+            conn.close()
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        with self._write_locked():
+            conn = get_db_connection()
+            rows = []
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                rows += [r[0] for r in conn.execute(
+                    f"UPDATE embedding_mirror SET deleted = 1 WHERE chunk_id IN ({marks}) AND deleted = 0 RETURNING row",
+                    batch
+                ).fetchall()]
+            if rows and self.dim:
+                mm = self._map(max(rows) + 1)
+                mm[np.array(rows)] = 0
+                mm.flush()
+            conn.commit()
+            conn.close()
+
+    def clear(self):
+        """Forget every row; the file is kept (other workers map it) and refilled in place from row 1."""
+        with self._write_locked():
+            conn = get_db_connection()
+            conn.execute("DELETE FROM embedding_mirror")
+            conn.commit()
+            conn.close()
+            self._mm = None
+            self._write_meta(None, self.epoch + 1)
+
+    # ---- reads ---- #
+
+    def live_rows(self, owner: Optional[str] = None, project: Optional[str] = None,
+                  sources: Optional[List[str]] = None) -> np.ndarray:
+        """Row numbers of live rows (optionally one partition / some sources), ascending."""
+        sql, args = "SELECT row FROM embedding_mirror WHERE deleted = 0", []
+        if owner is not None:
+            sql += " AND owner = ?"; args.append(owner)
+        if project is not None:
+            sql += " AND project = ?"; args.append(project)
+        if sources:
+            sql += f" AND source IN ({','.join('?' * len(sources))})"; args += list(sources)
+        conn = get_db_connection()
+        found = conn.execute(sql + " ORDER BY row", args).fetchall()
+        conn.close()
+        return np.fromiter((r[0] for r in found), dtype=np.int64, count=len(found))
+
+    def chunk_ids(self, rows) -> List[str]:
+        rows = [int(r) for r in rows]
+        conn = get_db_connection()
+        found = {}
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            found.update(conn.execute(
+                f"SELECT row, chunk_id FROM embedding_mirror WHERE row IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        conn.close()
+        return [found[r] for r in rows]
+
+    def iter_blocks(self, rows: np.ndarray, block: int = _SCAN_BLOCK):
+        """Yield (offset, float32 block) over the given rows – contiguous runs are zero-copy slices."""
+        self._load_meta()
+        if not len(rows) or self.dim is None:
+            return
+        mm = self._map(int(rows[-1]) + 1)
+        scale = 1.0 / _INT8_SCALE if self.dtype == np.int8 else 1.0
+        for start in range(0, len(rows), block):
+            part = rows[start:start + block]
+            if part[-1] - part[0] + 1 == len(part):
+                data = mm[part[0]:part[-1] + 1]
+            else:
+                data = mm[part]
+            out = data.astype(np.float32)
+            if scale != 1.0:
+                out *= scale
+            yield start, out
+
+    def scan_topk(self, queries, k: int = 5, owner: Optional[str] = None, project: Optional[str] = None,
+                  sources: Optional[List[str]] = None) -> List[List[Tuple[str, float]]]:
+        """Exact cosine top-k per query over the (filtered) mirror: [[(chunk_id, score), ...], ...]"""
+        q = np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1, norms)
+        rows = self.live_rows(owner, project, sources)
+        best_s = np.full((len(q), 0), -np.inf, dtype=np.float32)
+        best_i = np.zeros((len(q), 0), dtype=np.int64)
+        for offset, block in self.iter_blocks(rows):
+            scores = q @ block.T                                # (n_queries, block)
+            idx = np.broadcast_to(np.arange(offset, offset + block.shape[0]), scores.shape)
+            cand_s = np.concatenate([best_s, scores], axis=1)
+            cand_i = np.concatenate([best_i, idx], axis=1)
+            if cand_s.shape[1] > k:
+                keep = np.argpartition(-cand_s, k - 1, axis=1)[:, :k]
+                cand_s = np.take_along_axis(cand_s, keep, axis=1)
+                cand_i = np.take_along_axis(cand_i, keep, axis=1)
+            best_s, best_i = cand_s, cand_i
+        order = np.argsort(-best_s, axis=1)
+        best_s = np.take_along_axis(best_s, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+        ids = self.chunk_ids(rows[best_i.ravel()]) if best_i.size else []
+        ids = [ids[n * best_i.shape[1]:(n + 1) * best_i.shape[1]] for n in range(len(q))]
+        return [list(zip(qi, map(float, qs))) for qi, qs in zip(ids, best_s)]
+
+    def live_count(self) -> int:
+        conn = get_db_connection()
+        count = conn.execute("SELECT COUNT(*) FROM embedding_mirror WHERE deleted = 0").fetchone()[0]
+        conn.close()
+        return count
+
+    def stats(self) -> Dict:
+        conn = get_db_connection()
+        live, total = conn.execute(
+            "SELECT COALESCE(SUM(deleted = 0), 0), COUNT(*) FROM embedding_mirror").fetchone()
+        conn.close()
+        return {"dtype": self.dtype.name, "dim": self.dim, "live_rows": live, "tombstones": total - live,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "disk_bytes": os.stat(self.path).st_blocks * 512 if os.path.exists(self.path) else 0}
+
+
+# ==================== Collection wrapper ==================== #
+
+class MirroredCollection:
+    """Forwards writes to both the vector store and the mirror; everything else passes through."""
+
+    def __init__(self, collection, mirror: EmbeddingMirror):
+        self._collection = collection
+        self.mirror = mirror
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None, **kwargs):
+        self._collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, **kwargs)
+        if embeddings is not None:
+            self.mirror.add(ids, embeddings, metadatas)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None, **kwargs):
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, **kwargs)
+        if embeddings is not None:
+            self.mirror.add(ids, embeddings, metadatas)
+
+    def update(self, ids, embeddings=None, metadatas=None, **kwargs):
+        if embeddings is not None:
+            kwargs["embeddings"] = embeddings   # ShardedCollection.update takes metadatas only
+        self._collection.update(ids=ids, metadatas=metadatas, **kwargs)
+        if embeddings is not None:
+            self.mirror.add(ids, embeddings, metadatas)
+        elif metadatas is not None:
+            self.mirror.update_meta(ids, metadatas)
+
+    def delete(self, ids=None, where=None, **kwargs):
+        if where is not None:
+            # resolve the filter to ids first – the mirror only knows ids
+            ids = self._collection.get(ids=ids, where=where, include=[])["ids"]
+            if not ids:
+                return
+        self._collection.delete(ids=ids, **kwargs)
+        self.mirror.delete(list(ids or []))
+
+
+_mirror: Optional[EmbeddingMirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> Optional[EmbeddingMirror]:
+    """Process-wide mirror, or None when EMBEDDING_MIRROR=off."""
+    global _mirror
+    if EMBEDDING_MIRROR == "off":
+        return None
+    if _mirror is None:
+        from vector_db.client import CHROMA_DATA_PATH
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = EmbeddingMirror(os.path.join(CHROMA_DATA_PATH, "mirror"), EMBEDDING_MIRROR)
+    return _mirror
+
+
+def synced_mirror() -> Optional[EmbeddingMirror]:
+    """The mirror when it holds as many live vectors as the collection, else None (read Chroma)."""
+    mirror = get_mirror()
+    if mirror is None:
+        return None
+    from vector_db.client import get_collection
+
+    mirror._load_meta()   # remap if another worker cleared / rebuilt it
+    return mirror if mirror.live_count() == get_collection().count() else None
+
+
+def rebuild(collection, mirror: EmbeddingMirror, batch: int = 2000) -> Dict:
+    """Re-create the mirror from the vector store contents, one page at a time."""
+    mirror.clear()
+    offset = 0
+    while True:
+        page = collection.get(limit=batch, offset=offset, include=["embeddings", "metadatas"])
+        if not page["ids"]:
+            break
+        mirror.add(page["ids"], page["embeddings"], page["metadatas"])
+        offset += len(page["ids"])
+    return mirror.stats()
+
+
+def backfill() -> Dict:
+    """Rebuild the mirror if it is out of step with the collection (warm-up step "mirror")."""
+    from vector_db.client import get_collection, write_lock
+
+    mirror = get_mirror()
+    if mirror is None:
+        return {"mirror": "off"}
+    if synced_mirror() is not None:
+        return {"rebuilt": False, **mirror.stats()}
+    os.makedirs(mirror.directory, exist_ok=True)
+    with open(os.path.join(mirror.directory, "rebuild.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return {"rebuilt": False, "busy": True}   # another worker is rebuilding it
+        with write_lock:   # no ingest / delete in any worker while copying
+            if synced_mirror() is not None:
+                return {"rebuilt": False, **mirror.stats()}
+            return {"rebuilt": True, **rebuild(get_collection(), mirror)}
+
+
+def main():
+    from db.schema import init_embedding_mirror_table
+    from vector_db.client import get_collection, write_lock
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cmd", choices=["rebuild", "stats"])
+    args = parser.parse_args()
+    init_embedding_mirror_table()
+    mirror = get_mirror()
+    if mirror is None:
+        parser.error("EMBEDDING_MIRROR is off")
+    if args.cmd == "rebuild":
+        with write_lock:   # the API workers' ingest / delete wait until the copy is complete
+            result = rebuild(get_collection(), mirror)
+    else:
+        result = mirror.stats()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+# backend/vector_db/sharding.py
+"""Sharded vector store: N Chroma collections behind one collection-like object.
+
+One big collection means one big HNSW graph – slower to build, all of it in
+memory, and `where`-filtered queries have to walk past everyone else's
+vectors. ShardedCollection spreads chunks over N collections by a hash of one
+metadata field (VECTOR_SHARD_KEY, "source" by default; "owner"/"project"
+once ingestion tags them) and exposes the subset of the Chroma collection API
+the routers use: add / upsert / update / query / get / delete / count / peek.
+
+- query fans out to the shards concurrently and merges the top-k by distance;
+  a `where` that pins the shard key ({"source": x}, {"source": {"$in": [...]}})
+  only touches the shards that can hold it
+- get / count / delete fan out the same way
+- rebuild_shard(i) copies one shard page by page into a fresh collection
+  (new HNSW graph) and swaps it in once the copy is complete
+  (vector_db/generations.py) – the old shard serves reads until then, and
+  a crash mid-copy leaves it untouched
+
+    python -m vector_db.sharding reshard          # move the single collection into VECTOR_SHARDS shards
+    python -m vector_db.sharding rebuild 3        # rebuild shard 3 only
+    python -m vector_db.sharding stats
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from vector_db import generations
+from vector_db.hnsw import apply_search_ef, hnsw_configuration
+
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "1"))
+VECTOR_SHARD_KEY = os.getenv("VECTOR_SHARD_KEY", "source")
+# rows copied per add() call when rebuilding / resharding
+_COPY_BATCH = 1000
+
+def shard_name(base: str, index: int) -> str:
+    return f"{base}_s{index:02d}"
+
+
+def shard_of(value, n_shards: int) -> int:
+    """Stable shard index for a shard-key value (same answer in every process)."""
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % n_shards
+
+
+class ShardedCollection:
+    def __init__(self, client, base_name: str, n_shards: int, shard_key: str = "source",
+                 configuration: Optional[Dict] = None, workers: Optional[int] = None):
+        self.client = client
+        self.base_name = base_name
+        self.n_shards = n_shards
+        self.shard_key = shard_key
+        self.configuration = configuration or hnsw_configuration()
+        self._generations = None
+        self._shards = [None] * n_shards
+        self._refresh()
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(n_shards, 16),
+                                        thread_name_prefix="vector-shard")
+
+    @property
+    def shards(self) -> List:
+        self._refresh()
+        return self._shards
+
+    def _open(self, index: int):
+        name = generations.live_name(shard_name(self.base_name, index))
+        return apply_search_ef(self.client.get_or_create_collection(name, configuration=self.configuration))
+
+    def _refresh(self):
+        """Reopen shards whose live generation changed (a rebuild in this or another process)."""
+        current = generations.version()
+        if current == self._generations and all(self._shards):
+            return
+        for i, shard in enumerate(self._shards):
+            if shard is None or shard.name != generations.live_name(shard_name(self.base_name, i)):
+                self._shards[i] = self._open(i)
+        self._generations = current
+
+    # ---- routing ---- #
+
+    def shard_for(self, metadata: Optional[Dict]) -> int:
+        return shard_of((metadata or {}).get(self.shard_key, ""), self.n_shards)
+
+    def _targets(self, where: Optional[Dict]) -> List[int]:
+        """Shards a `where` filter can match – all of them unless it pins the shard key."""
+        values = _pinned_values(where, self.shard_key)
+        if values is None:
+            return list(range(self.n_shards))
+        return sorted({shard_of(v, self.n_shards) for v in values})
+
+    def _fan_out(self, targets: List[int], fn):
+        shards = self.shards
+        if len(targets) == 1:
+            return [fn(shards[targets[0]])]
+        return list(self._pool.map(lambda i: fn(shards[i]), targets))
+
+    # ---- writes ---- #
+
+    def _grouped_write(self, method: str, ids, embeddings=None, documents=None, metadatas=None):
+        groups: Dict[int, List[int]] = {}
+        for row, meta in enumerate(metadatas or [None] * len(ids)):
+            groups.setdefault(self.shard_for(meta), []).append(row)
+        for shard, rows in groups.items():
+            pick = (lambda xs: [xs[r] for r in rows] if xs is not None else None)
+            getattr(self.shards[shard], method)(ids=pick(ids), embeddings=pick(embeddings),
+                                                documents=pick(documents), metadatas=pick(metadatas))
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._grouped_write("add", ids, embeddings, documents, metadatas)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._grouped_write("upsert", ids, embeddings, documents, metadatas)
+
+    def update(self, ids, metadatas):
+        """Metadata update; rows whose shard-key value changes move to their new shard.
+
+        Each id is looked up (ids only) in the shard its new metadata hashes
+        to – where it already is unless the shard key changed. Only the rows
+        missing there are searched for in the other shards, and only those
+        are read with their embeddings and moved.
+        """
+        wanted = dict(zip(ids, metadatas))
+        shards = self.shards
+        groups: Dict[int, List[str]] = {}
+        for cid, meta in wanted.items():
+            groups.setdefault(self.shard_for(meta), []).append(cid)
+        missing = []
+        for index, group in groups.items():
+            present = set(shards[index].get(ids=group, include=[])["ids"])
+            if present:
+                stay = [cid for cid in group if cid in present]
+                shards[index].update(ids=stay, metadatas=[wanted[cid] for cid in stay])
+            missing += [cid for cid in group if cid not in present]
+        for shard in shards:
+            if not missing:
+                break
+            found = shard.get(ids=missing, include=["embeddings", "documents"])
+            if found["ids"]:
+                self.add(ids=found["ids"], embeddings=list(found["embeddings"]), documents=found["documents"],
+                         metadatas=[wanted[cid] for cid in found["ids"]])
+                shard.delete(ids=found["ids"])
+                moved = set(found["ids"])
+                missing = [cid for cid in missing if cid not in moved]
+
+    def delete(self, ids=None, where=None):
+        targets = self._targets(where)
+        self._fan_out(targets, lambda s: s.delete(ids=ids, where=where))
+
+    # ---- reads ---- #
+
+    def count(self) -> int:
+        return sum(self._fan_out(list(range(self.n_shards)), lambda s: s.count()))
+
+    def peek(self, limit: int = 10):
+        for shard in self.shards:
+            if shard.count():
+                return shard.peek(limit=limit)
+        return self.shards[0].peek(limit=limit)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        """Rows in shard order. A page (limit / offset) walks the shards in turn
+        and asks each only for its part of the page, so paging through the store
+        reads every row once instead of the whole store per page."""
+        include = list(include)
+        targets = self._targets(where)
+        if limit is None and not offset:
+            parts = self._fan_out(targets, lambda s: s.get(ids=ids, where=where, include=include))
+        else:
+            parts, skip, want = [], offset or 0, limit
+            shards = self.shards
+            for index in targets:
+                if want is not None and want <= 0:
+                    break
+                shard = shards[index]
+                if skip:
+                    # rows this shard contributes before the page starts
+                    size = (shard.count() if ids is None and where is None
+                            else len(shard.get(ids=ids, where=where, include=[])["ids"]))
+                    if skip >= size:
+                        skip -= size
+                        continue
+                part = shard.get(ids=ids, where=where, limit=want, offset=skip or None, include=include)
+                skip = 0
+                parts.append(part)
+                if want is not None:
+                    want -= len(part["ids"])
+        merged = {"ids": [], **{k: [] for k in include}}
+        for part in parts:
+            for key in merged:
+                values = part.get(key)
+                if values is not None:
+                    merged[key].extend(values)
+        return merged
+
+    def query(self, query_embeddings, n_results: int = 10, where=None,
+              include=("documents", "metadatas", "distances")):
+        """Per-shard top-k, merged into a global top-k per query by distance."""
+        include = list(include)
+        shard_include = include if "distances" in include else include + ["distances"]
+        parts = self._fan_out(self._targets(where), lambda s: s.query(
+            query_embeddings=query_embeddings, n_results=n_results, where=where, include=shard_include))
+
+        out = {"ids": [], **{k: [] for k in include}}
+        for q in range(len(query_embeddings)):
+            hits = []   # (distance, part, position)
+            for p, part in enumerate(parts):
+                for pos, dist in enumerate(part["distances"][q]):
+                    hits.append((dist, p, pos))
+            hits.sort(key=lambda h: h[0])
+            hits = hits[:n_results]
+            for key in out:
+                out[key].append([parts[p][key][q][pos] for _, p, pos in hits])
+        return out
+
+    # ---- maintenance ---- #
+
+    def rebuild_shard(self, index: int) -> Dict:
+        """Copy one shard into its next generation (fresh, compact HNSW graph), then swap.
+
+        Holds vector_db.client.write_lock (re-entrant; compaction already
+        holds it) for the whole copy, so no write from any worker lands in
+        the old shard after its rows were copied.
+        """
+        from vector_db.client import write_lock
+
+        name = shard_name(self.base_name, index)
+        with write_lock:
+            generations.drop_stale(self.client, name)   # partial copy of an interrupted rebuild
+            old = self.shards[index]
+            new = self.client.create_collection(generations.next_generation(name), configuration=self.configuration)
+            rows, offset = 0, 0
+            while True:
+                page = old.get(limit=_COPY_BATCH, offset=offset, include=["embeddings", "documents", "metadatas"])
+                if not page["ids"]:
+                    break
+                new.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                        metadatas=page["metadatas"])
+                rows += len(page["ids"])
+                offset += _COPY_BATCH
+            generations.set_live(name, new.name)
+            self._shards[index] = apply_search_ef(new)
+            self.client.delete_collection(old.name)
+        return {"shard": index, "rows": rows}
+
+    def stats(self) -> Dict:
+        counts = self._fan_out(list(range(self.n_shards)), lambda s: s.count())
+        return {"shards": self.n_shards, "shard_key": self.shard_key,
+                "counts": counts, "total": sum(counts)}
+
+
+def _pinned_values(where: Optional[Dict], key: str) -> Optional[List]:
+    """Values the shard key is restricted to by `where`, or None if unrestricted."""
+    if not where:
+        return None
+    if key in where:
+        cond = where[key]
+        if not isinstance(cond, dict):
+            return [cond]
+        if "$eq" in cond:
+            return [cond["$eq"]]
+        if "$in" in cond:
+            return list(cond["$in"])
+        return None
+    if "$and" in where:
+        for clause in where["$and"]:
+            values = _pinned_values(clause, key)
+            if values is not None:
+                return values
+    return None
+
+
+def reshard(client, source_name: str, target: ShardedCollection) -> Dict:
+    """Copy every row of a (single or differently sharded) collection into `target`."""
+    source = client.get_collection(generations.live_name(source_name))
+    data = source.get(include=["embeddings", "documents", "metadatas"])
+    for i in range(0, len(data["ids"]), _COPY_BATCH):
+        sl = slice(i, i + _COPY_BATCH)
+        target.upsert(ids=data["ids"][sl], embeddings=list(data["embeddings"][sl]),
+                      documents=data["documents"][sl], metadatas=data["metadatas"][sl])
+    return {"copied": len(data["ids"]), **target.stats()}
+
+
+def main():
+    from vector_db.client import COLLECTION_NAME, VECTOR_SHARDS, _get_sharded, get_client
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    rebuild = sub.add_parser("rebuild")
+    rebuild.add_argument("shard", type=int)
+    move = sub.add_parser("reshard")
+    move.add_argument("--source", default=COLLECTION_NAME, help="collection to copy from")
+    args = parser.parse_args()
+
+    if VECTOR_SHARDS <= 1:
+        parser.error("set VECTOR_SHARDS > 1 to use the sharded store")
+    collection = _get_sharded(COLLECTION_NAME)
+    if args.cmd == "stats":
+        result = collection.stats()
+    elif args.cmd == "rebuild":
+        result = collection.rebuild_shard(args.shard)   # takes write_lock, shared with the API workers
+    else:
+        result = reshard(get_client(), args.source, collection)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# backend/vector_db/snapshot.py
+"""Corpus snapshot export / restore without re-embedding.
+
+A snapshot is a directory:
+
+    manifest.json          rows, dim, dtype, collection, sha256 per file
+    embeddings.npy         (rows, dim) float32 or float16, row-aligned with
+    rows.jsonl.gz          {"id", "document", "metadata"} per line
+    catalog.jsonl.gz       SQLite catalog rows (documents, document_keywords,
+                           term_stats, corpus_stats) so keywords / IDF / delete
+                           keep working after a restore
+    pdfs/<owner>/<project>/<source>
+                           the stored PDFs of the catalog (skip with --no-pdfs)
+
+Export pages through the collection (EXPORT_BATCH rows at a time) straight
+into a memory-mapped .npy and a gzip stream, so memory stays at one page.
+Import verifies every checksum first, then upserts in large batches through
+get_collection() – the mirror, the shards and the FTS index are filled on
+the way – and never calls Ollama.
+
+The PDFs go back to uploaded_pdfs/. A paper whose PDF is not in the
+snapshot keeps its catalog row with documents.without_file = 1, which
+`python -m utils.ingest orphans` treats as present – otherwise every
+restored chunk would look orphaned and `orphans --delete` would wipe them.
+
+Import merges into whatever the target already holds. Documents and
+keywords the target has are kept as they are. The IDF reference (term_stats,
+corpus_stats) is not copied – that would overwrite the target's counts.
+Instead the chunks the target did not have yet are counted in, just as
+ingest counts a new upload. A snapshot whose vectors do not have the target
+collection's dimension is refused before anything is written.
+
+    python -m vector_db.snapshot export snapshots/2026-10-19 [--dtype float16] [--no-pdfs]
+    python -m vector_db.snapshot import snapshots/2026-10-19
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from db.database import get_db_connection
+
+EXPORT_BATCH = int(os.getenv("SNAPSHOT_EXPORT_BATCH", "2000"))
+IMPORT_BATCH = int(os.getenv("SNAPSHOT_IMPORT_BATCH", "5000"))
+_CATALOG_TABLES = ("documents", "document_keywords", "term_stats", "corpus_stats")
+_HASH_BLOCK = 1 << 20
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _collection(name: str):
+    from vector_db.client import COLLECTION_NAME, SENTENCE_COLLECTION_NAME, get_collection, get_sentence_collection
+
+    if name == COLLECTION_NAME:
+        return get_collection()
+    if name == SENTENCE_COLLECTION_NAME:
+        return get_sentence_collection()
+    raise SnapshotError(f"Unknown collection: {name}")
+
+
+def _parts(collection):
+    """The raw Chroma collections to page through (every shard of a sharded store)."""
+    raw = getattr(collection, "_collection", collection)   # unwrap MirroredCollection
+    return getattr(raw, "shards", [raw])
+
+
+def _rate(rows: int, nbytes: int, seconds: float) -> Dict:
+    seconds = max(seconds, 1e-9)
+    return {"rows": rows, "seconds": round(seconds, 2), "rows_per_s": round(rows / seconds),
+            "mb_per_s": round(nbytes / seconds / 1e6, 1)}
+
+
+# ==================== Export ==================== #
+
+def _pdf_member(row: Dict) -> str:
+    return "/".join(("pdfs", row["owner"], row["project"], os.path.basename(row["source"])))
+
+
+def _export_pdfs(out_dir: str) -> Dict[str, str]:
+    """Copy the catalog's stored PDFs into the snapshot; returns {member: sha256}."""
+    from utils.ingest import _stored_file
+
+    conn = get_db_connection()
+    rows = [dict(r) for r in conn.execute("SELECT owner, project, source, path FROM documents")]
+    conn.close()
+    hashes = {}
+    for row in rows:
+        partition = {"owner": row["owner"], "project": row["project"]}
+        found = row["path"] if os.path.exists(row["path"]) else _stored_file(partition, row["source"])
+        if not found:
+            continue
+        member = _pdf_member(row)
+        target = os.path.join(out_dir, member)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(found, target)
+        hashes[member] = _sha256(target)
+    return hashes
+
+
+def export_snapshot(out_dir: str, collection_name: str = None, dtype: str = "float32",
+                    include_pdfs: bool = True) -> Dict:
+    from vector_db.client import COLLECTION_NAME, write_lock
+
+    collection_name = collection_name or COLLECTION_NAME
+    if dtype not in ("float32", "float16"):
+        raise SnapshotError(f"Unsupported dtype: {dtype}")
+    os.makedirs(out_dir, exist_ok=True)
+    emb_path = os.path.join(out_dir, "embeddings.npy")
+    rows_path = os.path.join(out_dir, "rows.jsonl.gz")
+    catalog_path = os.path.join(out_dir, "catalog.jsonl.gz")
+
+    start = time.perf_counter()
+    collection = _collection(collection_name)
+    with write_lock:   # a consistent copy: no ingest / delete while paging through
+        parts = _parts(collection)
+        total = sum(part.count() for part in parts)
+        matrix, written, dim = None, 0, 0
+        with gzip.open(rows_path, "wt", encoding="utf-8", compresslevel=3) as rows_out:
+            for part in parts:
+                offset = 0
+                while True:
+                    page = part.get(limit=EXPORT_BATCH, offset=offset,
+                                    include=["embeddings", "documents", "metadatas"])
+                    if not page["ids"]:
+                        break
+                    block = np.asarray(page["embeddings"], dtype=np.float32)
+                    if matrix is None:
+                        dim = block.shape[1]
+                        matrix = np.lib.format.open_memmap(emb_path, mode="w+", dtype=dtype, shape=(total, dim))
+                    if written + len(block) > total:
+                        raise SnapshotError("Collection grew during export")
+                    matrix[written:written + len(block)] = block
+                    for cid, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+                        rows_out.write(json.dumps({"id": cid, "document": doc, "metadata": meta}) + "\n")
+                    written += len(block)
+                    offset += len(block)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(emb_path, mode="w+", dtype=dtype, shape=(0, 0))
+        matrix.flush()
+        del matrix
+        if written != total:
+            raise SnapshotError(f"Collection changed during export ({written} of {total} rows read)")
+
+    conn = get_db_connection()
+    with gzip.open(catalog_path, "wt", encoding="utf-8") as cat_out:
+        for table in _CATALOG_TABLES:
+            for row in conn.execute(f"SELECT * FROM {table}"):
+                cat_out.write(json.dumps({"table": table, "row": dict(row)}) + "\n")
+    conn.close()
+
+    files = {name: _sha256(os.path.join(out_dir, name))
+             for name in ("embeddings.npy", "rows.jsonl.gz", "catalog.jsonl.gz")}
+    pdfs = _export_pdfs(out_dir) if include_pdfs else {}
+    size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in files)
+    manifest = {"version": 2, "collection": collection_name, "rows": written, "dim": dim, "dtype": dtype,
+                "created_at": time.time(), "sha256": {**files, **pdfs}, "pdfs": len(pdfs), "bytes": size}
+    with open(os.path.join(out_dir, "manifest.json"), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    return {**_rate(written, size, time.perf_counter() - start), "bytes": size, "path": out_dir}
+
+
+# ==================== Import ==================== #
+
+def verify_snapshot(in_dir: str) -> Dict:
+    manifest_path = os.path.join(in_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise SnapshotError(f"No manifest.json in {in_dir}")
+    with open(manifest_path) as fh:
+        manifest = json.load(fh)
+    for name, expected in manifest["sha256"].items():
+        actual = _sha256(os.path.join(in_dir, name))
+        if actual != expected:
+            raise SnapshotError(f"Checksum mismatch for {name}: {actual} != {expected}")
+    return manifest
+
+
+def _restore_pdf(in_dir: str, row: Dict) -> Optional[str]:
+    """Put a document's PDF back under uploaded_pdfs/; its path, or None if neither snapshot nor disk has it."""
+    from utils.ingest import _stored_file, pdf_path
+
+    partition = {"owner": row["owner"], "project": row["project"]}
+    member = os.path.join(in_dir, _pdf_member(row))
+    if os.path.exists(member):
+        target = pdf_path(partition, row["source"])
+        shutil.copyfile(member, target)
+        return target
+    return _stored_file(partition, row["source"])
+
+
+def _restore_catalog(in_dir: str) -> Dict:
+    """Add the snapshot's documents / keywords the target does not have (its own rows win)."""
+    restored = {"documents": 0, "without_file": 0, "kept": 0}
+    conn = get_db_connection()
+    with gzip.open(os.path.join(in_dir, "catalog.jsonl.gz"), "rt", encoding="utf-8") as fh:
+        for line in fh:
+            item = json.loads(line)
+            row = item["row"]
+            if item["table"] in ("term_stats", "corpus_stats"):
+                continue   # counted from the new chunks during import
+            if item["table"] == "documents":
+                if conn.execute("SELECT 1 FROM documents WHERE owner = ? AND project = ? AND source = ?",
+                                (row["owner"], row["project"], row["source"])).fetchone():
+                    restored["kept"] += 1
+                    continue
+                path = _restore_pdf(in_dir, row)
+                row["path"] = path or row["path"]
+                row["without_file"] = 0 if path else 1   # keeps orphan detection off its chunks
+                restored["documents"] += 1
+                restored["without_file"] += row["without_file"]
+            columns = ", ".join(row)
+            placeholders = ", ".join("?" * len(row))
+            conn.execute(f"INSERT OR IGNORE INTO {item['table']} ({columns}) VALUES ({placeholders})",
+                         list(row.values()))
+    conn.commit()
+    conn.close()
+    return restored
+
+
+def _check_dim(collection, manifest: Dict):
+    """Refuse a snapshot whose vectors cannot go into the target collection."""
+    if not manifest["rows"]:
+        return
+    sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+    if sample is not None and len(sample) and len(sample[0]) != manifest["dim"]:
+        raise SnapshotError(f"Snapshot holds {manifest['dim']}-d vectors, "
+                            f"{manifest['collection']} holds {len(sample[0])}-d")
+
+
+def import_snapshot(in_dir: str, batch: int = IMPORT_BATCH) -> Dict:
+    from utils.keywords import update_term_stats
+    from utils.lexical_index import index_chunks
+    from vector_db.client import COLLECTION_NAME, get_client, write_lock
+
+    start = time.perf_counter()
+    batch = min(batch, get_client().get_max_batch_size())
+    manifest = verify_snapshot(in_dir)
+    verified_s = time.perf_counter() - start
+
+    collection = _collection(manifest["collection"])
+    matrix = np.load(os.path.join(in_dir, "embeddings.npy"), mmap_mode="r")
+    if matrix.shape[0] != manifest["rows"]:
+        raise SnapshotError(f"embeddings.npy has {matrix.shape[0]} rows, manifest says {manifest['rows']}")
+    if manifest["rows"] and matrix.shape[1] != manifest["dim"]:
+        raise SnapshotError(f"embeddings.npy is {matrix.shape[1]}-d, manifest says {manifest['dim']}")
+
+    loaded, added = 0, 0
+    with write_lock, gzip.open(os.path.join(in_dir, "rows.jsonl.gz"), "rt", encoding="utf-8") as fh:
+        _check_dim(collection, manifest)
+        ids, docs, metas = [], [], []
+
+        def flush():
+            nonlocal loaded, added
+            block = np.asarray(matrix[loaded:loaded + len(ids)], dtype=np.float32)
+            held = set(collection.get(ids=ids, include=[])["ids"])
+            collection.upsert(ids=ids, embeddings=block, documents=docs, metadatas=metas)
+            if manifest["collection"] == COLLECTION_NAME:
+                index_chunks(ids, docs, metas)
+                new_docs = [doc for cid, doc in zip(ids, docs) if cid not in held]
+                update_term_stats(new_docs)   # IDF: count only chunks the target did not have
+                added += len(new_docs)
+            loaded += len(ids)
+            ids.clear(); docs.clear(); metas.clear()
+
+        for line in fh:
+            row = json.loads(line)
+            ids.append(row["id"])
+            docs.append(row["document"])
+            metas.append(row["metadata"])
+            if len(ids) >= batch:
+                flush()
+        if ids:
+            flush()
+    if loaded != manifest["rows"]:
+        raise SnapshotError(f"rows.jsonl.gz has {loaded} rows, manifest says {manifest['rows']}")
+
+    catalog = _restore_catalog(in_dir)
+    return {**_rate(loaded, manifest["bytes"], time.perf_counter() - start),
+            "verify_seconds": round(verified_s, 2), "collection": manifest["collection"],
+            "new_chunks": added, "catalog": catalog}
+
+
+def main():
+    from db.schema import init_documents_table, init_embedding_mirror_table, init_keyword_tables, init_lexical_tables
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    exp = sub.add_parser("export")
+    exp.add_argument("out")
+    exp.add_argument("--collection", help="default: research_documents")
+    exp.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    exp.add_argument("--no-pdfs", action="store_true", help="leave the stored PDFs out of the snapshot")
+    imp = sub.add_parser("import")
+    imp.add_argument("path")
+    imp.add_argument("--batch", type=int, default=IMPORT_BATCH)
+    sub.add_parser("verify").add_argument("path")
+    args = parser.parse_args()
+
+    init_keyword_tables()
+    init_documents_table()
+    init_embedding_mirror_table()
+    init_lexical_tables()
+    if args.cmd == "export":
+        result = export_snapshot(args.out, args.collection, args.dtype, include_pdfs=not args.no_pdfs)
+    elif args.cmd == "import":
+        result = import_snapshot(args.path, args.batch)
+    else:
+        result = verify_snapshot(args.path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()